@@ -0,0 +1,65 @@
+from celery.schedules import crontab
+from datetime import timedelta
+
+CELERY_BEAT_SCHEDULE = {
+    'send-appointment-reminders-every-hour': {
+        'task': 'core.periodic_tasks.periodic_appointment_reminder',
+        'schedule': crontab(minute=0, hour='*'),  # every hour
+    },
+    'send-appointment-followups-every-hour': {
+        'task': 'core.periodic_tasks.periodic_appointment_followup',
+        'schedule': crontab(minute=10, hour='*'),  # every hour, 10 minutes past
+    },
+    'dispatch-pending-outbox-every-minute': {
+        'task': 'core.periodic_tasks.dispatch_pending_outbox',
+        'schedule': timedelta(minutes=1),
+    },
+    'sync-google-calendars-every-5-minutes': {
+        'task': 'core.periodic_tasks.periodic_google_calendar_sync',
+        'schedule': timedelta(minutes=5),
+    },
+    'refresh-google-tokens-every-5-minutes': {
+        'task': 'core.periodic_tasks.periodic_google_token_refresh',
+        'schedule': timedelta(minutes=5),
+    },
+    'expire-stock-batches-nightly': {
+        'task': 'core.periodic_tasks.expire_stock_batches',
+        'schedule': crontab(minute=5, hour=0),
+    },
+    'snapshot-stock-balances-nightly': {
+        'task': 'core.periodic_tasks.nightly_stock_snapshot',
+        'schedule': crontab(minute=15, hour=0),
+    },
+    'check-low-stock-every-15-minutes': {
+        'task': 'core.periodic_tasks.periodic_low_stock_check',
+        'schedule': timedelta(minutes=15),
+    },
+    'rebuild-expiry-summary-nightly': {
+        'task': 'core.periodic_tasks.nightly_expiry_summary',
+        'schedule': crontab(minute=20, hour=0),
+    },
+    'refresh-reorder-suggestions-nightly': {
+        'task': 'core.periodic_tasks.nightly_reorder_suggestions',
+        'schedule': crontab(minute=30, hour=0),
+    },
+    'generate-end-of-day-bills': {
+        'task': 'core.periodic_tasks.end_of_day_billing',
+        'schedule': crontab(minute=30, hour=23),
+    },
+    'snapshot-receivables-aging-nightly': {
+        'task': 'core.periodic_tasks.nightly_receivables_aging_snapshot',
+        'schedule': crontab(minute=55, hour=23),  # end of the business day
+    },
+    'extract-analytics-nightly': {
+        'task': 'core.periodic_tasks.nightly_analytics_extract',
+        'schedule': crontab(minute=0, hour=1),  # after the midnight stock and billing jobs
+    },
+    'purge-report-jobs-nightly': {
+        'task': 'core.periodic_tasks.purge_report_jobs',
+        'schedule': crontab(minute=0, hour=2),
+    },
+    'fail-stale-report-jobs': {
+        'task': 'core.periodic_tasks.fail_stale_report_jobs',
+        'schedule': timedelta(minutes=15),
+    },
+}
@@ -6,6 +6,7 @@ Generated by 'django-admin startproject' template.
 
 import os
 from pathlib import Path
+from .celerybeat_schedule import CELERY_BEAT_SCHEDULE
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -61,6 +62,7 @@ MIDDLEWARE = [
     'django.middleware.csrf.CsrfViewMiddleware',
     'axes.middleware.AxesMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.db_router.ReplicaRoutingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -109,6 +111,18 @@ else:
         }
     }
 
+# Optional streaming replica for reports, dashboards and list endpoints (core.db_router).
+# Point it at the same database as `default` to exercise both aliases locally.
+REPLICA_DATABASE_URL = os.environ.get('REPLICA_DATABASE_URL')
+if REPLICA_DATABASE_URL:
+    import dj_database_url
+    DATABASES['replica'] = dj_database_url.config(default=REPLICA_DATABASE_URL, conn_max_age=600)
+    DATABASES['replica']['TEST'] = {'MIRROR': 'default'}
+DATABASE_ROUTERS = ['core.db_router.ReplicaRouter']
+REPLICA_MAX_LAG_SECONDS = int(os.environ.get('REPLICA_MAX_LAG_SECONDS', '5'))  # Fall back to the primary beyond this lag
+REPLICA_LAG_CHECK_SECONDS = int(os.environ.get('REPLICA_LAG_CHECK_SECONDS', '5'))  # How often each process re-measures lag
+REPLICA_STICKY_SECONDS = int(os.environ.get('REPLICA_STICKY_SECONDS', '10'))  # Reads stay on the primary this long after a user's write
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -221,6 +235,15 @@ CORS_ALLOWED_HEADERS = [
 # Celery Configuration
 CELERY_BROKER_URL = os.environ.get('REDIS_URL', 'redis://localhost:6379/0')
 CELERY_RESULT_BACKEND = os.environ.get('REDIS_URL', 'redis://localhost:6379/0')
+CELERY_IMPORTS = ('core.periodic_tasks',)
+
+# Outbox delivery
+OUTBOX_MAX_ATTEMPTS = int(os.environ.get('OUTBOX_MAX_ATTEMPTS', '5'))
+OUTBOX_CLAIM_SECONDS = int(os.environ.get('OUTBOX_CLAIM_SECONDS', '300'))  # How long a dispatcher owns a message before the sweep may retry it
+
+# Appointment follow-ups
+FOLLOWUP_BATCH_SIZE = int(os.environ.get('FOLLOWUP_BATCH_SIZE', '200'))  # Appointments per Celery task
+FOLLOWUP_SMS_WORKERS = int(os.environ.get('FOLLOWUP_SMS_WORKERS', '8'))  # Concurrent Twilio requests per task
 
 # Channels Configuration
 CHANNEL_LAYERS = {
@@ -260,12 +283,65 @@ EMAIL_PORT = int(os.environ.get('EMAIL_PORT', '587'))
 EMAIL_USE_TLS = True
 EMAIL_HOST_USER = os.environ.get('EMAIL_HOST_USER', '')
 EMAIL_HOST_PASSWORD = os.environ.get('EMAIL_HOST_PASSWORD', '')
+EMAIL_BATCH_SIZE = int(os.environ.get('EMAIL_BATCH_SIZE', '50'))  # Messages sent per SMTP session before reconnecting
 
 # Twilio settings
 TWILIO_ACCOUNT_SID = os.environ.get('TWILIO_ACCOUNT_SID', '')
 TWILIO_AUTH_TOKEN = os.environ.get('TWILIO_AUTH_TOKEN', '')
 TWILIO_PHONE_NUMBER = os.environ.get('TWILIO_PHONE_NUMBER', '')
 
+# Pharmacy stock alerts
+LOW_STOCK_CACHE_SECONDS = int(os.environ.get('LOW_STOCK_CACHE_SECONDS', '3600'))
+LOW_STOCK_NOTIFY_ROLES = ['Pharmacist', 'Admin']  # Role names that receive the low-stock summary
+
+# End-of-day billing (core.billing.generate_bills_for_day)
+BILLING_CONSULTATION_SERVICE_CODE = os.environ.get('BILLING_CONSULTATION_SERVICE_CODE', 'CONSULT')  # ServiceCatalog code charged per encounter
+
+# Demand forecasting and reorder suggestions (core.forecasting)
+FORECAST_HISTORY_DAYS = int(os.environ.get('FORECAST_HISTORY_DAYS', '90'))
+FORECAST_MOVING_AVERAGE_DAYS = int(os.environ.get('FORECAST_MOVING_AVERAGE_DAYS', '28'))
+FORECAST_SMOOTHING_ALPHA = float(os.environ.get('FORECAST_SMOOTHING_ALPHA', '0.3'))
+REORDER_LEAD_TIME_DAYS = int(os.environ.get('REORDER_LEAD_TIME_DAYS', '7'))
+REORDER_COVER_DAYS = int(os.environ.get('REORDER_COVER_DAYS', '30'))  # Days of demand an order should cover
+REORDER_SERVICE_Z = float(os.environ.get('REORDER_SERVICE_Z', '1.65'))  # ~95% service level
+
+# PDF invoices, receipts and statements (core.documents)
+HOSPITAL_NAME = os.environ.get('HOSPITAL_NAME', 'Chelal Hospital')
+STATEMENT_BATCH_SIZE = int(os.environ.get('STATEMENT_BATCH_SIZE', '50'))  # Patients per statement-rendering Celery task
+
+# Columnar analytics extract (core.analytics)
+ANALYTICS_ROOT = os.environ.get('ANALYTICS_ROOT', os.path.join(BASE_DIR, 'analytics'))  # Parquet files, partitioned by month
+ANALYTICS_REFRESH_MONTHS = int(os.environ.get('ANALYTICS_REFRESH_MONTHS', '6'))  # Recent months re-extracted nightly; covers the quality dashboard's 150 days
+
+# Asynchronous report jobs (core.report_jobs)
+REPORT_JOB_STATEMENT_TIMEOUT_SECONDS = int(os.environ.get('REPORT_JOB_STATEMENT_TIMEOUT_SECONDS', '300'))  # Per-query limit inside a report run
+REPORT_JOB_TIME_LIMIT_SECONDS = int(os.environ.get('REPORT_JOB_TIME_LIMIT_SECONDS', '900'))  # Celery soft time limit per report
+REPORT_JOB_RETENTION_DAYS = int(os.environ.get('REPORT_JOB_RETENTION_DAYS', '7'))  # Finished jobs and files kept this long
+
+# Outbound HTTP (core.http_client): per-dependency overrides of timeout, retries,
+# backoff_factor, pool_maxsize, failure_threshold and reset_timeout
+HTTP_CLIENT_POLICIES = {}
+
+# RxNorm lookups (local RxConcept table loaded with `manage.py load_rxnorm`)
+RXNORM_CACHE_SIZE = int(os.environ.get('RXNORM_CACHE_SIZE', '4096'))
+RXNORM_REMOTE_FALLBACK = os.environ.get('RXNORM_REMOTE_FALLBACK', 'False').lower() == 'true'  # Ask RxNav for unknown names
+RXNORM_MISS_CACHE_SECONDS = int(os.environ.get('RXNORM_MISS_CACHE_SECONDS', '3600'))  # How long an unknown name is remembered
+RXNORM_VERSION_CHECK_SECONDS = int(os.environ.get('RXNORM_VERSION_CHECK_SECONDS', '300'))  # How often workers look for a reloaded RxNorm release
+INTERACTION_INDEX_CHECK_SECONDS = int(os.environ.get('INTERACTION_INDEX_CHECK_SECONDS', '300'))  # How often workers look for a reloaded dataset
+ACTIVE_PRESCRIPTION_DAYS = int(os.environ.get('ACTIVE_PRESCRIPTION_DAYS', '90'))  # Prescriptions this recent count as active
+
+# Google Calendar settings
+GOOGLE_CLIENT_ID = os.environ.get('GOOGLE_CLIENT_ID', '')
+GOOGLE_CLIENT_SECRET = os.environ.get('GOOGLE_CLIENT_SECRET', '')
+GOOGLE_REDIRECT_URI = os.environ.get('GOOGLE_REDIRECT_URI', '')
+# Point the Calendar client at a local mock of the REST API (e.g. http://127.0.0.1:8099/)
+GOOGLE_CALENDAR_API_ENDPOINT = os.environ.get('GOOGLE_CALENDAR_API_ENDPOINT', '')
+GOOGLE_CALENDAR_SYNC_PAST_DAYS = int(os.environ.get('GOOGLE_CALENDAR_SYNC_PAST_DAYS', '90'))  # Window of the first full sync
+GOOGLE_CALENDAR_STALE_MINUTES = int(os.environ.get('GOOGLE_CALENDAR_STALE_MINUTES', '10'))  # Re-sync on read when older
+GOOGLE_TOKEN_REFRESH_MARGIN_MINUTES = int(os.environ.get('GOOGLE_TOKEN_REFRESH_MARGIN_MINUTES', '15'))  # Refresh this long before expiry
+GOOGLE_CREDENTIALS_CACHE_SECONDS = int(os.environ.get('GOOGLE_CREDENTIALS_CACHE_SECONDS', '300'))
+GOOGLE_CREDENTIALS_CACHE_SIZE = int(os.environ.get('GOOGLE_CREDENTIALS_CACHE_SIZE', '256'))  # Credentials kept per worker process (LRU)
+
 # Logging configuration
 LOGGING = {
     'version': 1,
@@ -1,9 +1,24 @@
 from django.contrib import admin
 from .models import (
     Role, User, Patient, Appointment, Encounter, Prescription, Medication,
-    Bill, BillItem, Payment, Notification, AuditLog, LoginActivity, SystemSetting
+    Bill, BillItem, Payment, Notification, AuditLog, LoginActivity, SystemSetting,
+    OutboxMessage, GoogleCalendarToken, CalendarEvent,
+    RxConcept, DrugInteraction, StockBatch, DispensingLog,
+    StockMovement, StockSnapshot, ExpirySummary, ReorderSuggestion,
+    ReceivablesAgingSnapshot, ServiceCatalog, ReportJob
 )
 
+
+class StockMovementAdmin(admin.ModelAdmin):
+    """The stock ledger is append-only, so it is read-only here too."""
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
 # Register core models
 admin.site.register(Role)
 admin.site.register(User)
@@ -19,3 +34,17 @@ admin.site.register(Notification)
 admin.site.register(AuditLog)
 admin.site.register(LoginActivity)
 admin.site.register(SystemSetting)
+admin.site.register(OutboxMessage)
+admin.site.register(GoogleCalendarToken)
+admin.site.register(CalendarEvent)
+admin.site.register(RxConcept)
+admin.site.register(DrugInteraction)
+admin.site.register(StockBatch)
+admin.site.register(DispensingLog)
+admin.site.register(StockMovement, StockMovementAdmin)
+admin.site.register(StockSnapshot)
+admin.site.register(ExpirySummary)
+admin.site.register(ReorderSuggestion)
+admin.site.register(ReceivablesAgingSnapshot)
+admin.site.register(ServiceCatalog)
+admin.site.register(ReportJob)
\ No newline at end of file
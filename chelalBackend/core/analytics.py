@@ -0,0 +1,409 @@
+"""
+Columnar analytics extract and the research, quality and staff dashboards
+built on it.
+
+The nightly job copies Patient, Appointment, Encounter, Prescription, Bill
+and Payment facts into zstd-compressed Parquet files under ANALYTICS_ROOT,
+one hive-style partition per month (<fact>/month=YYYY-MM/part-0.parquet).
+Each partition is written to a hidden directory and swapped in whole, so
+readers never see a half-written month. Only the last
+ANALYTICS_REFRESH_MONTHS months are re-extracted; a full run rebuilds
+everything. Facts are denormalized (prescriptions and payments carry their
+patient and doctor ids) so the dashboards are plain column scans, group-bys
+and count-distincts in Arrow that never touch the OLTP database.
+"""
+import json
+import logging
+import os
+import shutil
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from django.conf import settings
+from django.db import models
+from django.utils import timezone
+
+from .models import Patient, Appointment, Encounter, Prescription, Bill, Payment, User
+
+logger = logging.getLogger(__name__)
+
+TIMESTAMP = pa.timestamp('us', tz='UTC')
+MONEY = pa.decimal128(12, 2)
+BATCH_ROWS = 50000
+
+# name -> (model, partition field, [(column, ORM path, Arrow type)])
+FACTS = {
+    'patients': (Patient, 'created_at', [
+        ('id', 'id', pa.int32()), ('gender', 'gender', pa.string()),
+        ('date_of_birth', 'date_of_birth', pa.date32()), ('created_at', 'created_at', TIMESTAMP),
+    ]),
+    'appointments': (Appointment, 'date', [
+        ('id', 'id', pa.int32()), ('patient_id', 'patient_id', pa.int32()), ('doctor_id', 'doctor_id', pa.int32()),
+        ('date', 'date', pa.date32()), ('status', 'status', pa.string()),
+    ]),
+    'encounters': (Encounter, 'created_at', [
+        ('id', 'id', pa.int32()), ('patient_id', 'patient_id', pa.int32()), ('doctor_id', 'doctor_id', pa.int32()),
+        ('appointment_id', 'appointment_id', pa.int32()), ('diagnosis', 'diagnosis', pa.string()),
+        ('created_at', 'created_at', TIMESTAMP),
+    ]),
+    'prescriptions': (Prescription, 'created_at', [
+        ('id', 'id', pa.int32()), ('encounter_id', 'encounter_id', pa.int32()),
+        ('patient_id', 'encounter__patient_id', pa.int32()), ('doctor_id', 'encounter__doctor_id', pa.int32()),
+        ('medication_name', 'medication_name', pa.string()), ('created_at', 'created_at', TIMESTAMP),
+    ]),
+    'bills': (Bill, 'date_issued', [
+        ('id', 'id', pa.int32()), ('patient_id', 'patient_id', pa.int32()), ('encounter_id', 'encounter_id', pa.int32()),
+        ('total_amount', 'total_amount', MONEY), ('paid_amount', 'paid_amount', MONEY),
+        ('date_issued', 'date_issued', TIMESTAMP),
+    ]),
+    'payments': (Payment, 'payment_date', [
+        ('id', 'id', pa.int32()), ('bill_id', 'bill_id', pa.int32()), ('patient_id', 'bill__patient_id', pa.int32()),
+        ('amount', 'amount', MONEY), ('method', 'method', pa.string()), ('payment_date', 'payment_date', TIMESTAMP),
+    ]),
+}
+# Small dimension, rewritten whole on every run
+STAFF_COLUMNS = [
+    ('id', 'id', pa.int32()), ('first_name', 'first_name', pa.string()),
+    ('last_name', 'last_name', pa.string()), ('role', 'role__name', pa.string()),
+]
+PARTITIONING = ds.partitioning(pa.schema([('month', pa.string())]), flavor='hive')
+
+
+class ExtractMissing(Exception):
+    """The analytics extract has not been written yet."""
+
+
+def analytics_root():
+    return getattr(settings, 'ANALYTICS_ROOT', os.path.join(settings.BASE_DIR, 'analytics'))
+
+
+def _month_start(day):
+    return day.replace(day=1)
+
+
+def _next_month(day):
+    return (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def _bounds(model, field, month):
+    """Filter kwargs selecting one local calendar month of `field`."""
+    start, end = month, _next_month(month)
+    if isinstance(model._meta.get_field(field), models.DateTimeField):
+        start = timezone.make_aware(datetime.combine(start, datetime.min.time()))
+        end = timezone.make_aware(datetime.combine(end, datetime.min.time()))
+    return {f'{field}__gte': start, f'{field}__lt': end}
+
+
+def _schema(columns):
+    return pa.schema([(name, arrow_type) for name, _, arrow_type in columns])
+
+
+def _write(queryset, columns, path):
+    """Stream a queryset into a Parquet file in BATCH_ROWS row groups. Returns the row count."""
+    schema = _schema(columns)
+    rows = 0
+    with pq.ParquetWriter(path, schema, compression='zstd') as writer:
+        batch = []
+        for row in queryset.values_list(*[orm for _, orm, _ in columns]).iterator(chunk_size=5000):
+            batch.append(row)
+            if len(batch) >= BATCH_ROWS:
+                writer.write_table(_to_table(batch, schema))
+                rows += len(batch)
+                batch = []
+        if batch or not rows:
+            writer.write_table(_to_table(batch, schema))
+            rows += len(batch)
+    return rows
+
+
+def _to_table(rows, schema):
+    columns = list(zip(*rows)) if rows else [[] for _ in schema]
+    return pa.Table.from_arrays([pa.array(values, type=field.type) for values, field in zip(columns, schema)], schema=schema)
+
+
+def _swap_in(tmp_dir, final_dir):
+    old_dir = None
+    if os.path.exists(final_dir):
+        old_dir = f'{tmp_dir}.old'
+        os.replace(final_dir, old_dir)
+    os.replace(tmp_dir, final_dir)
+    if old_dir:
+        shutil.rmtree(old_dir, ignore_errors=True)
+
+
+def extract_month(name, month):
+    """(Re)write one month partition of a fact. Returns the number of rows."""
+    model, field, columns = FACTS[name]
+    table_dir = os.path.join(analytics_root(), name)
+    tmp_dir = os.path.join(table_dir, f'.month={month:%Y-%m}.tmp')
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    queryset = model.objects.filter(**_bounds(model, field, month)).order_by(field, 'id')
+    rows = _write(queryset, columns, os.path.join(tmp_dir, 'part-0.parquet'))
+    _swap_in(tmp_dir, os.path.join(table_dir, f'month={month:%Y-%m}'))
+    return rows
+
+
+def _first_month(name):
+    model, field, _ = FACTS[name]
+    first = model.objects.order_by(field).values_list(field, flat=True).first()
+    if first is None:
+        return None
+    return _month_start(timezone.localtime(first).date() if isinstance(first, datetime) else first)
+
+
+def run_extract(full=False, today=None):
+    """
+    Extract every fact for the last ANALYTICS_REFRESH_MONTHS months, or for all
+    months when `full` (or when a fact has never been extracted).
+    :return: manifest dict with per-fact row counts
+    """
+    started = time.perf_counter()
+    today = today or timezone.localdate()
+    root = analytics_root()
+    os.makedirs(root, exist_ok=True)
+    refresh_months = getattr(settings, 'ANALYTICS_REFRESH_MONTHS', 6)
+    recent = _month_start(today)
+    for _ in range(refresh_months - 1):
+        recent = _month_start(recent - timedelta(days=1))
+
+    tables = {}
+    for name in FACTS:
+        first = recent
+        if full or not os.path.isdir(os.path.join(root, name)):
+            first = min(_first_month(name) or recent, recent)
+        month, rows, months = first, 0, 0
+        while month <= today:
+            rows += extract_month(name, month)
+            months += 1
+            month = _next_month(month)
+        tables[name] = {'rows': rows, 'months': months, 'from': first.isoformat()}
+
+    staff_dir = os.path.join(root, 'staff')
+    tmp_dir = os.path.join(root, '.staff.tmp')
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    staff = User.objects.filter(is_active=True).order_by('id')
+    tables['staff'] = {'rows': _write(staff, STAFF_COLUMNS, os.path.join(tmp_dir, 'part-0.parquet'))}
+    _swap_in(tmp_dir, staff_dir)
+
+    manifest = {
+        'extracted_at': timezone.now().isoformat(),
+        'full': full,
+        'seconds': round(time.perf_counter() - started, 3),
+        'tables': tables,
+    }
+    with open(os.path.join(root, '.manifest.json.tmp'), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(os.path.join(root, '.manifest.json.tmp'), os.path.join(root, 'manifest.json'))
+    logger.info(f"Analytics extract finished in {manifest['seconds']}s: {tables}")
+    return manifest
+
+
+def manifest():
+    try:
+        with open(os.path.join(analytics_root(), 'manifest.json')) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        raise ExtractMissing('The analytics extract has not run yet.')
+
+
+def load(name, columns=None, since=None):
+    """Read a fact as an Arrow table, pruning month partitions before `since` (a date)."""
+    path = os.path.join(analytics_root(), name)
+    if not os.path.isdir(path):
+        raise ExtractMissing(f'No analytics extract for {name}.')
+    if name == 'staff':
+        return ds.dataset(path, format='parquet').to_table(columns=columns)
+    dataset = ds.dataset(path, format='parquet', partitioning=PARTITIONING)
+    filter_ = ds.field('month') >= f'{since:%Y-%m}' if since else None
+    return dataset.to_table(columns=columns, filter=filter_)
+
+
+# Query layer
+
+def _since(table, column, start):
+    """Rows of `table` whose `column` (date or UTC timestamp) falls on or after local date `start`."""
+    if pa.types.is_timestamp(table.schema.field(column).type):
+        bound = pa.scalar(timezone.make_aware(datetime.combine(start, datetime.min.time())), type=TIMESTAMP)
+    else:
+        bound = pa.scalar(start, type=pa.date32())
+    return table.filter(pc.greater_equal(table[column], bound))
+
+
+def _rows(table, sort_by=None, limit=None):
+    if sort_by:
+        table = table.sort_by(sort_by)
+    if limit is not None:
+        table = table.slice(0, limit)
+    return table.to_pylist()
+
+
+def _rate(part, whole):
+    return round(part * 100.0 / whole, 2) if whole else 0
+
+
+def research_dashboard(today=None):
+    """Cohort demographics, monthly encounter volumes and the commonest diagnoses and medications."""
+    today = today or timezone.localdate()
+    year_ago, quarter_ago = _month_start(today).replace(year=today.year - 1), today - timedelta(days=90)
+
+    patients = load('patients', ['gender', 'date_of_birth'])
+    ages = pc.divide(pc.cast(pc.days_between(patients['date_of_birth'], pa.scalar(today, pa.date32())), pa.float64()), 365.25)
+    bands = np.digitize(ages.to_numpy(zero_copy_only=False), [5, 18, 40, 65])
+    band_labels = ['0-4', '5-17', '18-39', '40-64', '65+']
+    by_gender = patients.group_by('gender').aggregate([('gender', 'count')]).rename_columns(['gender', 'patients'])
+
+    encounters = load('encounters', ['id', 'patient_id', 'diagnosis', 'month'], since=year_ago)
+    monthly = encounters.group_by('month').aggregate([('id', 'count'), ('patient_id', 'count_distinct')])
+    monthly = monthly.rename_columns(['month', 'encounters', 'patients'])
+
+    recent = _since(load('encounters', ['patient_id', 'diagnosis', 'created_at'], since=quarter_ago), 'created_at', quarter_ago)
+    recent = recent.append_column('condition', pc.utf8_lower(pc.utf8_trim_whitespace(recent['diagnosis'])))
+    recent = recent.filter(pc.not_equal(recent['condition'], ''))
+    diagnoses = recent.group_by('condition').aggregate([('patient_id', 'count'), ('patient_id', 'count_distinct')])
+    diagnoses = diagnoses.rename_columns(['diagnosis', 'encounters', 'patients'])
+
+    prescriptions = _since(load('prescriptions', ['patient_id', 'medication_name', 'created_at'], since=quarter_ago), 'created_at', quarter_ago)
+    medications = prescriptions.group_by('medication_name').aggregate([('patient_id', 'count'), ('patient_id', 'count_distinct')])
+    medications = medications.rename_columns(['medication', 'prescriptions', 'patients'])
+
+    return {
+        'cohort': {
+            'total_patients': patients.num_rows,
+            'by_gender': _rows(by_gender, [('patients', 'descending')]),
+            'by_age_band': [
+                {'age_band': label, 'patients': int((bands == i).sum())} for i, label in enumerate(band_labels)
+            ],
+        },
+        'encounters_by_month': _rows(monthly, [('month', 'ascending')]),
+        'encounters_last_90_days': recent.num_rows,
+        'patients_seen_last_90_days': len(pc.unique(recent['patient_id'])),
+        'top_diagnoses': _rows(diagnoses, [('patients', 'descending'), ('encounters', 'descending'), ('diagnosis', 'ascending')], 10),
+        'top_medications': _rows(medications, [('patients', 'descending'), ('prescriptions', 'descending'), ('medication', 'ascending')], 10),
+        'date_range': 'Last 12 months for trends, last 90 days for top lists',
+    }
+
+
+def _return_visits(encounters, window_days):
+    """Encounters that follow the same patient's previous encounter within `window_days`."""
+    if encounters.num_rows < 2:
+        return 0
+    patients = encounters['patient_id'].to_numpy()
+    seen = pc.cast(encounters['created_at'], pa.int64()).to_numpy()
+    order = np.lexsort((seen, patients))
+    patients, seen = patients[order], seen[order]
+    window = window_days * 86400 * 1_000_000
+    return int(((patients[1:] == patients[:-1]) & (seen[1:] - seen[:-1] <= window)).sum())
+
+
+def quality_dashboard(today=None):
+    """Appointment outcomes, 30-day return visits, prescribing intensity and billing collection."""
+    today = today or timezone.localdate()
+    since = _month_start(today - timedelta(days=150))
+    quarter_ago = today - timedelta(days=90)
+
+    appointments = load('appointments', ['id', 'status', 'month'], since=since)
+    outcomes = {}
+    for row in appointments.group_by(['month', 'status']).aggregate([('id', 'count')]).to_pylist():
+        outcomes.setdefault(row['month'], {})[row['status']] = row['id_count']
+    appointment_outcomes = []
+    for month in sorted(outcomes):
+        counts = outcomes[month]
+        total = sum(counts.values())
+        appointment_outcomes.append({
+            'month': month, 'total': total,
+            'completed': counts.get('completed', 0), 'cancelled': counts.get('cancelled', 0),
+            'completion_rate': _rate(counts.get('completed', 0), total),
+            'cancellation_rate': _rate(counts.get('cancelled', 0), total),
+        })
+
+    encounters = _since(load('encounters', ['id', 'patient_id', 'created_at'], since=quarter_ago), 'created_at', quarter_ago)
+    returns = _return_visits(encounters, 30)
+    prescriptions = _since(load('prescriptions', ['encounter_id', 'created_at'], since=quarter_ago), 'created_at', quarter_ago)
+
+    bills = load('bills', ['id', 'total_amount', 'paid_amount', 'date_issued', 'month'], since=since)
+    payments = load('payments', ['bill_id', 'payment_date'], since=since)
+    first_payment = payments.group_by('bill_id').aggregate([('payment_date', 'min')])
+    settled = bills.join(first_payment, keys='id', right_keys='bill_id', join_type='inner')
+    days_to_payment = pc.divide(
+        pc.cast(pc.subtract(pc.cast(settled['payment_date_min'], pa.int64()), pc.cast(settled['date_issued'], pa.int64())), pa.float64()),
+        86400 * 1e6,
+    )
+    collection = []
+    for row in bills.group_by('month').aggregate([('total_amount', 'sum'), ('paid_amount', 'sum'), ('id', 'count')]).sort_by('month').to_pylist():
+        billed, paid = row['total_amount_sum'] or 0, row['paid_amount_sum'] or 0
+        collection.append({
+            'month': row['month'], 'bills': row['id_count'], 'billed': float(billed), 'collected': float(paid),
+            'collection_rate': _rate(float(paid), float(billed)),
+        })
+
+    return {
+        'appointment_outcomes': appointment_outcomes,
+        'return_visits': {
+            'encounters': encounters.num_rows,
+            'within_30_days': returns,
+            'return_rate': _rate(returns, encounters.num_rows),
+            'date_range': 'Last 90 days',
+        },
+        'prescribing': {
+            'prescriptions': prescriptions.num_rows,
+            'encounters_with_prescriptions': len(pc.unique(prescriptions['encounter_id'])),
+            'per_encounter': round(prescriptions.num_rows / encounters.num_rows, 2) if encounters.num_rows else 0,
+        },
+        'billing': {
+            'collection_by_month': collection,
+            'median_days_to_first_payment': (
+                round(float(np.median(days_to_payment.to_numpy(zero_copy_only=False))), 1) if settled.num_rows else None
+            ),
+        },
+    }
+
+
+def staff_dashboard(today=None, days=30):
+    """Per-clinician appointments, completion rate, encounters, distinct patients and prescriptions."""
+    today = today or timezone.localdate()
+    start = today - timedelta(days=days)
+
+    appointments = _since(load('appointments', ['doctor_id', 'status', 'date'], since=start), 'date', start)
+    appointments = appointments.append_column('completed', pc.cast(pc.equal(appointments['status'], 'completed'), pa.int64()))
+    by_appointments = appointments.group_by('doctor_id').aggregate([('status', 'count'), ('completed', 'sum')])
+    encounters = _since(load('encounters', ['doctor_id', 'patient_id', 'created_at'], since=start), 'created_at', start)
+    by_encounters = encounters.group_by('doctor_id').aggregate([('patient_id', 'count'), ('patient_id', 'count_distinct')])
+    prescriptions = _since(load('prescriptions', ['doctor_id', 'created_at'], since=start), 'created_at', start)
+    by_prescriptions = prescriptions.group_by('doctor_id').aggregate([('doctor_id', 'count')])
+
+    stats = {}
+    for row in by_appointments.to_pylist():
+        stats.setdefault(row['doctor_id'], {})
+        stats[row['doctor_id']].update(appointments=row['status_count'], completed_appointments=row['completed_sum'])
+    for row in by_encounters.to_pylist():
+        stats.setdefault(row['doctor_id'], {})
+        stats[row['doctor_id']].update(encounters=row['patient_id_count'], patients_seen=row['patient_id_count_distinct'])
+    for row in by_prescriptions.to_pylist():
+        stats.setdefault(row['doctor_id'], {})['prescriptions'] = row['doctor_id_count']
+
+    staff = {row['id']: row for row in load('staff').to_pylist()}
+    providers = []
+    for doctor_id, values in stats.items():
+        person = staff.get(doctor_id, {})
+        appointments_total = values.get('appointments', 0)
+        providers.append({
+            'id': doctor_id,
+            'first_name': person.get('first_name', ''),
+            'last_name': person.get('last_name', ''),
+            'role': person.get('role'),
+            'appointments': appointments_total,
+            'completed_appointments': values.get('completed_appointments', 0),
+            'completion_rate': _rate(values.get('completed_appointments', 0), appointments_total),
+            'encounters': values.get('encounters', 0),
+            'patients_seen': values.get('patients_seen', 0),
+            'prescriptions': values.get('prescriptions', 0),
+        })
+    providers.sort(key=lambda p: (-p['encounters'], -p['appointments'], p['id']))
+    return {'providers': providers, 'date_range': f'Last {days} days'}
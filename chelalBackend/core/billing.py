@@ -0,0 +1,179 @@
+"""
+Bill totals.
+
+`Bill.total_amount` and `Bill.paid_amount` are running sums kept current by
+single UPDATE statements with F() deltas whenever a BillItem or Payment is
+saved or deleted, and `is_paid` is recomputed inside the same statement. Two
+cashiers posting at once can therefore never lose each other's payment, and
+nothing has to re-aggregate a bill's items or payments.
+
+Receivables aging is one grouped query over open bills (partial index on
+date_issued WHERE NOT is_paid) with a CASE expression picking the bucket;
+a nightly snapshot keeps each day's figures for comparison.
+
+End-of-day billing turns every unbilled encounter into a Bill priced from
+ServiceCatalog, in chunked transactions using bulk_create. Because a bill
+can reference an encounter only once, re-running a day is a no-op.
+"""
+import logging
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, CharField, Count, F, Sum, Value, When
+from django.db.models.lookups import LessThanOrEqual
+from django.utils import timezone
+
+from .models import Bill, BillItem, Encounter, Prescription, ReceivablesAgingSnapshot, ServiceCatalog
+
+logger = logging.getLogger(__name__)
+
+ZERO = Decimal('0')
+
+
+def apply_bill_delta(bill_id, total_delta=ZERO, paid_delta=ZERO):
+    """Atomically add to a bill's total and paid amounts and refresh is_paid."""
+    if not bill_id or (not total_delta and not paid_delta):
+        return
+    # Every right-hand side below sees the row as it was before this UPDATE
+    new_total = F('total_amount') + Value(total_delta)
+    new_paid = F('paid_amount') + Value(paid_delta)
+    Bill.objects.filter(pk=bill_id).update(
+        total_amount=new_total,
+        paid_amount=new_paid,
+        is_paid=Case(
+            When(LessThanOrEqual(new_total, Value(ZERO)), then=Value(False)),
+            When(LessThanOrEqual(new_total, new_paid), then=Value(True)),
+            default=Value(False),
+        ),
+    )
+
+
+def line_total(item):
+    return Decimal(item.amount) * item.quantity
+
+
+# (label, minimum age in days) from oldest to newest
+AGING_BUCKETS = [('90+', 91), ('61-90', 61), ('31-60', 31), ('0-30', 0)]
+
+
+def receivables_aging(now=None):
+    """
+    Outstanding balances of open bills bucketed by age, in one query.
+    :return: list of {'bucket', 'bill_count', 'outstanding'} for every bucket, newest first
+    """
+    now = now or timezone.now()
+    bucket = Case(
+        *[When(date_issued__lte=now - timedelta(days=min_days), then=Value(label)) for label, min_days in AGING_BUCKETS[:-1]],
+        default=Value(AGING_BUCKETS[-1][0]),
+        output_field=CharField(),
+    )
+    rows = (
+        Bill.objects.filter(is_paid=False, total_amount__gt=F('paid_amount'))
+        .annotate(bucket=bucket)
+        .values('bucket')
+        .annotate(bill_count=Count('id'), outstanding=Sum(F('total_amount') - F('paid_amount')))
+    )
+    found = {row['bucket']: row for row in rows}
+    return [
+        {
+            'bucket': label,
+            'bill_count': found.get(label, {}).get('bill_count', 0),
+            'outstanding': found.get(label, {}).get('outstanding') or ZERO,
+        }
+        for label, _ in reversed(AGING_BUCKETS)
+    ]
+
+
+def snapshot_receivables_aging(as_of=None):
+    """Store today's aging buckets (replacing any earlier snapshot for the same day)."""
+    as_of = as_of or timezone.localdate()
+    buckets = receivables_aging()
+    with transaction.atomic():
+        ReceivablesAgingSnapshot.objects.filter(as_of=as_of).delete()
+        ReceivablesAgingSnapshot.objects.bulk_create([
+            ReceivablesAgingSnapshot(as_of=as_of, **bucket) for bucket in buckets
+        ])
+    logger.info(f"Saved receivables aging snapshot for {as_of}")
+    return buckets
+
+
+def _day_bounds(day):
+    start = timezone.make_aware(datetime.combine(day, datetime.min.time()))
+    return start, start + timedelta(days=1)
+
+
+def generate_bills_for_day(day=None, chunk_size=500):
+    """
+    Bill every unbilled encounter created on `day` (default: today): one
+    consultation line from BILLING_CONSULTATION_SERVICE_CODE plus one line per
+    prescription whose medication name matches an active catalog entry.
+    :return: dict with bills/items created, unpriced prescriptions and timing
+    """
+    started = time.perf_counter()
+    day = day or timezone.localdate()
+    start, end = _day_bounds(day)
+    catalog = {
+        name.lower(): (name, price)
+        for name, price in ServiceCatalog.objects.filter(is_active=True).values_list('name', 'price')
+    }
+    consultation = (
+        ServiceCatalog.objects.filter(code=getattr(settings, 'BILLING_CONSULTATION_SERVICE_CODE', 'CONSULT'), is_active=True)
+        .values_list('name', 'price').first()
+    )
+    summary = {'date': day, 'bills': 0, 'items': 0, 'unpriced': []}
+
+    unbilled = (
+        Encounter.objects.filter(created_at__gte=start, created_at__lt=end, bill__isnull=True)
+        .order_by('id')
+    )
+    last_id = 0
+    while True:
+        with transaction.atomic():
+            # Concurrent runs take disjoint chunks; the unique constraint is the backstop
+            encounters = list(
+                unbilled.filter(id__gt=last_id).select_for_update(skip_locked=True, of=('self',))
+                .values_list('id', 'patient_id')[:chunk_size]
+            )
+            if not encounters:
+                break
+            last_id = encounters[-1][0]
+            prescriptions = {}
+            for encounter_id, medication_name in Prescription.objects.filter(
+                    encounter_id__in=[e[0] for e in encounters]).values_list('encounter_id', 'medication_name'):
+                prescriptions.setdefault(encounter_id, []).append(medication_name)
+
+            bills, lines = [], []
+            for encounter_id, patient_id in encounters:
+                items = [consultation] if consultation else []
+                for medication_name in prescriptions.get(encounter_id, []):
+                    priced = catalog.get(medication_name.strip().lower())
+                    if priced:
+                        items.append(priced)
+                    else:
+                        summary['unpriced'].append({'encounter': encounter_id, 'medication': medication_name})
+                if not items:
+                    continue
+                bills.append(Bill(
+                    patient_id=patient_id,
+                    encounter_id=encounter_id,
+                    # bulk_create skips the item signals, so the total is set up front
+                    total_amount=sum(price for _, price in items),
+                    notes=f'Generated from encounter {encounter_id} on {day}',
+                ))
+                lines.append(items)
+
+            Bill.objects.bulk_create(bills)
+            BillItem.objects.bulk_create([
+                BillItem(bill=bill, description=name, amount=price, quantity=1)
+                for bill, items in zip(bills, lines)
+                for name, price in items
+            ])
+            summary['bills'] += len(bills)
+            summary['items'] += sum(len(items) for items in lines)
+
+    summary['seconds'] = round(time.perf_counter() - started, 3)
+    logger.info(f"Generated {summary['bills']} bills ({summary['items']} items) for {day} in {summary['seconds']}s")
+    return summary
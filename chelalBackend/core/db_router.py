@@ -0,0 +1,188 @@
+"""
+Read-replica routing for report, dashboard, analytics, export and list endpoints.
+
+ReplicaRoutingMiddleware marks GET/HEAD requests to those endpoints as
+replica-eligible; ReplicaRouter then sends their reads to the `replica`
+alias while every write, migration and all other traffic stays on `default`.
+Reads fall back to the primary when:
+
+- the replica is more than REPLICA_MAX_LAG_SECONDS behind (or unreachable),
+  measured at most every REPLICA_LAG_CHECK_SECONDS per process;
+- the requesting user wrote something within the last REPLICA_STICKY_SECONDS
+  (read-your-writes), the current request has itself written, or a
+  transaction is open on the primary.
+
+Nothing is routed unless settings.DATABASES defines `replica`, so a single
+database deployment behaves exactly as before. Locally, point
+REPLICA_DATABASE_URL at the same database as DATABASE_URL to exercise both
+aliases.
+"""
+import logging
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.utils.functional import empty
+
+logger = logging.getLogger(__name__)
+
+PRIMARY = 'default'
+REPLICA = 'replica'
+READ_METHODS = ('GET', 'HEAD')
+# URL names (see core/urls.py) whose GETs are read-only reporting traffic
+REPLICA_URL_PREFIXES = ('dashboard', 'report_', 'analytics_', 'export')
+REPLICA_URL_SUFFIXES = ('-list',)
+
+_routing = ContextVar('replica_routing', default=None)
+_lag = {'seconds': None, 'checked_at': None}
+
+
+class RoutingState:
+    """Per-request routing decision inputs."""
+
+    def __init__(self, request):
+        self.request = request
+        self.eligible = False
+        self.wrote = False
+        self.pinned = None
+
+    def user_id(self):
+        user = getattr(self.request, 'user', None)
+        if user is None or getattr(user, '_wrapped', None) is empty:
+            # Never resolve the lazy session user from inside the router: that would query (and route) itself
+            return None
+        return user.pk if user.is_authenticated else None
+
+
+def replica_configured():
+    return REPLICA in settings.DATABASES
+
+
+def _pin_key(user_id):
+    return f'replica:pin:{user_id}'
+
+
+def pin_to_primary(user_id):
+    """Send this user's reads to the primary for REPLICA_STICKY_SECONDS."""
+    try:
+        cache.set(_pin_key(user_id), 1, getattr(settings, 'REPLICA_STICKY_SECONDS', 10))
+    except Exception as e:
+        logger.warning(f"Could not pin user {user_id} to the primary database: {str(e)}")
+
+
+def is_pinned(user_id):
+    try:
+        return cache.get(_pin_key(user_id)) is not None
+    except Exception:
+        # Without the pin we cannot promise read-your-writes, so stay on the primary
+        return True
+
+
+def measure_replica_lag():
+    """Seconds the replica is behind the primary; None when it cannot be measured (e.g. it is down)."""
+    try:
+        connection = connections[REPLICA]
+        if connection.vendor != 'postgresql':
+            # Local two-alias setups point both aliases at one database
+            return 0.0
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT CASE WHEN NOT pg_is_in_recovery() "
+                "OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+                "ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END"
+            )
+            lag = cursor.fetchone()[0]
+        return float(lag or 0)
+    except Exception as e:
+        logger.warning(f"Could not measure replica lag: {str(e)}")
+        return None
+
+
+def replica_lag():
+    """Replica lag, re-measured at most every REPLICA_LAG_CHECK_SECONDS in this process."""
+    now = time.monotonic()
+    if _lag['checked_at'] is None or now - _lag['checked_at'] >= getattr(settings, 'REPLICA_LAG_CHECK_SECONDS', 5):
+        _lag['seconds'] = measure_replica_lag()
+        _lag['checked_at'] = now
+    return _lag['seconds']
+
+
+def replica_healthy():
+    lag = replica_lag()
+    return lag is not None and lag <= getattr(settings, 'REPLICA_MAX_LAG_SECONDS', 5)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _routing.get()
+        if state is None or not state.eligible or state.wrote or not replica_configured():
+            return PRIMARY
+        if connections[PRIMARY].in_atomic_block:
+            # Reads inside a transaction on the primary must see that transaction
+            return PRIMARY
+        if state.pinned is None:
+            user_id = state.user_id()
+            if user_id is None:
+                # Authentication has not run yet; decide once the user is known
+                return PRIMARY
+            state.pinned = is_pinned(user_id)
+        if state.pinned or not replica_healthy():
+            return PRIMARY
+        return REPLICA
+
+    def db_for_write(self, model, **hints):
+        state = _routing.get()
+        if state is not None:
+            state.wrote = True
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if {obj1._state.db, obj2._state.db} <= {PRIMARY, REPLICA}:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica receives schema changes through replication
+        return db != REPLICA
+
+
+def is_replica_view(url_name):
+    return bool(url_name) and (url_name.startswith(REPLICA_URL_PREFIXES) or url_name.endswith(REPLICA_URL_SUFFIXES))
+
+
+class ReplicaRoutingMiddleware:
+    """Sets up per-request routing state and pins writers to the primary afterwards."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        state = RoutingState(request)
+        token = _routing.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _routing.reset(token)
+        if (state.wrote or request.method not in READ_METHODS) and replica_configured():
+            user_id = state.user_id()
+            if user_id is not None:
+                pin_to_primary(user_id)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        state = _routing.get()
+        if state is not None and request.method in READ_METHODS:
+            match = request.resolver_match
+            state.eligible = is_replica_view(match.url_name if match else None)
+        return None
+
+
+def replica_status():
+    return {
+        'configured': replica_configured(),
+        'lag_seconds': replica_lag() if replica_configured() else None,
+        'max_lag_seconds': getattr(settings, 'REPLICA_MAX_LAG_SECONDS', 5),
+        'serving_reads': replica_configured() and replica_healthy(),
+    }
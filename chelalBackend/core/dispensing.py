@@ -0,0 +1,184 @@
+"""
+Pharmacy stock engine: receiving batches, FEFO (first-expiry, first-out)
+dispensing across as many batches as it takes, and the stock ledger.
+
+Dispensing row-locks a medication's unexpired batches with one SELECT ...
+FOR UPDATE in (expiry_date, id) order, so concurrent pharmacists queue in the
+same order and can never deadlock each other, and all quantities are changed
+with F() expressions so no update is ever lost.
+`Medication.current_stock` is kept in step incrementally rather than re-summed.
+
+Every change is also appended to StockMovement in the same transaction.
+Historic balances come from the nightly StockSnapshot plus the ledger rows
+recorded after it, so no query has to replay a medication's full history.
+"""
+import logging
+
+from django.db import transaction
+from django.db.models import F, Sum, Max
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .models import Medication, StockBatch, DispensingLog, StockMovement, StockSnapshot
+
+logger = logging.getLogger(__name__)
+
+
+def receive_batch(medication, batch_number, expiry_date, quantity, user=None):
+    """Add a new batch to stock and bump the medication's running total."""
+    with transaction.atomic():
+        batch = StockBatch.objects.create(
+            medication=medication,
+            batch_number=batch_number,
+            expiry_date=expiry_date,
+            received_quantity=quantity,
+            quantity=quantity,
+        )
+        StockMovement.objects.create(medication=medication, batch=batch, kind='receipt', quantity=quantity, user=user)
+        Medication.objects.filter(pk=medication.pk).update(current_stock=F('current_stock') + quantity)
+    return batch
+
+
+def adjust_batch(batch_id, delta, reason='', user=None):
+    """
+    Correct a batch's quantity after a stock count (delta may be negative).
+    :return: (success, new batch quantity or error message)
+    """
+    with transaction.atomic():
+        try:
+            batch = StockBatch.objects.select_for_update().get(pk=batch_id)
+        except StockBatch.DoesNotExist:
+            return False, 'Batch not found.'
+        if batch.quantity + delta < 0:
+            return False, f'Batch {batch.batch_number} only holds {batch.quantity}.'
+        StockBatch.objects.filter(pk=batch.pk).update(quantity=F('quantity') + delta)
+        StockMovement.objects.create(
+            medication_id=batch.medication_id, batch=batch, kind='adjustment',
+            quantity=delta, reason=reason, user=user,
+        )
+        Medication.objects.filter(pk=batch.medication_id).update(
+            current_stock=Greatest(F('current_stock') + delta, 0)
+        )
+    return True, batch.quantity + delta
+
+
+def expire_batches(today=None):
+    """Write off every expired batch that still holds stock. Returns the number of batches."""
+    today = today or timezone.localdate()
+    with transaction.atomic():
+        batches = list(
+            StockBatch.objects.select_for_update(skip_locked=True)
+            .filter(expiry_date__lt=today, quantity__gt=0)
+        )
+        if not batches:
+            return 0
+        StockMovement.objects.bulk_create([
+            StockMovement(medication_id=b.medication_id, batch=b, kind='expiry', quantity=-b.quantity, reason='Expired')
+            for b in batches
+        ])
+        written_off = {}
+        for b in batches:
+            written_off[b.medication_id] = written_off.get(b.medication_id, 0) + b.quantity
+        StockBatch.objects.filter(pk__in=[b.pk for b in batches]).update(quantity=0)
+        for medication_id, quantity in written_off.items():
+            Medication.objects.filter(pk=medication_id).update(
+                current_stock=Greatest(F('current_stock') - quantity, 0)
+            )
+    logger.info(f"Wrote off {len(batches)} expired batches")
+    return len(batches)
+
+
+def _allocate(batches, needed, allocations):
+    for batch in batches:
+        if needed == 0:
+            break
+        take = min(batch.quantity, needed)
+        allocations.append((batch, take))
+        needed -= take
+    return needed
+
+
+def dispense(medication_id, quantity, prescription=None, user=None):
+    """
+    Dispense `quantity` units of a medication, earliest-expiring unexpired batches first.
+    :return: (success, list of {'batch_id', 'batch_number', 'expiry_date', 'quantity'} or error message)
+    """
+    if quantity <= 0:
+        return False, 'Quantity must be positive.'
+
+    with transaction.atomic():
+        available = (
+            StockBatch.objects
+            .filter(medication_id=medication_id, quantity__gt=0, expiry_date__gte=timezone.localdate())
+            .order_by('expiry_date', 'id')
+        )
+        allocations = []
+        # Locks are always taken in the same (expiry_date, id) order as every other dispense
+        needed = _allocate(available.select_for_update(), quantity, allocations)
+        if needed:
+            return False, f'Insufficient unexpired stock: short by {needed}.'
+
+        logs, movements = [], []
+        for batch, take in allocations:
+            StockBatch.objects.filter(pk=batch.pk).update(quantity=F('quantity') - take)
+            logs.append(DispensingLog(
+                medication_id=medication_id, batch=batch, prescription=prescription,
+                quantity=take, dispensed_by=user,
+            ))
+            movements.append(StockMovement(
+                medication_id=medication_id, batch=batch, kind='dispense', quantity=-take,
+                reason=f'Prescription {prescription.pk}' if prescription else '', user=user,
+            ))
+        DispensingLog.objects.bulk_create(logs)
+        StockMovement.objects.bulk_create(movements)
+        Medication.objects.filter(pk=medication_id).update(
+            current_stock=Greatest(F('current_stock') - quantity, 0)
+        )
+
+    logger.info(f"Dispensed {quantity} of medication {medication_id} from {len(allocations)} batch(es)")
+    return True, [
+        {'batch_id': batch.pk, 'batch_number': batch.batch_number, 'expiry_date': batch.expiry_date, 'quantity': take}
+        for batch, take in allocations
+    ]
+
+
+def balance_as_of(medication_id, when):
+    """Stock balance at `when`: the last snapshot at or before it plus later ledger rows."""
+    snapshot = (
+        StockSnapshot.objects.filter(medication_id=medication_id, as_of__lte=when)
+        .order_by('-as_of').values_list('as_of', 'balance').first()
+    )
+    movements = StockMovement.objects.filter(medication_id=medication_id, occurred_at__lte=when)
+    balance = 0
+    if snapshot:
+        movements = movements.filter(occurred_at__gt=snapshot[0])
+        balance = snapshot[1]
+    return balance + (movements.aggregate(total=Sum('quantity'))['total'] or 0)
+
+
+def take_stock_snapshots(as_of=None):
+    """
+    Record every medication's ledger balance at `as_of` (default: now), rolling
+    the previous snapshot forward with one grouped aggregate over the ledger tail.
+    :return: number of snapshots written
+    """
+    as_of = as_of or timezone.now()
+    previous_as_of = StockSnapshot.objects.filter(as_of__lt=as_of).aggregate(latest=Max('as_of'))['latest']
+
+    balances = {}
+    movements = StockMovement.objects.filter(occurred_at__lte=as_of)
+    if previous_as_of:
+        balances = dict(
+            StockSnapshot.objects.filter(as_of=previous_as_of).values_list('medication_id', 'balance')
+        )
+        movements = movements.filter(occurred_at__gt=previous_as_of)
+    for medication_id, total in movements.values('medication_id').annotate(total=Sum('quantity')).values_list('medication_id', 'total'):
+        balances[medication_id] = balances.get(medication_id, 0) + total
+
+    StockSnapshot.objects.bulk_create(
+        [StockSnapshot(medication_id=pk, as_of=as_of, balance=balance) for pk, balance in balances.items()],
+        batch_size=1000,
+        ignore_conflicts=True,
+    )
+    logger.info(f"Took {len(balances)} stock snapshots as of {as_of}")
+    return len(balances)
@@ -0,0 +1,245 @@
+"""
+Server-side PDF invoices, payment receipts and patient statements.
+
+Rendering is CPU-heavy, so it never happens in a request: views hash the
+document's content (the bill "version") and either serve the PDF already
+stored under that hash or queue a Celery render and answer 202. Files are
+content-addressed in default storage, so an unchanged bill is rendered once
+and any change to its items or payments simply produces a new key. Bulk
+statement runs are split into chunks that Celery spreads across worker
+processes.
+"""
+import hashlib
+import io
+import json
+import logging
+import time
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.utils import timezone
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.lib.units import mm
+from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+from .models import Bill, Patient, Payment
+
+logger = logging.getLogger(__name__)
+
+# Bump when the layout changes so previously stored PDFs are not served
+TEMPLATE_VERSION = 1
+RENDER_LOCK_SECONDS = 120
+# A failed version is reported instead of re-queued for this long, then retried
+RENDER_FAILURE_SECONDS = 600
+
+
+def _money(value):
+    return f'{value:,.2f}'
+
+
+def _patient(patient):
+    return {
+        'name': f'{patient.first_name} {patient.last_name}',
+        'unique_id': patient.unique_id,
+        'address': patient.address,
+        'contact': patient.contact_info,
+    }
+
+
+def invoice_context(bill_id):
+    bill = Bill.objects.select_related('patient').prefetch_related('items', 'payments').get(pk=bill_id)
+    return {
+        'title': 'Invoice',
+        'number': f'INV-{bill.pk:06d}',
+        'date': timezone.localtime(bill.date_issued).date().isoformat(),
+        'patient': _patient(bill.patient),
+        'columns': ['Description', 'Qty', 'Unit price', 'Amount'],
+        'rows': [
+            [item.description, str(item.quantity), _money(item.amount), _money(item.amount * item.quantity)]
+            for item in sorted(bill.items.all(), key=lambda i: i.pk)
+        ],
+        'totals': [
+            ['Total', _money(bill.total_amount)],
+            ['Paid', _money(bill.paid_amount)],
+            ['Balance due', _money(bill.balance)],
+        ],
+        'notes': bill.notes,
+    }
+
+
+def receipt_context(payment_id):
+    payment = Payment.objects.select_related('bill__patient').get(pk=payment_id)
+    bill = payment.bill
+    return {
+        'title': 'Payment receipt',
+        'number': f'RCT-{payment.pk:06d}',
+        'date': timezone.localtime(payment.payment_date).date().isoformat(),
+        'patient': _patient(bill.patient),
+        'columns': ['Invoice', 'Method', 'Reference', 'Amount'],
+        'rows': [[f'INV-{bill.pk:06d}', payment.method, payment.reference, _money(payment.amount)]],
+        'totals': [
+            ['Invoice total', _money(bill.total_amount)],
+            ['Paid to date', _money(bill.paid_amount)],
+            ['Balance due', _money(bill.balance)],
+        ],
+        'notes': '',
+    }
+
+
+def statement_context(patient_id):
+    patient = Patient.objects.get(pk=patient_id)
+    bills = list(Bill.objects.filter(patient=patient, is_paid=False).order_by('date_issued', 'id'))
+    return {
+        'title': 'Statement of account',
+        'number': f'STM-{patient.unique_id}',
+        'date': timezone.localdate().isoformat(),
+        'patient': _patient(patient),
+        'columns': ['Invoice', 'Issued', 'Total', 'Paid', 'Balance'],
+        'rows': [
+            [f'INV-{b.pk:06d}', timezone.localtime(b.date_issued).date().isoformat(),
+             _money(b.total_amount), _money(b.paid_amount), _money(b.balance)]
+            for b in bills
+        ],
+        'totals': [['Outstanding', _money(sum((b.balance for b in bills), 0))]],
+        'notes': '',
+    }
+
+
+BUILDERS = {'invoice': invoice_context, 'receipt': receipt_context, 'statement': statement_context}
+
+
+def document_key(context):
+    payload = json.dumps({'template': TEMPLATE_VERSION, **context}, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def storage_path(key):
+    return f'documents/{key[:2]}/{key}.pdf'
+
+
+def resolve(kind, pk):
+    """
+    Build a document's context and content key without rendering it.
+    :return: (context, key, storage path); raises the model's DoesNotExist
+    """
+    context = BUILDERS[kind](pk)
+    key = document_key(context)
+    return context, key, storage_path(key)
+
+
+def render_pdf(context):
+    """Lay out a document context as PDF bytes. Output is byte-for-byte stable for the same context."""
+    buffer = io.BytesIO()
+    hospital = getattr(settings, 'HOSPITAL_NAME', 'Chelal Hospital')
+    doc = SimpleDocTemplate(
+        buffer, pagesize=A4, invariant=1,
+        title=f"{context['title']} {context['number']}", author=hospital,
+        leftMargin=18 * mm, rightMargin=18 * mm, topMargin=18 * mm, bottomMargin=18 * mm,
+    )
+    styles = getSampleStyleSheet()
+    patient = context['patient']
+    # Paragraph parses its text as markup, so every value is escaped
+    story = [
+        Paragraph(escape(hospital), styles['Title']),
+        Paragraph(f"{escape(context['title'])} {escape(context['number'])} &middot; {escape(context['date'])}", styles['Heading2']),
+        Paragraph(f"{escape(patient['name'])} ({escape(patient['unique_id'])})", styles['Normal']),
+    ]
+    for extra in (patient['address'], patient['contact']):
+        if extra:
+            story.append(Paragraph(escape(extra), styles['Normal']))
+    story.append(Spacer(1, 8 * mm))
+
+    columns = context['columns']
+    table = Table([columns] + context['rows'] + [[''] * (len(columns) - 2) + row for row in context['totals']],
+                  repeatRows=1, hAlign='LEFT')
+    body_end = len(context['rows'])
+    table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#e8eef4')),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('ALIGN', (1, 0), (-1, -1), 'RIGHT'),
+        ('LINEBELOW', (0, 0), (-1, 0), 0.5, colors.grey),
+        ('LINEBELOW', (0, body_end), (-1, body_end), 0.5, colors.grey),
+        ('FONTNAME', (-2, body_end + 1), (-1, -1), 'Helvetica-Bold'),
+    ]))
+    story.append(table)
+    if context['notes']:
+        story += [Spacer(1, 6 * mm), Paragraph(escape(context['notes']), styles['Italic'])]
+    doc.build(story)
+    return buffer.getvalue()
+
+
+def render(kind, pk):
+    """
+    Render a document into storage unless its current version is already there.
+    :return: (storage path, whether it was rendered now)
+    """
+    context, key, path = resolve(kind, pk)
+    if default_storage.exists(path):
+        return path, False
+    try:
+        saved = default_storage.save(path, ContentFile(render_pdf(context)))
+    except Exception as e:
+        logger.exception(f"Rendering {kind} {pk} (version {key}) failed")
+        cache.set(f'documents:failed:{key}', str(e)[:500] or e.__class__.__name__, RENDER_FAILURE_SECONDS)
+        raise
+    finally:
+        cache.delete(f'documents:rendering:{key}')
+    if saved != path:
+        # A concurrent render stored the same content first; keep only one copy
+        default_storage.delete(saved)
+    return path, True
+
+
+def render_failure(key):
+    """The error from a recent failed render of this version, if any."""
+    return cache.get(f'documents:failed:{key}')
+
+
+def request_render(kind, pk, key):
+    """Queue a render of `kind`/`pk` unless one for this content key is already in flight."""
+    from .tasks import render_document_task
+    if cache.add(f'documents:rendering:{key}', 1, RENDER_LOCK_SECONDS):
+        render_document_task.delay(kind, pk)
+
+
+def render_statements(patient_ids=None):
+    """
+    Fan a statement run out to Celery in chunks of STATEMENT_BATCH_SIZE patients
+    (default: everyone with an unpaid bill).
+    :return: (number of patients, number of tasks queued)
+    """
+    from .tasks import render_statement_batch_task
+    if patient_ids is None:
+        patient_ids = list(Bill.objects.filter(is_paid=False).values_list('patient_id', flat=True).distinct().order_by('patient_id'))
+    chunk_size = getattr(settings, 'STATEMENT_BATCH_SIZE', 50)
+    tasks = 0
+    for start in range(0, len(patient_ids), chunk_size):
+        render_statement_batch_task.delay(patient_ids[start:start + chunk_size])
+        tasks += 1
+    logger.info(f"Queued statements for {len(patient_ids)} patients in {tasks} tasks")
+    return len(patient_ids), tasks
+
+
+def render_statement_batch(patient_ids):
+    started = time.perf_counter()
+    rendered = cached = failed = 0
+    for patient_id in patient_ids:
+        try:
+            _, created = render('statement', patient_id)
+        except Patient.DoesNotExist:
+            continue
+        except Exception:
+            # Already logged and recorded by render(); carry on with the rest of the chunk
+            failed += 1
+            continue
+        rendered += created
+        cached += not created
+    return {
+        'rendered': rendered, 'cached': cached, 'failed': failed,
+        'elapsed_seconds': round(time.perf_counter() - started, 3),
+    }
@@ -1,15 +1,18 @@
-from django.core.mail import send_mail
+import logging
+
+from django.core.mail import send_mail, get_connection, EmailMessage
 from django.conf import settings
 
-def send_appointment_email(appointment):
+logger = logging.getLogger(__name__)
+
+def build_appointment_email(appointment):
     """
-    Send an appointment confirmation email to the patient.
+    Build the appointment confirmation email for a patient.
     :param appointment: Appointment object
-    :return: (success, error_message)
+    :return: dict with 'to', 'subject' and 'message' keys
     """
-    try:
-        subject = f"Appointment Confirmation - {appointment.date}"
-        message = f"""
+    subject = f"Appointment Confirmation - {appointment.date}"
+    message = f"""
         Dear {appointment.patient.first_name} {appointment.patient.last_name},
 
         Your appointment has been scheduled for:
@@ -25,24 +28,32 @@ def send_appointment_email(appointment):
         Best regards,
         CHELAL Hospital Management System
         """
-        
-        send_mail(
-            subject,
-            message,
-            settings.DEFAULT_FROM_EMAIL,
-            [appointment.patient.contact_info],  # Assuming contact_info contains email
-            fail_silently=False,
-        )
-        return True, ''
+    return {
+        'to': appointment.patient.contact_info,  # Assuming contact_info contains email
+        'subject': subject,
+        'message': message,
+    }
+
+def send_appointment_email(appointment, connection=None):
+    """
+    Send an appointment confirmation email to the patient.
+    :param appointment: Appointment object
+    :param connection: Optional open mail connection to reuse
+    :return: (success, error_message)
+    """
+    try:
+        email = build_appointment_email(appointment)
+        return send_email(email['to'], email['subject'], email['message'], connection=connection)
     except Exception as e:
         return False, str(e)
 
-def send_email(to_email, subject, message):
+def send_email(to_email, subject, message, connection=None):
     """
     Send an appointment-related email.
     :param to_email: Recipient email address
     :param subject: Email subject
     :param message: Email body
+    :param connection: Optional open mail connection to reuse
     :return: (success, error_message)
     """
     try:
@@ -52,7 +63,64 @@ def send_email(to_email, subject, message):
             settings.DEFAULT_FROM_EMAIL,
             [to_email],
             fail_silently=False,
+            connection=connection,
         )
         return True, ''
     except Exception as e:
         return False, str(e)
+
+
+def send_bulk_email(messages, chunk_size=None, connection=None):
+    """
+    Send many emails over a single mail connection.
+    Messages are handed to ``send_messages`` one at a time so that a failure
+    can be pinned on exactly one message: nothing already accepted is sent
+    again, and the session is reopened after a failure or every chunk_size
+    messages. If the connection cannot be reopened, the messages not yet
+    attempted are reported as failed (undelivered) with that error.
+    :param messages: List of dicts with 'to', 'subject' and 'message' keys
+    :param chunk_size: Messages per SMTP session (default: EMAIL_BATCH_SIZE)
+    :param connection: Optional mail connection; one is opened if not given
+    :return: (sent_count, failed_messages)
+    """
+    chunk_size = chunk_size or getattr(settings, 'EMAIL_BATCH_SIZE', 50)
+    connection = connection or get_connection(fail_silently=False)
+    sent = 0
+    failed = []
+
+    try:
+        connection.open()
+    except Exception as e:
+        logger.error(f"Could not open mail connection: {str(e)}")
+        return 0, [dict(m, error=str(e)) for m in messages]
+
+    try:
+        in_session = 0
+        for index, m in enumerate(messages):
+            reconnect = in_session >= chunk_size
+            try:
+                if reconnect:
+                    connection.close()
+                    connection.open()
+                    in_session = 0
+            except Exception as e:
+                logger.error(f"Could not reopen mail connection, {len(messages) - index} messages not sent: {str(e)}")
+                failed.extend(dict(pending, error=str(e)) for pending in messages[index:])
+                break
+
+            email = EmailMessage(m['subject'], m['message'], settings.DEFAULT_FROM_EMAIL, [m['to']], connection=connection)
+            in_session += 1
+            try:
+                sent += connection.send_messages([email]) or 0
+            except Exception as e:
+                logger.warning(f"Could not send email to {m['to']}: {str(e)}")
+                failed.append(dict(m, error=str(e)))
+                # Start the next message on a clean SMTP session; this one may be unusable
+                in_session = chunk_size
+    finally:
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    return sent, failed
@@ -0,0 +1,152 @@
+"""
+Bulk formulary import for Medication.
+
+CSV or NDJSON files are streamed in chunks. Each chunk costs one SELECT to
+diff against existing rows by name and one upsert
+(bulk_create(update_conflicts=True)) for the rows that are new or changed.
+Stock levels are never touched; they belong to the stock ledger.
+"""
+import csv
+import io
+import json
+import logging
+import time
+
+from django.db import transaction
+
+from .models import Medication
+
+logger = logging.getLogger(__name__)
+
+IMPORT_FIELDS = ['generic_name', 'description', 'unit', 'reorder_level']
+MAX_REPORTED_ERRORS = 100
+
+
+def iter_rows(stream, fmt):
+    """
+    Yield (line number, dict) from a text or binary CSV/NDJSON stream.
+    :raises ValueError: for an unsupported format or a file that is not UTF-8
+    """
+    if isinstance(stream.read(0), bytes):
+        stream = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    line_number = 0
+    try:
+        if fmt == 'csv':
+            for line_number, row in enumerate(csv.DictReader(stream), start=2):
+                yield line_number, row
+        elif fmt == 'ndjson':
+            for line_number, line in enumerate(stream, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                except json.JSONDecodeError as e:
+                    row = {'_error': f'Invalid JSON: {e.msg}'}
+                if not isinstance(row, dict):
+                    row = {'_error': 'Each line must be a JSON object'}
+                yield line_number, row
+        else:
+            raise ValueError(f'Unsupported formulary format: {fmt}')
+    except UnicodeDecodeError:
+        raise ValueError(f'File is not valid UTF-8 (import stopped after line {line_number})')
+
+
+def _text(row, field):
+    value = row.get(field)
+    if value is None:
+        return ''
+    if not isinstance(value, str):
+        raise ValueError(f'{field} must be a string')
+    return value.strip()
+
+
+def _clean(row):
+    if '_error' in row:
+        raise ValueError(row['_error'])
+    name = _text(row, 'name')
+    if not name:
+        raise ValueError('name is required')
+    if len(name) > 255:
+        raise ValueError('name is longer than 255 characters')
+    reorder_level = row.get('reorder_level')
+    reorder_level = int(reorder_level) if reorder_level not in (None, '') else 10
+    if reorder_level < 0:
+        raise ValueError('reorder_level must not be negative')
+    return Medication(
+        name=name,
+        generic_name=_text(row, 'generic_name')[:255],
+        description=_text(row, 'description'),
+        unit=_text(row, 'unit')[:50] or 'tablet',
+        reorder_level=reorder_level,
+    )
+
+
+def _upsert_chunk(chunk, summary):
+    existing = {
+        row['name']: row
+        for row in Medication.objects.filter(name__in=[m.name for m in chunk]).values('name', *IMPORT_FIELDS)
+    }
+    changed = []
+    for medication in chunk:
+        current = existing.get(medication.name)
+        if current is None:
+            summary['inserted'] += 1
+        elif any(current[f] != getattr(medication, f) for f in IMPORT_FIELDS):
+            summary['updated'] += 1
+        else:
+            summary['unchanged'] += 1
+            continue
+        changed.append(medication)
+    if changed:
+        Medication.objects.bulk_create(
+            changed,
+            update_conflicts=True,
+            unique_fields=['name'],
+            update_fields=IMPORT_FIELDS + ['updated_at'],
+        )
+
+
+def import_formulary(stream, fmt='csv', chunk_size=1000):
+    """
+    Upsert a formulary file into Medication keyed on name. Later rows win when a
+    name repeats within the file.
+    :return: dict with inserted/updated/unchanged/failed counts, errors, rows_per_second
+    :raises ValueError: when the file cannot be decoded; chunks before that point stay imported
+    """
+    started = time.perf_counter()
+    summary = {'inserted': 0, 'updated': 0, 'unchanged': 0, 'failed': 0, 'errors': []}
+    chunk = {}
+    rows = 0
+
+    def flush():
+        with transaction.atomic():
+            _upsert_chunk(list(chunk.values()), summary)
+        chunk.clear()
+
+    for line_number, row in iter_rows(stream, fmt):
+        rows += 1
+        try:
+            medication = _clean(row)
+        except (ValueError, TypeError) as e:
+            summary['failed'] += 1
+            if len(summary['errors']) < MAX_REPORTED_ERRORS:
+                summary['errors'].append({'line': line_number, 'error': str(e)})
+            continue
+        if medication.name in chunk:
+            # A repeated name in the same chunk would make the upsert touch one row twice
+            flush()
+        chunk[medication.name] = medication
+        if len(chunk) >= chunk_size:
+            flush()
+    if chunk:
+        flush()
+
+    elapsed = time.perf_counter() - started
+    summary['rows'] = rows
+    summary['seconds'] = round(elapsed, 3)
+    summary['rows_per_second'] = round(rows / elapsed) if elapsed else rows
+    logger.info(
+        f"Formulary import: {summary['inserted']} inserted, {summary['updated']} updated, "
+        f"{summary['unchanged']} unchanged, {summary['failed']} failed ({summary['rows_per_second']} rows/s)"
+    )
+    return summary
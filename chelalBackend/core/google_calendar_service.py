@@ -1,16 +1,110 @@
 import os
 import logging
-from datetime import datetime, timedelta
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone as dt_timezone
 from google.oauth2.credentials import Credentials
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
+from googleapiclient.http import BatchHttpRequest
+from google.auth.exceptions import RefreshError
 from google.auth.transport.requests import Request
 from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
 
-from .models import Appointment, GoogleCalendarToken
+from . import http_client
+from .models import Appointment, GoogleCalendarToken, CalendarEvent
 
 logger = logging.getLogger(__name__)
 
+CALENDAR_API_ROOT = 'https://www.googleapis.com/'
+CALENDAR_BATCH_PATH = 'batch/calendar/v3'
+BATCH_LIMIT = 50  # Google accepts at most 50 calls per batch request
+
+# Calendar clients are built once per user and thread (httplib2 is not thread-safe)
+_services = threading.local()
+
+# Short-lived LRU credentials cache: (token pk, access token, expiry) -> (valid until, Credentials),
+# holding at most GOOGLE_CREDENTIALS_CACHE_SIZE entries
+_credentials_cache = OrderedDict()
+_credentials_lock = threading.Lock()
+
+
+def _cache_credentials(key, credentials):
+    """Store credentials, dropping expired entries, older versions of the same token and the least recently used."""
+    now = time.monotonic()
+    ttl = getattr(settings, 'GOOGLE_CREDENTIALS_CACHE_SECONDS', 300)
+    max_size = getattr(settings, 'GOOGLE_CREDENTIALS_CACHE_SIZE', 256)
+    with _credentials_lock:
+        for stale in [k for k, (until, _) in _credentials_cache.items() if until <= now or k[0] == key[0]]:
+            del _credentials_cache[stale]
+        _credentials_cache[key] = (now + ttl, credentials)
+        while len(_credentials_cache) > max_size:
+            _credentials_cache.popitem(last=False)
+
+
+def build_calendar_service(credentials):
+    """
+    Build a Calendar v3 client from the discovery document bundled with
+    google-api-python-client, optionally pointed at GOOGLE_CALENDAR_API_ENDPOINT.
+    """
+    api_endpoint = getattr(settings, 'GOOGLE_CALENDAR_API_ENDPOINT', '')
+    return build(
+        'calendar', 'v3',
+        credentials=credentials,
+        static_discovery=True,
+        cache_discovery=False,
+        client_options={'api_endpoint': api_endpoint} if api_endpoint else None,
+    )
+
+
+def _event_time(value):
+    """Parse an event start/end ({'dateTime': ...} or all-day {'date': ...}) to an aware datetime."""
+    if not value:
+        return None
+    if value.get('dateTime'):
+        return parse_datetime(value['dateTime'])
+    if value.get('date'):
+        return timezone.make_aware(datetime.combine(parse_date(value['date']), datetime.min.time()), dt_timezone.utc)
+    return None
+
+
+def appointment_event_id(appointment):
+    """
+    Deterministic Google event id for an appointment, so repeated syncs update the
+    same event. Event ids may only use base32hex characters (a-v, 0-9).
+    """
+    return f'chelal{appointment.id:08d}'
+
+
+def appointment_event_body(appointment):
+    start = datetime.combine(appointment.date, appointment.time)
+    body = {
+        'summary': f'Appointment with {appointment.patient.first_name} {appointment.patient.last_name}',
+        'description': f'Appointment scheduled for {appointment.date} at {appointment.time}',
+        'start': {
+            'dateTime': start.isoformat(),
+            'timeZone': 'UTC',
+        },
+        'end': {
+            'dateTime': (start + timedelta(hours=1)).isoformat(),
+            'timeZone': 'UTC',
+        },
+        'reminders': {
+            'useDefault': True,
+        },
+        'status': 'confirmed',
+    }
+    if appointment.doctor.email:
+        body['attendees'] = [{'email': appointment.doctor.email}]
+    return body
+
 class GoogleCalendarService:
     """
     Service class for Google Calendar integration
@@ -24,39 +118,113 @@ class GoogleCalendarService:
         if not all([self.client_id, self.client_secret, self.redirect_uri]):
             logger.warning("Google Calendar credentials not properly configured")
 
+    def _build_credentials(self, token_obj):
+        expiry = token_obj.token_expiry
+        return Credentials(
+            token=token_obj.access_token,
+            refresh_token=token_obj.refresh_token,
+            token_uri='https://oauth2.googleapis.com/token',
+            client_id=self.client_id,
+            client_secret=self.client_secret,
+            scopes=['https://www.googleapis.com/auth/calendar'],
+            # google-auth compares expiry against naive UTC
+            expiry=expiry.astimezone(dt_timezone.utc).replace(tzinfo=None) if expiry else None,
+        )
+
     def get_credentials(self, token_obj):
         """
-        Get Google OAuth2 credentials from stored tokens
+        Get Google OAuth2 credentials from stored tokens.
+        Never calls Google's token endpoint: tokens are refreshed ahead of expiry by
+        refresh_expiring_tokens. An expired token queues an immediate background
+        refresh and returns None.
         """
         try:
-            credentials = Credentials(
-                token=token_obj.access_token,
-                refresh_token=token_obj.refresh_token,
-                token_uri='https://oauth2.googleapis.com/token',
-                client_id=self.client_id,
-                client_secret=self.client_secret,
-                scopes=['https://www.googleapis.com/auth/calendar']
-            )
-
-            # Refresh token if expired
-            if credentials.expired and credentials.refresh_token:
-                credentials.refresh(Request())
-                # Update stored tokens
-                token_obj.access_token = credentials.token
-                token_obj.token_expiry = datetime.fromtimestamp(credentials.expiry.timestamp())
-                token_obj.save()
+            key = (token_obj.pk, token_obj.access_token, token_obj.token_expiry)
+            with _credentials_lock:
+                cached = _credentials_cache.get(key)
+                if cached:
+                    _credentials_cache.move_to_end(key)
+            if cached and cached[0] > time.monotonic() and not cached[1].expired:
+                return cached[1]
+
+            credentials = self._build_credentials(token_obj)
+            if credentials.expired:
+                # One queued refresh per token per minute, however many requests see it expired
+                if cache.add(f'gcal:refresh:{token_obj.pk}', 1, 60):
+                    logger.warning(f"Google Calendar token {token_obj.pk} expired; queueing refresh")
+                    from .tasks import refresh_google_token_task
+                    refresh_google_token_task.delay(token_obj.pk)
+                return None
 
+            _cache_credentials(key, credentials)
             return credentials
         except Exception as e:
             logger.error(f"Error getting credentials: {str(e)}")
             return None
 
+    def refresh_access_token(self, token_obj, request=None, save=True):
+        """
+        Refresh the access token with Google (background use only).
+        :param request: Optional shared google.auth transport Request
+        :param save: Persist the new token; pass False when the caller bulk-updates
+        :return: True if refreshed
+        """
+        if not token_obj.refresh_token:
+            return False
+        try:
+            credentials = self._build_credentials(token_obj)
+            credentials.refresh(request or Request(session=http_client.get_session('google_oauth')))
+        except RefreshError as e:
+            logger.error(f"Could not refresh Google Calendar token {token_obj.pk}: {str(e)}")
+            if 'invalid_grant' in str(e):
+                # Access was revoked; the user has to reconnect
+                token_obj.is_active = False
+                GoogleCalendarToken.objects.filter(pk=token_obj.pk).update(is_active=False)
+            return False
+        except Exception as e:
+            logger.error(f"Error refreshing Google Calendar token {token_obj.pk}: {str(e)}")
+            return False
+
+        token_obj.access_token = credentials.token
+        token_obj.token_expiry = credentials.expiry.replace(tzinfo=dt_timezone.utc)
+        if save:
+            # Update only the refreshed columns; no full-row save
+            GoogleCalendarToken.objects.filter(pk=token_obj.pk).update(
+                access_token=token_obj.access_token,
+                token_expiry=token_obj.token_expiry,
+            )
+        return True
+
+    def get_service(self, token_obj):
+        """
+        Return a cached Calendar client for this token, rebuilding it only when
+        the access token has changed.
+        """
+        credentials = self.get_credentials(token_obj)
+        if not credentials:
+            return None
+
+        cache = getattr(_services, 'by_token', None)
+        if cache is None:
+            cache = _services.by_token = {}
+
+        cached = cache.get(token_obj.pk)
+        if cached and cached[0] == credentials.token:
+            return cached[1]
+
+        service = build_calendar_service(credentials)
+        cache[token_obj.pk] = (credentials.token, service)
+        return service
+
+    def new_batch(self, callback):
+        api_endpoint = getattr(settings, 'GOOGLE_CALENDAR_API_ENDPOINT', '') or CALENDAR_API_ROOT
+        return BatchHttpRequest(callback=callback, batch_uri=api_endpoint.rstrip('/') + '/' + CALENDAR_BATCH_PATH)
+
     def exchange_code_for_tokens(self, code):
         """
         Exchange authorization code for access and refresh tokens
         """
         try:
-            import requests
             from datetime import datetime, timedelta
 
             logger.info(f"Client ID: {self.client_id}")
@@ -80,7 +248,7 @@ class GoogleCalendarService:
             }
 
             logger.info("Making token request...")
-            response = requests.post(token_url, data=data)
+            response = http_client.post('google_oauth', token_url, data=data)
             logger.info(f"Token response status: {response.status_code}")
             logger.info(f"Token response: {response.text}")
 
@@ -113,40 +281,27 @@ class GoogleCalendarService:
         Create a Google Calendar event for an appointment
         """
         try:
-            credentials = self.get_credentials(token_obj)
-            if not credentials:
+            service = self.get_service(token_obj)
+            if not service:
                 return None
 
-            service = build('calendar', 'v3', credentials=credentials)
-
-            # Create event data
-            event_data = {
-                'summary': f'Appointment with {appointment.patient.first_name} {appointment.patient.last_name}',
-                'description': f'Appointment scheduled for {appointment.date} at {appointment.time}',
-                'start': {
-                    'dateTime': f'{appointment.date}T{appointment.time}',
-                    'timeZone': 'UTC',
-                },
-                'end': {
-                    'dateTime': f'{appointment.date}T{(datetime.combine(appointment.date, appointment.time) + timedelta(hours=1)).time()}',
-                    'timeZone': 'UTC',
-                },
-                'attendees': [
-                    {'email': appointment.doctor.email} if appointment.doctor.email else None,
-                    # Add patient email if available
-                ],
-                'reminders': {
-                    'useDefault': True,
-                },
-            }
-
-            # Remove None attendees
-            event_data['attendees'] = [attendee for attendee in event_data['attendees'] if attendee]
-
-            event = service.events().insert(
-                calendarId=token_obj.calendar_id,
-                body=event_data
-            ).execute()
+            event_data = appointment_event_body(appointment)
+            event_data['id'] = appointment_event_id(appointment)
+
+            try:
+                event = service.events().insert(
+                    calendarId=token_obj.calendar_id,
+                    body=event_data
+                ).execute()
+            except HttpError as e:
+                if e.resp.status != 409:
+                    raise
+                # Already synced before: update the existing event instead
+                event = service.events().update(
+                    calendarId=token_obj.calendar_id,
+                    eventId=event_data['id'],
+                    body=event_data
+                ).execute()
 
             logger.info(f"Created calendar event: {event.get('id')}")
             return event.get('id')
@@ -163,12 +318,10 @@ class GoogleCalendarService:
         Update an existing Google Calendar event
         """
         try:
-            credentials = self.get_credentials(token_obj)
-            if not credentials:
+            service = self.get_service(token_obj)
+            if not service:
                 return False
 
-            service = build('calendar', 'v3', credentials=credentials)
-
             # Get existing event (assuming we store event_id somewhere)
             # For now, we'll need to find the event by date/time
             events_result = service.events().list(
@@ -228,12 +381,10 @@ class GoogleCalendarService:
         Delete a Google Calendar event
         """
         try:
-            credentials = self.get_credentials(token_obj)
-            if not credentials:
+            service = self.get_service(token_obj)
+            if not service:
                 return False
 
-            service = build('calendar', 'v3', credentials=credentials)
-
             # Find and delete event (similar to update)
             events_result = service.events().list(
                 calendarId=token_obj.calendar_id,
@@ -276,12 +427,10 @@ class GoogleCalendarService:
         Get calendar events for a date range
         """
         try:
-            credentials = self.get_credentials(token_obj)
-            if not credentials:
+            service = self.get_service(token_obj)
+            if not service:
                 return []
 
-            service = build('calendar', 'v3', credentials=credentials)
-
             events_result = service.events().list(
                 calendarId=token_obj.calendar_id,
                 timeMin=f'{start_date}T00:00:00Z',
@@ -300,17 +449,160 @@ class GoogleCalendarService:
             logger.error(f"Error getting calendar events: {str(e)}")
             return []
 
+    def bulk_sync_appointments(self, appointments, token_obj):
+        """
+        Push many appointments to Google Calendar using HTTP batch requests
+        (up to BATCH_LIMIT calls each). Events are inserted with deterministic ids;
+        ones that already exist are updated in a follow-up batch.
+        :return: (synced event ids by appointment id, errors by appointment id)
+        """
+        service = self.get_service(token_obj)
+        if not service:
+            return {}, {appointment.id: 'Google Calendar credentials unavailable' for appointment in appointments}
+
+        by_id = {str(appointment.id): appointment for appointment in appointments}
+        synced, errors, conflicts = {}, {}, []
+
+        def callback(request_id, response, exception):
+            appointment_id = int(request_id)
+            if exception is None:
+                synced[appointment_id] = response.get('id')
+            elif isinstance(exception, HttpError) and exception.resp.status == 409 and request_id not in conflicts:
+                conflicts.append(request_id)
+            else:
+                errors[appointment_id] = str(exception)
+
+        def run(request_ids, make_request):
+            for start in range(0, len(request_ids), BATCH_LIMIT):
+                batch = self.new_batch(callback)
+                for request_id in request_ids[start:start + BATCH_LIMIT]:
+                    batch.add(make_request(by_id[request_id]), request_id=request_id)
+                batch.execute()
+
+        def insert(appointment):
+            body = appointment_event_body(appointment)
+            body['id'] = appointment_event_id(appointment)
+            return service.events().insert(calendarId=token_obj.calendar_id, body=body)
+
+        def update(appointment):
+            return service.events().update(
+                calendarId=token_obj.calendar_id,
+                eventId=appointment_event_id(appointment),
+                body=appointment_event_body(appointment),
+            )
+
+        try:
+            run(list(by_id), insert)
+            if conflicts:
+                run(list(conflicts), update)
+        except Exception as e:
+            logger.error(f"Error bulk syncing calendar events: {str(e)}")
+            for request_id in by_id:
+                if int(request_id) not in synced:
+                    errors.setdefault(int(request_id), str(e))
+
+        logger.info(f"Bulk calendar sync: {len(synced)} synced, {len(errors)} failed")
+        return synced, errors
+
+    def sync_calendar_events(self, token_obj):
+        """
+        Pull changes from Google into the local CalendarEvent mirror.
+        Uses the stored syncToken so only events changed since the last pull are
+        fetched; falls back to a full sync when there is no token or Google has
+        expired it (HTTP 410). After a 410 the mirror is replaced in the same
+        transaction that stores the new events, so a failed re-sync leaves it intact.
+        :return: (success, number of changed events)
+        """
+        service = self.get_service(token_obj)
+        if not service:
+            return False, 0
+
+        sync_token = token_obj.sync_token
+        changed, cancelled = {}, set()
+        page_token = None
+        full_resync = False
+        while True:
+            params = {
+                'calendarId': token_obj.calendar_id,
+                'singleEvents': True,
+                'showDeleted': True,
+                'maxResults': 2500,
+            }
+            if page_token:
+                params['pageToken'] = page_token
+            if sync_token:
+                params['syncToken'] = sync_token
+            else:
+                past_days = getattr(settings, 'GOOGLE_CALENDAR_SYNC_PAST_DAYS', 90)
+                params['timeMin'] = (timezone.now() - timedelta(days=past_days)).isoformat()
+
+            try:
+                result = service.events().list(**params).execute()
+            except HttpError as e:
+                if e.resp.status == 410 and sync_token:
+                    logger.info(f"Sync token expired for calendar token {token_obj.pk}; running full sync")
+                    sync_token, page_token = '', None
+                    changed, cancelled = {}, set()
+                    # The mirror is replaced only once the full sync has been fetched
+                    full_resync = True
+                    continue
+                logger.error(f"Google Calendar API error: {e}")
+                return False, 0
+
+            for event in result.get('items', []):
+                if event.get('status') == 'cancelled':
+                    cancelled.add(event['id'])
+                    changed.pop(event['id'], None)
+                else:
+                    changed[event['id']] = event
+                    cancelled.discard(event['id'])
+
+            page_token = result.get('nextPageToken')
+            if not page_token:
+                next_sync_token = result.get('nextSyncToken', '')
+                break
+
+        with transaction.atomic():
+            if full_resync:
+                CalendarEvent.objects.filter(token=token_obj).delete()
+            elif cancelled:
+                CalendarEvent.objects.filter(token=token_obj, google_event_id__in=cancelled).delete()
+            if changed:
+                CalendarEvent.objects.bulk_create(
+                    [
+                        CalendarEvent(
+                            token=token_obj,
+                            google_event_id=event_id,
+                            summary=(event.get('summary') or '')[:1024],
+                            start=_event_time(event.get('start')),
+                            end=_event_time(event.get('end')),
+                            updated=parse_datetime(event['updated']) if event.get('updated') else None,
+                            data=event,
+                        )
+                        for event_id, event in changed.items()
+                    ],
+                    update_conflicts=True,
+                    unique_fields=['token', 'google_event_id'],
+                    update_fields=['summary', 'start', 'end', 'updated', 'data'],
+                )
+            token_obj.sync_token = next_sync_token
+            token_obj.last_synced_at = timezone.now()
+            GoogleCalendarToken.objects.filter(pk=token_obj.pk).update(
+                sync_token=token_obj.sync_token,
+                last_synced_at=token_obj.last_synced_at,
+            )
+
+        return True, len(changed) + len(cancelled)
+
     def test_connection(self, token_obj):
         """
         Test if the calendar connection is working
         """
         try:
-            credentials = self.get_credentials(token_obj)
-            if not credentials:
+            service = self.get_service(token_obj)
+            if not service:
                 return False
 
-            service = build('calendar', 'v3', credentials=credentials)
-
             # Try to get calendar list
             calendar_list = service.calendarList().list().execute()
             return len(calendar_list.get('items', [])) > 0
@@ -318,3 +610,32 @@ class GoogleCalendarService:
         except Exception as e:
             logger.error(f"Error testing calendar connection: {str(e)}")
             return False
+
+
+def refresh_expiring_tokens(margin_minutes=None):
+    """
+    Refresh every active token expiring within the margin (or with no known expiry), ahead of time.
+    Tokens are refreshed concurrently over one HTTP session and written back
+    with a single bulk update.
+    :return: (refreshed count, failed count)
+    """
+    margin = margin_minutes or getattr(settings, 'GOOGLE_TOKEN_REFRESH_MARGIN_MINUTES', 15)
+    tokens = list(
+        GoogleCalendarToken.objects.filter(
+            # A token with no recorded expiry may already be dead, so it is refreshed too
+            Q(token_expiry__lte=timezone.now() + timedelta(minutes=margin)) | Q(token_expiry__isnull=True),
+            is_active=True,
+        ).exclude(refresh_token='')
+    )
+    if not tokens:
+        return 0, 0
+
+    service = GoogleCalendarService()
+    request = Request(session=http_client.get_session('google_oauth'))
+    with ThreadPoolExecutor(max_workers=min(8, len(tokens))) as executor:
+        results = list(executor.map(lambda t: service.refresh_access_token(t, request=request, save=False), tokens))
+
+    refreshed = [token for token, ok in zip(tokens, results) if ok]
+    GoogleCalendarToken.objects.bulk_update(refreshed, ['access_token', 'token_expiry'])
+    logger.info(f"Refreshed {len(refreshed)} Google Calendar tokens, {len(tokens) - len(refreshed)} failed")
+    return len(refreshed), len(tokens) - len(refreshed)
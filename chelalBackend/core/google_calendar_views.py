@@ -1,5 +1,7 @@
 from django.shortcuts import redirect
 from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from django.contrib.auth.decorators import login_required
@@ -11,14 +13,15 @@ from rest_framework.response import Response
 from rest_framework import status
 import json
 import logging
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta, timezone as dt_timezone
 from google.oauth2.credentials import Credentials
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 from google.auth.transport.requests import Request
 
-from .models import User, Appointment, GoogleCalendarToken
+from .models import User, Appointment, GoogleCalendarToken, CalendarEvent
 from .google_calendar_service import GoogleCalendarService
+from .tasks import sync_google_calendar_task, refresh_google_token_task
 
 logger = logging.getLogger(__name__)
 
@@ -292,6 +295,51 @@ def sync_appointment_to_calendar(request):
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
 
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def bulk_sync_appointments_to_calendar(request):
+    """
+    Sync many appointments to Google Calendar using batched API requests
+    """
+    try:
+        appointment_ids = request.data.get('appointment_ids') or []
+        if not appointment_ids:
+            return Response(
+                {'error': 'Appointment IDs required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            token_obj = GoogleCalendarToken.objects.get(
+                user=request.user,
+                is_active=True
+            )
+        except GoogleCalendarToken.DoesNotExist:
+            return Response(
+                {'error': 'Google Calendar not connected'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        appointments = list(
+            Appointment.objects.select_related('patient', 'doctor').filter(id__in=appointment_ids)
+        )
+        service = GoogleCalendarService()
+        synced, errors = service.bulk_sync_appointments(appointments, token_obj)
+
+        return Response({
+            'success': len(synced),
+            'failed': len(errors),
+            'event_ids': synced,
+            'errors': errors
+        })
+
+    except Exception as e:
+        logger.error(f"Error bulk syncing appointments to calendar: {str(e)}")
+        return Response(
+            {'error': 'Failed to sync appointments'},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
 @api_view(['PUT'])
 @permission_classes([IsAuthenticated])
 def update_calendar_event(request):
@@ -426,11 +474,23 @@ def get_calendar_events(request):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        service = GoogleCalendarService()
-        events = service.get_calendar_events(token_obj, start_date, end_date)
+        # Served from the local mirror; deltas are pulled from Google in the background
+        stale_before = now() - timedelta(minutes=getattr(settings, 'GOOGLE_CALENDAR_STALE_MINUTES', 10))
+        stale = not token_obj.last_synced_at or token_obj.last_synced_at < stale_before
+        if stale and cache.add(f'google-calendar-sync:{token_obj.id}', True, timeout=60):
+            sync_google_calendar_task.delay(token_obj.id)
+
+        range_start = datetime.combine(date.fromisoformat(start_date), datetime.min.time(), tzinfo=dt_timezone.utc)
+        events = CalendarEvent.objects.filter(
+            # An event without an end is treated as ending when it starts
+            Q(end__gte=range_start) | Q(end__isnull=True, start__gte=range_start),
+            token=token_obj,
+            start__lt=datetime.combine(date.fromisoformat(end_date) + timedelta(days=1), datetime.min.time(), tzinfo=dt_timezone.utc),
+        ).order_by('start').values_list('data', flat=True)
 
         return Response({
-            'events': events
+            'events': list(events),
+            'last_synced_at': token_obj.last_synced_at
         })
 
     except Exception as e:
@@ -494,15 +554,13 @@ def check_calendar_connection(request):
 
         # Check if token is expired
         if token_obj.token_expiry and token_obj.token_expiry < now():
-            # Try to refresh the token
-            service = GoogleCalendarService()
-            refreshed = service.refresh_access_token(token_obj)
-
-            if not refreshed:
+            if not token_obj.refresh_token:
                 return Response({
                     'connected': False,
                     'message': 'Google Calendar token expired and could not be refreshed'
                 })
+            # Refresh in the background rather than on the request path
+            refresh_google_token_task.delay(token_obj.id)
 
         return Response({
             'connected': True,
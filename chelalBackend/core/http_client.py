@@ -0,0 +1,217 @@
+"""
+Shared outbound HTTP client.
+
+Every external dependency (RxNav, Google OAuth, Twilio) gets one pooled
+requests.Session with default timeouts, a retry/backoff policy for idempotent
+requests and a circuit breaker that stops calling it after repeated failures.
+Per-host latency and error counters are kept in-process and exposed through
+`get_metrics()`.
+"""
+import logging
+import threading
+import time
+from collections import deque
+from urllib.parse import urlsplit
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POLICY = {
+    'timeout': (3.05, 10),      # (connect, read) seconds
+    'retries': 2,               # idempotent methods only; POSTs are never replayed
+    'backoff_factor': 0.3,
+    'pool_maxsize': 10,
+    'failure_threshold': 5,     # consecutive failures before the breaker opens
+    'reset_timeout': 30,        # seconds before a trial request is let through
+}
+
+# Per-dependency overrides; extend or override with the HTTP_CLIENT_POLICIES setting
+POLICIES = {
+    'rxnav': {'timeout': (3.05, 5)},
+    'google_oauth': {'timeout': (3.05, 10), 'retries': 1},
+    'twilio': {'timeout': (3.05, 15), 'pool_maxsize': 20},
+}
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class CircuitOpenError(requests.ConnectionError):
+    """Raised instead of calling a dependency whose circuit breaker is open."""
+
+
+def get_policy(dependency):
+    overrides = getattr(settings, 'HTTP_CLIENT_POLICIES', {})
+    return {**DEFAULT_POLICY, **POLICIES.get(dependency, {}), **overrides.get(dependency, {})}
+
+
+class CircuitBreaker:
+    """Closed -> open after N consecutive failures -> half-open after reset_timeout."""
+
+    def __init__(self, name, failure_threshold, reset_timeout):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return 'half-open'
+        return 'open'
+
+    def allow(self):
+        with self._lock:
+            state = self.state
+            if state == 'half-open':
+                # Let exactly one trial request through until it reports back
+                self.opened_at = time.monotonic()
+            return state != 'open'
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.failure_threshold:
+                if self.opened_at is None:
+                    logger.warning(f"Circuit breaker for {self.name} opened after {self.failures} failures")
+                self.opened_at = time.monotonic()
+
+
+class _HostMetrics:
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.latencies = deque(maxlen=500)
+
+    def record(self, elapsed_ms, error):
+        self.requests += 1
+        self.errors += int(error)
+        self.total_ms += elapsed_ms
+        self.latencies.append(elapsed_ms)
+
+    def snapshot(self):
+        latencies = sorted(self.latencies)
+
+        def percentile(p):
+            return round(latencies[min(len(latencies) - 1, int(len(latencies) * p))], 1) if latencies else None
+
+        return {
+            'requests': self.requests,
+            'errors': self.errors,
+            'error_rate': round(self.errors / self.requests, 4) if self.requests else 0.0,
+            'avg_ms': round(self.total_ms / self.requests, 1) if self.requests else None,
+            'p50_ms': percentile(0.50),
+            'p95_ms': percentile(0.95),
+        }
+
+
+_sessions = {}
+_breakers = {}
+_metrics = {}
+_lock = threading.Lock()
+
+
+def get_session(dependency):
+    """Return the pooled session for a dependency, creating it on first use."""
+    session = _sessions.get(dependency)
+    if session is None:
+        with _lock:
+            session = _sessions.get(dependency)
+            if session is None:
+                policy = get_policy(dependency)
+                retry = Retry(
+                    total=policy['retries'],
+                    backoff_factor=policy['backoff_factor'],
+                    status_forcelist=RETRY_STATUSES,
+                    raise_on_status=False,
+                )
+                adapter = HTTPAdapter(pool_maxsize=policy['pool_maxsize'], max_retries=retry)
+                session = requests.Session()
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                _sessions[dependency] = session
+    return session
+
+
+def get_breaker(dependency):
+    breaker = _breakers.get(dependency)
+    if breaker is None:
+        with _lock:
+            breaker = _breakers.get(dependency)
+            if breaker is None:
+                policy = get_policy(dependency)
+                breaker = CircuitBreaker(dependency, policy['failure_threshold'], policy['reset_timeout'])
+                _breakers[dependency] = breaker
+    return breaker
+
+
+def record(dependency, url, elapsed_ms, error):
+    """Update host metrics and the dependency's breaker for one completed call."""
+    host = urlsplit(url).netloc
+    with _lock:
+        metrics = _metrics.setdefault(host, _HostMetrics())
+        metrics.record(elapsed_ms, error)
+    breaker = get_breaker(dependency)
+    if error:
+        breaker.record_failure()
+    else:
+        breaker.record_success()
+
+
+def request(dependency, method, url, **kwargs):
+    """
+    Make a request to an external dependency through its pooled session.
+    Server errors (5xx) and connection failures count against the circuit breaker;
+    while it is open, CircuitOpenError is raised without touching the network.
+    """
+    if not get_breaker(dependency).allow():
+        raise CircuitOpenError(f"{dependency} is unavailable (circuit open)")
+
+    kwargs.setdefault('timeout', get_policy(dependency)['timeout'])
+    start = time.perf_counter()
+    try:
+        response = get_session(dependency).request(method, url, **kwargs)
+    except requests.RequestException:
+        record(dependency, url, (time.perf_counter() - start) * 1000, error=True)
+        raise
+    record(dependency, url, (time.perf_counter() - start) * 1000, error=response.status_code >= 500)
+    return response
+
+
+def get(dependency, url, **kwargs):
+    return request(dependency, 'GET', url, **kwargs)
+
+
+def post(dependency, url, **kwargs):
+    return request(dependency, 'POST', url, **kwargs)
+
+
+def get_metrics():
+    """Per-host latency/error counters and per-dependency breaker states."""
+    with _lock:
+        hosts = {host: metrics.snapshot() for host, metrics in _metrics.items()}
+    breakers = {name: {'state': b.state, 'consecutive_failures': b.failures} for name, b in _breakers.items()}
+    return {'hosts': hosts, 'breakers': breakers}
+
+
+def reset():
+    """Drop all sessions, breakers and metrics (tests, or after a fork)."""
+    with _lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
+        _breakers.clear()
+        _metrics.clear()
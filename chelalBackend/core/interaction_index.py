@@ -0,0 +1,90 @@
+"""
+In-process drug-drug interaction index.
+
+Interactions from the DrugInteraction table are held in a dict keyed by a
+single integer per RxCUI pair, so checking a medication list is a handful of
+hash probes with no I/O. Each process rebuilds its copy when
+`load_drug_interactions` publishes a new dataset version.
+"""
+import logging
+import threading
+import time
+from itertools import combinations
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import DrugInteraction
+
+logger = logging.getLogger(__name__)
+
+VERSION_CACHE_KEY = 'drug-interactions:version'
+SEVERITY_ORDER = {"contraindicated": 0, "major": 1, "moderate": 2, "minor": 3}
+
+
+def pair_key(rxcui_a, rxcui_b):
+    """Order-independent 64-bit key for a pair of numeric RxCUIs."""
+    a, b = sorted((int(rxcui_a), int(rxcui_b)))
+    return (a << 32) | b
+
+
+class InteractionIndex:
+    def __init__(self, version=None):
+        self.version = version
+        self.loaded_at = time.monotonic()
+        self._pairs = {}
+
+    @classmethod
+    def from_database(cls, version=None):
+        index = cls(version)
+        descriptions = {}
+        for rxcui_a, rxcui_b, severity, description in DrugInteraction.objects.values_list(
+                'rxcui_a', 'rxcui_b', 'severity', 'description').iterator(chunk_size=10000):
+            # Many pairs share the same monograph text; keep one copy of each
+            description = descriptions.setdefault(description, description)
+            index._pairs[pair_key(rxcui_a, rxcui_b)] = (severity, description)
+        logger.info(f"Loaded drug interaction index with {len(index)} pairs")
+        return index
+
+    def __len__(self):
+        return len(self._pairs)
+
+    def find(self, rxcuis):
+        """Return interactions between any two of the given RxCUIs, most severe first."""
+        unique = sorted({int(r) for r in rxcuis if r and str(r).isdigit()})
+        found = []
+        for a, b in combinations(unique, 2):
+            hit = self._pairs.get((a << 32) | b)
+            if hit:
+                found.append({'rxcui_a': str(a), 'rxcui_b': str(b), 'severity': hit[0], 'description': hit[1]})
+        found.sort(key=lambda i: SEVERITY_ORDER.get(i['severity'], 99))
+        return found
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_interaction_index():
+    """
+    Return this process's index, rebuilding it if the published dataset version
+    changed (checked at most every INTERACTION_INDEX_CHECK_SECONDS).
+    """
+    global _index
+    check_every = getattr(settings, 'INTERACTION_INDEX_CHECK_SECONDS', 300)
+    index = _index
+    if index is not None and time.monotonic() - index.loaded_at < check_every:
+        return index
+
+    with _index_lock:
+        version = cache.get(VERSION_CACHE_KEY)
+        if _index is None or _index.version != version:
+            _index = InteractionIndex.from_database(version)
+        else:
+            _index.loaded_at = time.monotonic()
+        return _index
+
+
+def publish_new_version():
+    """Tell every process to rebuild its index on its next check."""
+    cache.set(VERSION_CACHE_KEY, time.time(), timeout=None)
@@ -0,0 +1,56 @@
+import time
+
+from django.conf import settings
+from django.core.mail import get_connection, EmailMessage
+from django.core.management.base import BaseCommand
+
+from core.email_utils import send_bulk_email
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark per-message vs batched email delivery against a local SMTP server, '
+        'e.g. one started with: python -m aiosmtpd -n -l localhost:1025'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='localhost', help='SMTP host (default: localhost)')
+        parser.add_argument('--port', type=int, default=1025, help='SMTP port (default: 1025)')
+        parser.add_argument('--count', type=int, default=500, help='Number of messages to send (default: 500)')
+        parser.add_argument('--chunk-size', type=int, default=settings.EMAIL_BATCH_SIZE, help='Messages per SMTP session')
+        parser.add_argument('--to', default='patient@example.com', help='Recipient address')
+
+    def handle(self, *args, **options):
+        connection_kwargs = {
+            'backend': 'django.core.mail.backends.smtp.EmailBackend',
+            'host': options['host'],
+            'port': options['port'],
+            'username': '',
+            'password': '',
+            'use_tls': False,
+            'fail_silently': False,
+        }
+        messages = [
+            {'to': options['to'], 'subject': f'Benchmark message {i}', 'message': 'Appointment reminder benchmark.'}
+            for i in range(options['count'])
+        ]
+
+        # Baseline: a new connection per message, as send_mail() does
+        start = time.perf_counter()
+        for m in messages:
+            connection = get_connection(**connection_kwargs)
+            EmailMessage(m['subject'], m['message'], settings.DEFAULT_FROM_EMAIL, [m['to']], connection=connection).send()
+        per_message = time.perf_counter() - start
+
+        start = time.perf_counter()
+        sent, failed = send_bulk_email(
+            messages,
+            chunk_size=options['chunk_size'],
+            connection=get_connection(**connection_kwargs),
+        )
+        batched = time.perf_counter() - start
+
+        count = len(messages)
+        self.stdout.write(f'Per-message connection: {count} messages in {per_message:.2f}s ({count / per_message:.1f} msg/s)')
+        self.stdout.write(f'Batched connection:     {sent} messages in {batched:.2f}s ({sent / batched:.1f} msg/s), {len(failed)} failed')
+        self.stdout.write(self.style.SUCCESS(f'Speed-up: {per_message / batched:.1f}x'))
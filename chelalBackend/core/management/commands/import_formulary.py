@@ -0,0 +1,31 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.formulary import import_formulary
+
+
+class Command(BaseCommand):
+    help = 'Upsert a CSV or NDJSON formulary into Medication, keyed on name.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Formulary file (.csv or .ndjson/.jsonl)')
+        parser.add_argument('--format', choices=['csv', 'ndjson'], help='File format (default: from extension)')
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Rows per upsert (default: 1000)')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not os.path.exists(path):
+            raise CommandError(f'{path} not found')
+        fmt = options['format'] or ('ndjson' if path.endswith(('.ndjson', '.jsonl')) else 'csv')
+
+        with open(path, encoding='utf-8-sig', newline='') as stream:
+            summary = import_formulary(stream, fmt, chunk_size=options['chunk_size'])
+
+        for error in summary['errors']:
+            self.stderr.write(f"line {error['line']}: {error['error']}")
+        self.stdout.write(self.style.SUCCESS(
+            f"{summary['rows']} rows in {summary['seconds']}s ({summary['rows_per_second']} rows/s): "
+            f"{summary['inserted']} inserted, {summary['updated']} updated, "
+            f"{summary['unchanged']} unchanged, {summary['failed']} failed"
+        ))
@@ -0,0 +1,65 @@
+import csv
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from core.interaction_index import publish_new_version
+from core.models import DrugInteraction
+
+SEVERITIES = {choice for choice, _ in DrugInteraction.SEVERITY_CHOICES}
+
+
+class Command(BaseCommand):
+    help = ('Load a drug-drug interaction dataset into the DrugInteraction table. '
+            'Expects a CSV with rxcui_a, rxcui_b, severity and description columns.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Path to the interaction CSV file')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows per bulk insert (default: 5000)')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not os.path.exists(path):
+            raise CommandError(f'{path} not found')
+
+        start = time.perf_counter()
+        batch_size = options['batch_size']
+        loaded = skipped = 0
+        seen = set()
+        batch = []
+
+        with open(path, encoding='utf-8', newline='') as source, transaction.atomic():
+            reader = csv.DictReader(source)
+            missing = {'rxcui_a', 'rxcui_b'} - set(reader.fieldnames or [])
+            if missing:
+                raise CommandError(f'Missing columns: {", ".join(sorted(missing))}')
+
+            DrugInteraction.objects.all().delete()
+            for row in reader:
+                a, b = row['rxcui_a'].strip(), row['rxcui_b'].strip()
+                severity = (row.get('severity') or 'moderate').strip().lower()
+                if not (a.isdigit() and b.isdigit()) or a == b or severity not in SEVERITIES:
+                    skipped += 1
+                    continue
+                a, b = sorted((a, b), key=int)
+                if (a, b) in seen:
+                    continue
+                seen.add((a, b))
+                batch.append(DrugInteraction(
+                    rxcui_a=a, rxcui_b=b, severity=severity,
+                    description=(row.get('description') or '').strip(),
+                ))
+                if len(batch) >= batch_size:
+                    DrugInteraction.objects.bulk_create(batch)
+                    loaded += len(batch)
+                    batch = []
+            DrugInteraction.objects.bulk_create(batch)
+            loaded += len(batch)
+            transaction.on_commit(publish_new_version)
+
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f'Loaded {loaded} drug interactions in {elapsed:.1f}s ({skipped} rows skipped)'
+        ))
@@ -0,0 +1,63 @@
+import csv
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from core.models import RxConcept
+from core.rxnorm_utils import TTY_RANK, normalize_drug_name, publish_new_version
+
+# Column positions in RXNCONSO.RRF (see the RxNorm technical documentation)
+RXCUI, LAT, SAB, TTY, STR, SUPPRESS = 0, 1, 11, 12, 14, 16
+
+
+class Command(BaseCommand):
+    help = 'Load RxNorm concept names from an RxNorm release (RXNCONSO.RRF) into the local RxConcept table.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Path to RXNCONSO.RRF or to the release "rrf" directory')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows per bulk insert (default: 5000)')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if os.path.isdir(path):
+            path = os.path.join(path, 'RXNCONSO.RRF')
+        if not os.path.exists(path):
+            raise CommandError(f'{path} not found')
+
+        start = time.perf_counter()
+        batch_size = options['batch_size']
+        loaded = 0
+        seen = set()
+        batch = []
+
+        with open(path, encoding='utf-8', newline='') as rrf, transaction.atomic():
+            RxConcept.objects.all().delete()
+            for row in csv.reader(rrf, delimiter='|', quoting=csv.QUOTE_NONE):
+                if len(row) <= SUPPRESS or row[SAB] != 'RXNORM' or row[LAT] != 'ENG' or row[SUPPRESS] != 'N':
+                    continue
+                name = row[STR]
+                normalized = normalize_drug_name(name)
+                if len(name) > 500 or (row[RXCUI], normalized) in seen:
+                    continue
+                seen.add((row[RXCUI], normalized))
+                batch.append(RxConcept(
+                    rxcui=row[RXCUI],
+                    name=name,
+                    normalized_name=normalized,
+                    tty=row[TTY],
+                    rank=TTY_RANK.get(row[TTY], 99),
+                ))
+                if len(batch) >= batch_size:
+                    RxConcept.objects.bulk_create(batch)
+                    loaded += len(batch)
+                    batch = []
+            RxConcept.objects.bulk_create(batch)
+            loaded += len(batch)
+
+        publish_new_version()
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f'Loaded {loaded} RxNorm concept names in {elapsed:.1f}s ({loaded / elapsed if elapsed else loaded:.0f} rows/s)'
+        ))
@@ -270,8 +270,6 @@ class Command(BaseCommand):
             bill = Bill.objects.create(
                 patient=encounter.patient,
                 encounter=encounter,
-                total_amount=Decimal(str(random.uniform(50, 500))).quantize(Decimal('0.01')),
-                is_paid=random.choice([True, False]),
                 notes=fake.text(max_nb_chars=100) if random.choice([True, False]) else '',
             )
 
@@ -285,8 +283,9 @@ class Command(BaseCommand):
                     amount=Decimal(str(random.uniform(10, 100))).quantize(Decimal('0.01')),
                 )
 
-            # Create payments for paid bills
-            if bill.is_paid:
+            # Pay some bills in full; the bill's totals follow from its items and payments
+            if random.choice([True, False]):
+                bill.refresh_from_db(fields=['total_amount'])
                 Payment.objects.create(
                     bill=bill,
                     amount=bill.total_amount,
@@ -0,0 +1,37 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.reconciliation import reconcile_statement
+
+
+class Command(BaseCommand):
+    help = 'Match a CSV bank statement against recorded payments by reference, amount and date.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Statement CSV with reference, amount and date columns')
+        parser.add_argument('--date-tolerance-days', type=int, default=3, help='Allowed payment date drift (default: 3)')
+        parser.add_argument('--show-unmatched', action='store_true', help='List unmatched and ambiguous lines')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not os.path.exists(path):
+            raise CommandError(f'{path} not found')
+
+        with open(path, encoding='utf-8-sig', newline='') as stream:
+            try:
+                result = reconcile_statement(stream, date_tolerance_days=options['date_tolerance_days'])
+            except ValueError as e:
+                raise CommandError(str(e))
+
+        for error in result['invalid']:
+            self.stderr.write(f"line {error['line']}: {error['error']}")
+        if options['show_unmatched']:
+            for line in result['unmatched']:
+                self.stdout.write(f"unmatched line {line['line']}: {line['reference']} {line['amount']} {line['date']}")
+            for line in result['ambiguous']:
+                self.stdout.write(f"ambiguous line {line['line']}: payments {line['payments']}")
+        self.stdout.write(self.style.SUCCESS(
+            f"{result['lines']} lines in {result['seconds']}s: {len(result['matched'])} matched, "
+            f"{len(result['unmatched'])} unmatched, {len(result['ambiguous'])} ambiguous, {len(result['invalid'])} invalid"
+        ))
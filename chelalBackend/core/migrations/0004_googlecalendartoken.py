@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:31
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_outboxmessage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GoogleCalendarToken',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('access_token', models.TextField()),
+                ('refresh_token', models.TextField(blank=True)),
+                ('token_expiry', models.DateTimeField(blank=True, null=True)),
+                ('calendar_id', models.CharField(default='primary', max_length=255)),
+                ('is_active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='google_calendar_token', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:32
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_googlecalendartoken'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='googlecalendartoken',
+            name='last_synced_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='googlecalendartoken',
+            name='sync_token',
+            field=models.TextField(blank=True),
+        ),
+        migrations.CreateModel(
+            name='CalendarEvent',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('google_event_id', models.CharField(max_length=1024)),
+                ('summary', models.CharField(blank=True, max_length=1024)),
+                ('start', models.DateTimeField(blank=True, null=True)),
+                ('end', models.DateTimeField(blank=True, null=True)),
+                ('updated', models.DateTimeField(blank=True, null=True)),
+                ('data', models.JSONField(default=dict)),
+                ('token', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='events', to='core.googlecalendartoken')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['token', 'start'], name='calendar_event_token_start_idx')],
+                'constraints': [models.UniqueConstraint(fields=('token', 'google_event_id'), name='unique_calendar_event_per_token')],
+            },
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_calendarevent_sync_token'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RxConcept',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('rxcui', models.CharField(db_index=True, max_length=8)),
+                ('name', models.CharField(max_length=500)),
+                ('normalized_name', models.CharField(db_index=True, max_length=500)),
+                ('tty', models.CharField(max_length=20)),
+                ('rank', models.PositiveSmallIntegerField(default=99)),
+            ],
+        ),
+    ]
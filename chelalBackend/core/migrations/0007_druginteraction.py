@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_rxconcept'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DrugInteraction',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('rxcui_a', models.CharField(max_length=8)),
+                ('rxcui_b', models.CharField(max_length=8)),
+                ('severity', models.CharField(choices=[('minor', 'Minor'), ('moderate', 'Moderate'), ('major', 'Major'), ('contraindicated', 'Contraindicated')], default='moderate', max_length=20)),
+                ('description', models.TextField(blank=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('rxcui_a', 'rxcui_b'), name='unique_drug_interaction_pair')],
+            },
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:42
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_druginteraction'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockBatch',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('batch_number', models.CharField(max_length=100)),
+                ('expiry_date', models.DateField()),
+                ('received_quantity', models.PositiveIntegerField()),
+                ('quantity', models.PositiveIntegerField()),
+                ('received_at', models.DateTimeField(auto_now_add=True)),
+                ('medication', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='batches', to='core.medication')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DispensingLog',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('quantity', models.PositiveIntegerField()),
+                ('dispensed_at', models.DateTimeField(auto_now_add=True)),
+                ('dispensed_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+                ('medication', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='dispensing_logs', to='core.medication')),
+                ('prescription', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='core.prescription')),
+                ('batch', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='dispensing_logs', to='core.stockbatch')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='stockbatch',
+            index=models.Index(fields=['medication', 'expiry_date'], name='stockbatch_fefo_idx'),
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:43
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+def record_opening_balances(apps, schema_editor):
+    # Existing stock enters the ledger as one opening adjustment per medication
+    Medication = apps.get_model('core', 'Medication')
+    StockMovement = apps.get_model('core', 'StockMovement')
+    StockMovement.objects.bulk_create([
+        StockMovement(medication_id=pk, kind='adjustment', quantity=stock, reason='Opening balance')
+        for pk, stock in Medication.objects.filter(current_stock__gt=0).values_list('pk', 'current_stock')
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_stockbatch_dispensinglog'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockMovement',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('kind', models.CharField(choices=[('receipt', 'Receipt'), ('dispense', 'Dispense'), ('adjustment', 'Adjustment'), ('expiry', 'Expiry')], max_length=20)),
+                ('quantity', models.IntegerField()),
+                ('reason', models.CharField(blank=True, max_length=255)),
+                ('occurred_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('batch', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='movements', to='core.stockbatch')),
+                ('medication', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='stock_movements', to='core.medication')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['medication', 'occurred_at'], name='stockmovement_med_time_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='StockSnapshot',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('as_of', models.DateTimeField()),
+                ('balance', models.IntegerField()),
+                ('medication', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_snapshots', to='core.medication')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('medication', 'as_of'), name='unique_stock_snapshot')],
+            },
+        ),
+        migrations.RunPython(record_opening_balances, migrations.RunPython.noop),
+    ]
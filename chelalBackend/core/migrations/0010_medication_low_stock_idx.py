@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_stock_ledger'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='medication',
+            index=models.Index(condition=models.Q(('current_stock__lte', models.F('reorder_level'))), fields=['current_stock'], name='medication_low_stock_idx'),
+        ),
+    ]
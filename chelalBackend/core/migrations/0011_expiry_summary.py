@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:47
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_medication_low_stock_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExpirySummary',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('window_days', models.PositiveSmallIntegerField(choices=[(30, '30 days'), (60, '60 days'), (90, '90 days')])),
+                ('batch_count', models.PositiveIntegerField()),
+                ('quantity', models.PositiveIntegerField()),
+                ('earliest_expiry', models.DateField()),
+                ('computed_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='stockbatch',
+            index=models.Index(fields=['expiry_date', 'quantity'], name='stockbatch_expiry_qty_idx'),
+        ),
+        migrations.AddField(
+            model_name='expirysummary',
+            name='medication',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='expiry_summaries', to='core.medication'),
+        ),
+        migrations.AddIndex(
+            model_name='expirysummary',
+            index=models.Index(fields=['window_days', 'earliest_expiry'], name='expirysummary_window_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='expirysummary',
+            constraint=models.UniqueConstraint(fields=('medication', 'window_days'), name='unique_expiry_summary'),
+        ),
+    ]
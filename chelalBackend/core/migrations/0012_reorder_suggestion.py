@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:48
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_expiry_summary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReorderSuggestion',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('moving_average', models.FloatField()),
+                ('smoothed_demand', models.FloatField()),
+                ('forecast_daily', models.FloatField()),
+                ('safety_stock', models.PositiveIntegerField()),
+                ('reorder_point', models.PositiveIntegerField()),
+                ('current_stock', models.PositiveIntegerField()),
+                ('suggested_quantity', models.PositiveIntegerField()),
+                ('computed_at', models.DateTimeField()),
+                ('medication', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='reorder_suggestion', to='core.medication')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-suggested_quantity'], name='reorder_suggested_qty_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:52
+
+from django.db import migrations, models
+from django.db.models import DecimalField, ExpressionWrapper, F, Sum
+
+
+def backfill_bill_amounts(apps, schema_editor):
+    # Totals come from items where a bill has any (legacy bills may carry a hand-entered total)
+    Bill = apps.get_model('core', 'Bill')
+    BillItem = apps.get_model('core', 'BillItem')
+    Payment = apps.get_model('core', 'Payment')
+    line = ExpressionWrapper(F('amount') * F('quantity'), output_field=DecimalField(max_digits=12, decimal_places=2))
+    totals = dict(BillItem.objects.values('bill_id').annotate(total=Sum(line)).values_list('bill_id', 'total'))
+    paid = dict(Payment.objects.values('bill_id').annotate(total=Sum('amount')).values_list('bill_id', 'total'))
+
+    bills = []
+    for bill in Bill.objects.only('id', 'total_amount', 'paid_amount', 'is_paid').iterator(chunk_size=2000):
+        bill.total_amount = totals.get(bill.id, bill.total_amount)
+        bill.paid_amount = paid.get(bill.id, 0)
+        bill.is_paid = bill.total_amount > 0 and bill.paid_amount >= bill.total_amount
+        bills.append(bill)
+        if len(bills) >= 1000:
+            Bill.objects.bulk_update(bills, ['total_amount', 'paid_amount', 'is_paid'])
+            bills = []
+    Bill.objects.bulk_update(bills, ['total_amount', 'paid_amount', 'is_paid'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_reorder_suggestion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bill',
+            name='paid_amount',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12),
+        ),
+        migrations.RunPython(backfill_bill_amounts, migrations.RunPython.noop),
+    ]
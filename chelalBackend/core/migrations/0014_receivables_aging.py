@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_bill_paid_amount'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReceivablesAgingSnapshot',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('as_of', models.DateField()),
+                ('bucket', models.CharField(max_length=10)),
+                ('bill_count', models.PositiveIntegerField()),
+                ('outstanding', models.DecimalField(decimal_places=2, max_digits=14)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='bill',
+            index=models.Index(condition=models.Q(('is_paid', False)), fields=['date_issued'], name='bill_unpaid_issued_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='receivablesagingsnapshot',
+            constraint=models.UniqueConstraint(fields=('as_of', 'bucket'), name='unique_aging_snapshot_bucket'),
+        ),
+    ]
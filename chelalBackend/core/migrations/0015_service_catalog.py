@@ -0,0 +1,59 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:55
+
+import logging
+
+from django.db import migrations, models
+from django.db.models import Count, Min, Value
+from django.db.models.functions import Concat
+
+logger = logging.getLogger(__name__)
+
+
+def detach_duplicate_encounter_bills(apps, schema_editor):
+    """
+    Before unique_bill_per_encounter can be added, keep the earliest bill on
+    each encounter and unlink any later ones. Nothing is deleted: the unlinked
+    bills keep their items and payments and are marked in their notes so they
+    can be reviewed.
+    """
+    Bill = apps.get_model('core', 'Bill')
+    keepers = (
+        Bill.objects.filter(encounter__isnull=False)
+        .values('encounter_id').annotate(keep=Min('id'), bills=Count('id')).filter(bills__gt=1)
+    )
+    for row in keepers:
+        duplicates = Bill.objects.filter(encounter_id=row['encounter_id']).exclude(pk=row['keep'])
+        ids = list(duplicates.values_list('id', flat=True))
+        duplicates.update(
+            encounter=None,
+            notes=Concat('notes', Value(
+                f"\n[Unlinked from encounter {row['encounter_id']}: duplicate of bill #{row['keep']}]"
+            )),
+        )
+        logger.warning(f"Encounter {row['encounter_id']}: kept bill #{row['keep']}, unlinked duplicate bill(s) {ids}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_receivables_aging'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ServiceCatalog',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('code', models.CharField(max_length=50, unique=True)),
+                ('name', models.CharField(max_length=255)),
+                ('category', models.CharField(choices=[('consultation', 'Consultation'), ('medication', 'Medication'), ('procedure', 'Procedure'), ('lab', 'Lab'), ('other', 'Other')], default='other', max_length=20)),
+                ('price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('is_active', models.BooleanField(default=True)),
+            ],
+        ),
+        migrations.RunPython(detach_duplicate_encounter_bills, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='bill',
+            constraint=models.UniqueConstraint(condition=models.Q(('encounter__isnull', False)), fields=('encounter',), name='unique_bill_per_encounter'),
+        ),
+    ]
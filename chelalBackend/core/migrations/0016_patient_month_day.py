@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:05
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def backfill_month_days(apps, schema_editor):
+    Patient = apps.get_model('core', 'Patient')
+    patients = []
+    for patient in Patient.objects.only('id', 'date_of_birth', 'created_at').iterator(chunk_size=2000):
+        registered = timezone.localtime(patient.created_at).date()
+        patient.birth_month_day = patient.date_of_birth.month * 100 + patient.date_of_birth.day
+        patient.registered_month_day = registered.month * 100 + registered.day
+        patients.append(patient)
+        if len(patients) >= 1000:
+            Patient.objects.bulk_update(patients, ['birth_month_day', 'registered_month_day'])
+            patients = []
+    Patient.objects.bulk_update(patients, ['birth_month_day', 'registered_month_day'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_service_catalog'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='patient',
+            name='birth_month_day',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='patient',
+            name='registered_month_day',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_month_days, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='patient',
+            index=models.Index(fields=['birth_month_day'], name='patient_birth_md_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='patient',
+            index=models.Index(fields=['registered_month_day'], name='patient_registered_md_idx'),
+        ),
+    ]
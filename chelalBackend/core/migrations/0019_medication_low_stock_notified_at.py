@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0018_outbox_sending'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='medication',
+            name='low_stock_notified_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,47 @@
+from datetime import date
+
+from django.db import migrations
+from django.db.models import Sum
+
+# Stock recorded before batches existed has no known lot or expiry. It is put in one
+# OPENING batch per medication with this placeholder expiry, so it stays dispensable
+# and is never written off automatically; pharmacists correct it with a stock count.
+OPENING_BATCH_NUMBER = 'OPENING'
+OPENING_BATCH_EXPIRY = date(2099, 12, 31)
+
+
+def create_opening_batches(apps, schema_editor):
+    """
+    Give every medication whose current_stock exceeds its batches an OPENING
+    batch holding the difference, and point its batch-less "Opening balance"
+    ledger movement (from 0009) at that batch.
+    """
+    Medication = apps.get_model('core', 'Medication')
+    StockBatch = apps.get_model('core', 'StockBatch')
+    StockMovement = apps.get_model('core', 'StockMovement')
+
+    in_batches = dict(
+        StockBatch.objects.values('medication_id').annotate(total=Sum('quantity')).values_list('medication_id', 'total')
+    )
+    for pk, stock in Medication.objects.filter(current_stock__gt=0).values_list('pk', 'current_stock').iterator():
+        missing = stock - (in_batches.get(pk) or 0)
+        if missing <= 0:
+            continue
+        batch = StockBatch.objects.create(
+            medication_id=pk, batch_number=OPENING_BATCH_NUMBER, expiry_date=OPENING_BATCH_EXPIRY,
+            received_quantity=missing, quantity=missing,
+        )
+        StockMovement.objects.filter(
+            medication_id=pk, batch__isnull=True, reason='Opening balance'
+        ).update(batch=batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0019_medication_low_stock_notified_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_opening_batches, migrations.RunPython.noop),
+    ]
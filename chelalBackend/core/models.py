@@ -2,6 +2,7 @@ from django.contrib.auth.models import AbstractUser
 from django.db import models
 from django.conf import settings
 import secrets
+from datetime import date
 from django.utils import timezone
 
 class Role(models.Model):
@@ -34,10 +35,32 @@ class Patient(models.Model):
     known_allergies = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # month * 100 + day of date_of_birth / registration, kept in step by save() for indexed occasion lookups
+    birth_month_day = models.PositiveSmallIntegerField(default=0, editable=False)
+    registered_month_day = models.PositiveSmallIntegerField(default=0, editable=False)
+
+    def save(self, *args, **kwargs):
+        born = self.date_of_birth
+        if isinstance(born, str):
+            born = date.fromisoformat(born)
+        self.birth_month_day = born.month * 100 + born.day
+        if self._state.adding or not self.registered_month_day:
+            registered = timezone.localtime(self.created_at).date() if self.created_at else timezone.localdate()
+            self.registered_month_day = registered.month * 100 + registered.day
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'date_of_birth' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'birth_month_day'}
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.first_name} {self.last_name} ({self.unique_id})"
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['birth_month_day'], name='patient_birth_md_idx'),
+            models.Index(fields=['registered_month_day'], name='patient_registered_md_idx'),
+        ]
+
 class Appointment(models.Model):
     id = models.AutoField(primary_key=True)
     STATUS_CHOICES = [
@@ -86,23 +109,214 @@ class Medication(models.Model):
     unit = models.CharField(max_length=50, default="tablet")
     current_stock = models.PositiveIntegerField(default=0)
     reorder_level = models.PositiveIntegerField(default=10)
+    # Set when pharmacy staff were told this item is low; cleared once it is restocked
+    low_stock_notified_at = models.DateTimeField(null=True, blank=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # Partial index: only the (few) rows at or below reorder level
+            models.Index(
+                fields=['current_stock'],
+                name='medication_low_stock_idx',
+                condition=models.Q(current_stock__lte=models.F('reorder_level')),
+            ),
+        ]
+
     def __str__(self):
         return f"{self.name} ({self.current_stock} {self.unit})"
 
+class StockBatch(models.Model):
+    """A received lot of a medication; `quantity` is what is left on the shelf."""
+    id = models.AutoField(primary_key=True)
+    medication = models.ForeignKey(Medication, on_delete=models.CASCADE, related_name='batches')
+    batch_number = models.CharField(max_length=100)
+    expiry_date = models.DateField()
+    received_quantity = models.PositiveIntegerField()
+    quantity = models.PositiveIntegerField()
+    received_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['medication', 'expiry_date'], name='stockbatch_fefo_idx'),
+            models.Index(fields=['expiry_date', 'quantity'], name='stockbatch_expiry_qty_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.medication.name} {self.batch_number} (exp {self.expiry_date})"
+
+class ExpirySummary(models.Model):
+    """Nightly roll-up of stock expiring within 30/60/90 days, per medication."""
+    WINDOW_CHOICES = [(30, "30 days"), (60, "60 days"), (90, "90 days")]
+
+    id = models.AutoField(primary_key=True)
+    medication = models.ForeignKey(Medication, on_delete=models.CASCADE, related_name='expiry_summaries')
+    window_days = models.PositiveSmallIntegerField(choices=WINDOW_CHOICES)
+    batch_count = models.PositiveIntegerField()
+    quantity = models.PositiveIntegerField()
+    earliest_expiry = models.DateField()
+    computed_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['medication', 'window_days'], name='unique_expiry_summary'),
+        ]
+        indexes = [
+            models.Index(fields=['window_days', 'earliest_expiry'], name='expirysummary_window_idx'),
+        ]
+
+class ReorderSuggestion(models.Model):
+    """Nightly demand forecast and suggested order quantity for a medication."""
+    id = models.AutoField(primary_key=True)
+    medication = models.OneToOneField(Medication, on_delete=models.CASCADE, related_name='reorder_suggestion')
+    moving_average = models.FloatField()        # mean daily demand over the moving-average window
+    smoothed_demand = models.FloatField()       # exponentially smoothed daily demand
+    forecast_daily = models.FloatField()
+    safety_stock = models.PositiveIntegerField()
+    reorder_point = models.PositiveIntegerField()
+    current_stock = models.PositiveIntegerField()
+    suggested_quantity = models.PositiveIntegerField()
+    computed_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-suggested_quantity'], name='reorder_suggested_qty_idx'),
+        ]
+
+class StockMovementQuerySet(models.QuerySet):
+    """Bulk updates and deletes would rewrite the ledger, so they are refused too."""
+
+    def update(self, **kwargs):
+        raise ValueError("Stock movements are append-only")
+
+    def delete(self):
+        raise ValueError("Stock movements are append-only")
+
+class StockMovement(models.Model):
+    """
+    Append-only stock ledger. `quantity` is signed (receipts positive, dispenses
+    and expiries negative); rows are never updated or deleted.
+    """
+    KIND_CHOICES = [
+        ("receipt", "Receipt"),
+        ("dispense", "Dispense"),
+        ("adjustment", "Adjustment"),
+        ("expiry", "Expiry"),
+    ]
+
+    id = models.BigAutoField(primary_key=True)
+    medication = models.ForeignKey(Medication, on_delete=models.PROTECT, related_name='stock_movements')
+    batch = models.ForeignKey(StockBatch, on_delete=models.PROTECT, null=True, blank=True, related_name='movements')
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    quantity = models.IntegerField()
+    reason = models.CharField(max_length=255, blank=True)
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    occurred_at = models.DateTimeField(default=timezone.now)
+
+    objects = StockMovementQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['medication', 'occurred_at'], name='stockmovement_med_time_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        if self.pk is not None:
+            raise ValueError("Stock movements are append-only")
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise ValueError("Stock movements are append-only")
+
+class StockSnapshot(models.Model):
+    """Ledger balance of a medication at `as_of`, taken nightly."""
+    id = models.BigAutoField(primary_key=True)
+    medication = models.ForeignKey(Medication, on_delete=models.CASCADE, related_name='stock_snapshots')
+    as_of = models.DateTimeField()
+    balance = models.IntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['medication', 'as_of'], name='unique_stock_snapshot'),
+        ]
+
+class DispensingLog(models.Model):
+    id = models.AutoField(primary_key=True)
+    medication = models.ForeignKey(Medication, on_delete=models.CASCADE, related_name='dispensing_logs')
+    batch = models.ForeignKey(StockBatch, on_delete=models.PROTECT, related_name='dispensing_logs')
+    prescription = models.ForeignKey(Prescription, on_delete=models.SET_NULL, null=True, blank=True)
+    quantity = models.PositiveIntegerField()
+    dispensed_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    dispensed_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.quantity} x {self.medication.name} from batch {self.batch.batch_number}"
+
+class ServiceCatalog(models.Model):
+    """Price list used to bill encounters (consultations, medications, procedures, ...)."""
+    CATEGORY_CHOICES = [
+        ("consultation", "Consultation"),
+        ("medication", "Medication"),
+        ("procedure", "Procedure"),
+        ("lab", "Lab"),
+        ("other", "Other"),
+    ]
+
+    id = models.AutoField(primary_key=True)
+    code = models.CharField(max_length=50, unique=True)
+    name = models.CharField(max_length=255)
+    category = models.CharField(max_length=20, choices=CATEGORY_CHOICES, default="other")
+    price = models.DecimalField(max_digits=10, decimal_places=2)
+    is_active = models.BooleanField(default=True)
+
+    def __str__(self):
+        return f"{self.code} - {self.name} ({self.price})"
+
 class Bill(models.Model):
     id = models.AutoField(primary_key=True)
     patient = models.ForeignKey(Patient, on_delete=models.CASCADE, related_name='bills')
     encounter = models.ForeignKey(Encounter, on_delete=models.SET_NULL, null=True, blank=True)
     date_issued = models.DateTimeField(auto_now_add=True)
+    # total_amount, paid_amount and is_paid are maintained by core.billing from items and payments
     total_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    paid_amount = models.DecimalField(max_digits=12, decimal_places=2, default=0)
     is_paid = models.BooleanField(default=False)
     notes = models.TextField(blank=True)
 
+    DERIVED_FIELDS = ('total_amount', 'paid_amount', 'is_paid')
+
+    @property
+    def balance(self):
+        return self.total_amount - self.paid_amount
+
+    def save(self, *args, **kwargs):
+        if self._state.adding:
+            # A new bill starts empty; saving its items and payments adds to these
+            for name in self.DERIVED_FIELDS:
+                setattr(self, name, self._meta.get_field(name).get_default())
+        # Never write back possibly stale copies of the maintained amounts
+        elif kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                f.name for f in self._meta.concrete_fields
+                if not f.primary_key and f.name not in self.DERIVED_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f"Bill #{self.id} for {self.patient}"
 
+    class Meta:
+        indexes = [
+            # Partial index over open bills only, for receivables aging
+            models.Index(fields=['date_issued'], name='bill_unpaid_issued_idx', condition=models.Q(is_paid=False)),
+        ]
+        constraints = [
+            # At most one bill per encounter, which makes batch billing safe to re-run
+            models.UniqueConstraint(
+                fields=['encounter'], name='unique_bill_per_encounter', condition=models.Q(encounter__isnull=False)
+            ),
+        ]
+
 class BillItem(models.Model):
     id = models.AutoField(primary_key=True)
     bill = models.ForeignKey(Bill, on_delete=models.CASCADE, related_name='items')
@@ -125,6 +339,48 @@ class Payment(models.Model):
     def __str__(self):
         return f"Payment {self.amount} for Bill #{self.bill.id}"
 
+class ReceivablesAgingSnapshot(models.Model):
+    """Outstanding balances per aging bucket, recorded nightly."""
+    id = models.AutoField(primary_key=True)
+    as_of = models.DateField()
+    bucket = models.CharField(max_length=10)
+    bill_count = models.PositiveIntegerField()
+    outstanding = models.DecimalField(max_digits=14, decimal_places=2)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['as_of', 'bucket'], name='unique_aging_snapshot_bucket'),
+        ]
+
+class ReportJob(models.Model):
+    """A report requested through the API and produced by a Celery worker."""
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('succeeded', 'Succeeded'),
+        ('failed', 'Failed'),
+    ]
+    id = models.AutoField(primary_key=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='report_jobs')
+    report = models.CharField(max_length=50)
+    params = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    file = models.FileField(upload_to='reports/%Y/%m/', blank=True)
+    rows = models.PositiveIntegerField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', '-created_at'], name='reportjob_user_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.report} #{self.id} ({self.status})"
+
 class Notification(models.Model):
     id = models.AutoField(primary_key=True)
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='notifications')
@@ -198,3 +454,112 @@ class RoleChangeRequest(models.Model):
 
     def __str__(self):
         return f"Role change request by {self.user.username} to {self.requested_role.name}"
+
+class GoogleCalendarToken(models.Model):
+    id = models.AutoField(primary_key=True)
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='google_calendar_token')
+    access_token = models.TextField()
+    refresh_token = models.TextField(blank=True)
+    token_expiry = models.DateTimeField(null=True, blank=True)
+    calendar_id = models.CharField(max_length=255, default='primary')
+    is_active = models.BooleanField(default=True)
+    sync_token = models.TextField(blank=True)  # Google nextSyncToken for incremental event sync
+    last_synced_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Google Calendar token for {self.user.username}"
+
+class CalendarEvent(models.Model):
+    """Local mirror of a user's Google Calendar events, kept current by incremental sync."""
+    id = models.AutoField(primary_key=True)
+    token = models.ForeignKey(GoogleCalendarToken, on_delete=models.CASCADE, related_name='events')
+    google_event_id = models.CharField(max_length=1024)
+    summary = models.CharField(max_length=1024, blank=True)
+    start = models.DateTimeField(null=True, blank=True)
+    end = models.DateTimeField(null=True, blank=True)
+    updated = models.DateTimeField(null=True, blank=True)
+    data = models.JSONField(default=dict)  # Event resource as returned by Google
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['token', 'google_event_id'], name='unique_calendar_event_per_token'),
+        ]
+        indexes = [
+            models.Index(fields=['token', 'start'], name='calendar_event_token_start_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.summary} ({self.start})"
+
+class RxConcept(models.Model):
+    """RxNorm concept name, loaded from the RXNCONSO.RRF release file by `load_rxnorm`."""
+    id = models.AutoField(primary_key=True)
+    rxcui = models.CharField(max_length=8, db_index=True)
+    name = models.CharField(max_length=500)
+    normalized_name = models.CharField(max_length=500, db_index=True)
+    tty = models.CharField(max_length=20)  # RxNorm term type, e.g. IN, SCD, BN
+    rank = models.PositiveSmallIntegerField(default=99)  # Lower wins when a name maps to several concepts
+
+    def __str__(self):
+        return f"{self.name} ({self.rxcui})"
+
+class DrugInteraction(models.Model):
+    """Known drug-drug interaction between two RxCUIs, stored with rxcui_a < rxcui_b."""
+    SEVERITY_CHOICES = [
+        ("minor", "Minor"),
+        ("moderate", "Moderate"),
+        ("major", "Major"),
+        ("contraindicated", "Contraindicated"),
+    ]
+
+    id = models.AutoField(primary_key=True)
+    rxcui_a = models.CharField(max_length=8)
+    rxcui_b = models.CharField(max_length=8)
+    severity = models.CharField(max_length=20, choices=SEVERITY_CHOICES, default="moderate")
+    description = models.TextField(blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['rxcui_a', 'rxcui_b'], name='unique_drug_interaction_pair'),
+        ]
+
+    def __str__(self):
+        return f"{self.rxcui_a} x {self.rxcui_b} ({self.severity})"
+
+class OutboxMessage(models.Model):
+    """
+    Outbound side effect (email, SMS, calendar sync) recorded in the same
+    transaction as the change that caused it and delivered by Celery after commit.
+    """
+    KIND_CHOICES = [
+        ("email", "Email"),
+        ("sms", "SMS"),
+        ("calendar", "Calendar sync"),
+    ]
+    STATUS_CHOICES = [
+        ("pending", "Pending"),
+        ("sending", "Sending"),  # claimed by a dispatcher until available_at
+        ("sent", "Sent"),
+        ("failed", "Failed"),
+    ]
+
+    id = models.AutoField(primary_key=True)
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    dedup_key = models.CharField(max_length=255, unique=True)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="pending")
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    available_at = models.DateTimeField(default=timezone.now)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'available_at'], name='outbox_status_available_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} {self.dedup_key} ({self.status})"
@@ -0,0 +1,67 @@
+"""
+Today's patient birthdays and registration anniversaries (yearly follow-up
+reminders) for the dashboard.
+
+Both are looked up through Patient's indexed birth_month_day and
+registered_month_day columns instead of extracting month and day from every
+row. The day's list is computed once and cached until local midnight.
+"""
+import calendar
+from datetime import datetime, timedelta
+
+from django.core.cache import cache
+from django.utils import timezone
+
+from .models import Patient
+
+
+def _cache_key(day):
+    return f'occasions:{day.isoformat()}'
+
+
+def month_days(day):
+    """Month-day keys celebrated on `day`; 29 February is marked on the 28th in non-leap years."""
+    keys = [day.month * 100 + day.day]
+    if (day.month, day.day) == (2, 28) and not calendar.isleap(day.year):
+        keys.append(229)
+    return keys
+
+
+def _years_since(earlier, day):
+    return day.year - earlier.year - ((day.month, day.day) < (earlier.month, earlier.day))
+
+
+def compute_occasions(day):
+    keys = month_days(day)
+    fields = ('id', 'unique_id', 'first_name', 'last_name')
+    birthdays = [
+        {**dict(zip(fields, row[:4])), 'age': _years_since(row[4], day)}
+        for row in Patient.objects.filter(birth_month_day__in=keys)
+        .order_by('last_name', 'first_name').values_list(*fields, 'date_of_birth')
+    ]
+    start_of_day = timezone.make_aware(datetime.combine(day, datetime.min.time()))
+    anniversaries = []
+    for row in (Patient.objects.filter(registered_month_day__in=keys, created_at__lt=start_of_day)
+                .order_by('created_at').values_list(*fields, 'created_at')):
+        registered = timezone.localtime(row[4]).date()
+        anniversaries.append({
+            **dict(zip(fields, row[:4])),
+            'registered_on': registered,
+            'years': max(_years_since(registered, day), 1),
+        })
+    return {'birthdays_today': birthdays, 'anniversaries': anniversaries}
+
+
+def todays_occasions():
+    """Birthdays and anniversaries for today, cached until local midnight."""
+    today = timezone.localdate()
+    result = cache.get(_cache_key(today))
+    if result is None:
+        result = compute_occasions(today)
+        midnight = timezone.make_aware(datetime.combine(today + timedelta(days=1), datetime.min.time()))
+        cache.set(_cache_key(today), result, max(int((midnight - timezone.now()).total_seconds()), 1))
+    return result
+
+
+def invalidate():
+    cache.delete(_cache_key(timezone.localdate()))
@@ -0,0 +1,134 @@
+"""
+Transactional outbox for outbound side effects.
+
+Call ``enqueue`` inside the transaction that makes the change; the message row
+commits (or rolls back) together with it and is handed to Celery only after
+commit. Delivery is at-least-once: a message stays pending until its handler
+succeeds, and ``dispatch_pending_outbox`` picks up anything whose task was lost,
+or whose dispatcher died mid-send (its claim expires after OUTBOX_CLAIM_SECONDS).
+Handlers must therefore tolerate the occasional duplicate.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import OutboxMessage
+
+logger = logging.getLogger(__name__)
+
+HANDLERS = {}
+
+
+def register_handler(kind):
+    """Register a handler for an outbox message kind. Handlers return (success, result)."""
+    def decorator(func):
+        HANDLERS[kind] = func
+        return func
+    return decorator
+
+
+@register_handler("email")
+def _send_email(payload):
+    from .email_utils import send_email
+    return send_email(payload['to'], payload['subject'], payload['message'])
+
+
+@register_handler("sms")
+def _send_sms(payload):
+    from .twilio_utils import send_sms_via_twilio
+    return send_sms_via_twilio(payload['to'], payload['message'])
+
+
+@register_handler("calendar")
+def _sync_calendar(payload):
+    from .google_calendar_service import GoogleCalendarService
+    from .models import Appointment, GoogleCalendarToken
+    token_obj = GoogleCalendarToken.objects.filter(user_id=payload['user_id'], is_active=True).first()
+    if not token_obj:
+        return False, 'Google Calendar not connected'
+    appointment = Appointment.objects.select_related('patient', 'doctor').get(id=payload['appointment_id'])
+    event_id = GoogleCalendarService().create_appointment_event(appointment, token_obj)
+    return bool(event_id), event_id or 'Calendar sync failed'
+
+
+def enqueue(kind, dedup_key, payload):
+    """
+    Record an outbound side effect in the current transaction.
+    A message with the same dedup_key is only ever recorded once.
+    :return: OutboxMessage
+    """
+    message, created = OutboxMessage.objects.get_or_create(
+        dedup_key=dedup_key,
+        defaults={'kind': kind, 'payload': payload},
+    )
+    if created:
+        transaction.on_commit(lambda: _schedule_dispatch(message.id))
+    return message
+
+
+def _schedule_dispatch(message_id):
+    from .tasks import dispatch_outbox_message_task
+    try:
+        dispatch_outbox_message_task.delay(message_id)
+    except Exception as e:
+        # The periodic sweep delivers it once the broker is reachable again
+        logger.error(f"Could not queue outbox message {message_id}: {str(e)}")
+
+
+def dispatch(message_id):
+    """
+    Deliver one pending outbox message.
+    The message is first claimed by one conditional UPDATE that marks it
+    sending and commits straight away; concurrent workers then skip it while
+    the handler runs, and no row lock or transaction is held for the length of
+    the provider call.
+    :return: (success, result)
+    """
+    max_attempts = getattr(settings, 'OUTBOX_MAX_ATTEMPTS', 5)
+    now = timezone.now()
+    claimed = OutboxMessage.objects.filter(
+        Q(status="pending") | Q(status="sending", available_at__lte=now), id=message_id,
+    ).update(
+        status="sending",
+        attempts=F('attempts') + 1,
+        available_at=now + timedelta(seconds=getattr(settings, 'OUTBOX_CLAIM_SECONDS', 300)),
+    )
+    if not claimed:
+        return False, 'Message not pending or already claimed'
+    message = OutboxMessage.objects.get(id=message_id)
+
+    handler = HANDLERS.get(message.kind)
+    if handler is None:
+        success, result = False, f'No handler registered for {message.kind}'
+    else:
+        try:
+            success, result = handler(message.payload)
+        except Exception as e:
+            success, result = False, str(e)
+
+    if success:
+        message.status = "sent"
+        message.sent_at = timezone.now()
+        message.last_error = ''
+    else:
+        message.last_error = str(result)
+        if message.attempts >= max_attempts:
+            message.status = "failed"
+        else:
+            message.status = "pending"
+            message.available_at = timezone.now() + timedelta(minutes=2 ** message.attempts)
+    message.save(update_fields=['status', 'last_error', 'available_at', 'sent_at'])
+    return success, result
+
+
+def pending_message_ids(limit=500):
+    """Ids of pending messages, and claims that have expired, that are due for (re)delivery."""
+    return list(
+        OutboxMessage.objects.filter(status__in=("pending", "sending"), available_at__lte=timezone.now())
+        .order_by('available_at')
+        .values_list('id', flat=True)[:limit]
+    )
@@ -1,11 +1,12 @@
 from celery import shared_task
-from .views import schedule_upcoming_appointment_reminders
-from .tasks import send_appointment_followup_task
-from .models import Appointment
+from .tasks import send_appointment_followups_batch_task, dispatch_outbox_message_task, sync_google_calendar_task
+from .models import Appointment, GoogleCalendarToken
+from django.conf import settings
 from django.utils import timezone
 
 @shared_task
 def periodic_appointment_reminder():
+    from .views import schedule_upcoming_appointment_reminders
     # Schedule reminders for appointments 24 hours in advance
     schedule_upcoming_appointment_reminders(hours_before=24)
 
@@ -14,10 +15,103 @@ def periodic_appointment_followup():
     # Send follow-ups for appointments completed 1 hour ago
     now = timezone.now()
     one_hour_ago = now - timezone.timedelta(hours=1)
-    appointments = Appointment.objects.filter(
+    appointment_ids = list(Appointment.objects.filter(
         status="completed",
         updated_at__gte=one_hour_ago,
         updated_at__lt=now
+    ).values_list('id', flat=True))
+    chunk_size = getattr(settings, 'FOLLOWUP_BATCH_SIZE', 200)
+    for start in range(0, len(appointment_ids), chunk_size):
+        send_appointment_followups_batch_task.delay(appointment_ids[start:start + chunk_size])
+    return {'appointments': len(appointment_ids)}
+
+@shared_task
+def dispatch_pending_outbox():
+    # Redeliver outbox messages whose post-commit task was lost or failed
+    from .outbox import pending_message_ids
+    message_ids = pending_message_ids()
+    for message_id in message_ids:
+        dispatch_outbox_message_task.delay(message_id)
+    return {'queued': len(message_ids)}
+
+@shared_task
+def periodic_google_calendar_sync():
+    # Pull calendar deltas for every connected user into the local mirror
+    token_ids = list(GoogleCalendarToken.objects.filter(is_active=True).values_list('id', flat=True))
+    for token_id in token_ids:
+        sync_google_calendar_task.delay(token_id)
+    return {'queued': len(token_ids)}
+
+@shared_task
+def periodic_google_token_refresh():
+    # Refresh tokens before they expire so request-path calendar calls never have to
+    from .google_calendar_service import refresh_expiring_tokens
+    refreshed, failed = refresh_expiring_tokens()
+    return {'refreshed': refreshed, 'failed': failed}
+
+@shared_task
+def nightly_stock_snapshot():
+    # Snapshot ledger balances at local midnight so as-of queries only replay a day of movements
+    from .dispensing import take_stock_snapshots
+    midnight = timezone.make_aware(
+        timezone.datetime.combine(timezone.localdate(), timezone.datetime.min.time())
     )
-    for appointment in appointments:
-        send_appointment_followup_task.delay(appointment.id)
+    return {'snapshots': take_stock_snapshots(as_of=midnight)}
+
+@shared_task
+def expire_stock_batches():
+    # Write off expired batches through the ledger
+    from .dispensing import expire_batches
+    return {'expired_batches': expire_batches()}
+
+@shared_task
+def periodic_low_stock_check():
+    # One set-based pass over all medications; pharmacy staff are notified when the list changes
+    from .stock_alerts import refresh_low_stock
+    payload = refresh_low_stock()
+    return {'low_stock': payload['count']}
+
+@shared_task
+def nightly_expiry_summary():
+    # Roll near-expiry stock into 30/60/90-day buckets for the near-expiry endpoint
+    from .stock_alerts import rebuild_expiry_summary
+    return {'rows': rebuild_expiry_summary()}
+
+@shared_task
+def nightly_reorder_suggestions():
+    # Forecast demand for every medication and refresh suggested order quantities
+    from .forecasting import refresh_reorder_suggestions
+    return {'medications': refresh_reorder_suggestions()}
+
+@shared_task
+def nightly_receivables_aging_snapshot():
+    # Record the day's receivables aging so finance can compare dates without recomputing
+    from .billing import snapshot_receivables_aging
+    buckets = snapshot_receivables_aging()
+    return {'outstanding': str(sum(b['outstanding'] for b in buckets))}
+
+@shared_task
+def end_of_day_billing():
+    # Bill every encounter of the day that has no bill yet
+    from .billing import generate_bills_for_day
+    summary = generate_bills_for_day()
+    return {'bills': summary['bills'], 'items': summary['items'], 'unpriced': len(summary['unpriced'])}
+
+@shared_task
+def nightly_analytics_extract():
+    # Refresh the Parquet extract behind the analytics dashboards; rebuild every month on Sundays
+    from .analytics import run_extract
+    manifest = run_extract(full=timezone.localdate().weekday() == 6)
+    return {'seconds': manifest['seconds'], 'rows': {name: t['rows'] for name, t in manifest['tables'].items()}}
+
+@shared_task
+def purge_report_jobs():
+    # Drop report jobs and their files once they are past the retention window
+    from .report_jobs import purge_expired
+    return {'purged': purge_expired()}
+
+@shared_task
+def fail_stale_report_jobs():
+    # Fail report jobs whose worker died after claiming them, so their requesters hear about it
+    from .report_jobs import fail_stale_jobs
+    return {'failed': fail_stale_jobs()}
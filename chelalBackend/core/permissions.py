@@ -44,6 +44,15 @@ class IsNurse(BasePermission):
         return request.user.is_authenticated and role == 'NURSE'
 
 
+class IsDoctor(BasePermission):
+    """Allow access only to users with role DOCTOR (or ADMIN)."""
+    def has_permission(self, request, view):
+        role = _role_name(request.user)
+        if role == 'ADMIN':
+            return True
+        return request.user.is_authenticated and role == 'DOCTOR'
+
+
 class IsPharmacist(BasePermission):
     """Allow access only to users with role PHARMACIST (or ADMIN)."""
     def has_permission(self, request, view):
@@ -0,0 +1,136 @@
+"""
+Bank / mobile-money statement reconciliation against Payment.
+
+The statement is streamed once into compact tuples; its date range then
+drives a single query that loads candidate payments into in-memory hash
+indexes keyed by reference and by (amount, date). Each line is matched with
+dict lookups only, so a 100k-line statement needs no per-line queries.
+"""
+import csv
+import io
+import logging
+import re
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal, InvalidOperation
+
+from django.utils import timezone
+
+from .models import Payment
+
+logger = logging.getLogger(__name__)
+
+REFERENCE_COLUMNS = ('reference', 'ref', 'transaction_id', 'transaction_ref')
+AMOUNT_COLUMNS = ('amount', 'credit', 'value')
+DATE_COLUMNS = ('date', 'value_date', 'transaction_date', 'posted_date')
+DATE_FORMATS = ('%Y-%m-%d', '%d/%m/%Y', '%d-%m-%Y', '%Y/%m/%d')
+MAX_DATE_TOLERANCE_DAYS = 31
+
+
+NON_ALPHANUMERIC = re.compile(r'[^0-9A-Z]')
+
+
+def normalize_reference(reference):
+    """Banks reformat references freely, so compare on upper-case letters and digits only."""
+    return NON_ALPHANUMERIC.sub('', (reference or '').upper())
+
+
+def _parse_date(value):
+    value = (value or '').strip()[:10]
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).date()
+        except ValueError:
+            continue
+    raise ValueError(f'Unrecognised date: {value!r}')
+
+
+def _column(fieldnames, candidates):
+    lowered = {name.strip().lower(): name for name in fieldnames or []}
+    return next((lowered[c] for c in candidates if c in lowered), None)
+
+
+def read_statement(stream):
+    """
+    Parse a CSV statement into (lines, errors), where each line is
+    (line number, normalized reference, amount, date).
+    """
+    if isinstance(stream.read(0), bytes):
+        stream = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    reader = csv.DictReader(stream)
+    ref_col = _column(reader.fieldnames, REFERENCE_COLUMNS)
+    amount_col = _column(reader.fieldnames, AMOUNT_COLUMNS)
+    date_col = _column(reader.fieldnames, DATE_COLUMNS)
+    if not (amount_col and date_col):
+        raise ValueError('Statement needs amount and date columns')
+
+    lines, errors = [], []
+    for line_number, row in enumerate(reader, start=2):
+        try:
+            amount = Decimal((row[amount_col] or '').replace(',', '').strip()).quantize(Decimal('0.01'))
+            lines.append((line_number, normalize_reference(row.get(ref_col) if ref_col else ''), amount, _parse_date(row[date_col])))
+        except (InvalidOperation, ValueError) as e:
+            errors.append({'line': line_number, 'error': str(e) or 'Invalid amount'})
+    return lines, errors
+
+
+def reconcile_statement(stream, date_tolerance_days=3):
+    """
+    Match statement lines to payments by reference, amount and date.
+    A line matches when exactly one unclaimed payment shares its reference and
+    amount with a payment date within the tolerance; lines without a reference
+    fall back to a unique (amount, date) match.
+    :return: dict with matched, unmatched, ambiguous and invalid lists plus timing
+    :raises ValueError: when date_tolerance_days is outside 0..MAX_DATE_TOLERANCE_DAYS
+    """
+    if not 0 <= date_tolerance_days <= MAX_DATE_TOLERANCE_DAYS:
+        raise ValueError(f'date_tolerance_days must be between 0 and {MAX_DATE_TOLERANCE_DAYS}')
+    started = time.perf_counter()
+    lines, errors = read_statement(stream)
+    result = {'matched': [], 'unmatched': [], 'ambiguous': [], 'invalid': errors}
+    if not lines:
+        result.update(lines=0, seconds=round(time.perf_counter() - started, 3))
+        return result
+
+    tolerance = timedelta(days=date_tolerance_days)
+    first = min(line[3] for line in lines) - tolerance
+    last = max(line[3] for line in lines) + tolerance + timedelta(days=1)
+
+    by_reference, by_amount_date = {}, {}
+    payments = Payment.objects.filter(
+        payment_date__gte=timezone.make_aware(datetime.combine(first, datetime.min.time())),
+        payment_date__lt=timezone.make_aware(datetime.combine(last, datetime.min.time())),
+    ).values_list('id', 'reference', 'amount', 'payment_date', 'bill_id')
+    for payment_id, reference, amount, paid_at, bill_id in payments.iterator(chunk_size=5000):
+        payment = (payment_id, amount, timezone.localtime(paid_at).date(), bill_id)
+        if reference:
+            by_reference.setdefault(normalize_reference(reference), []).append(payment)
+        by_amount_date.setdefault((amount, payment[2]), []).append(payment)
+
+    claimed = set()
+    for line_number, reference, amount, day in lines:
+        if reference:
+            candidates = [
+                p for p in by_reference.get(reference, ())
+                if p[1] == amount and abs(p[2] - day) <= tolerance and p[0] not in claimed
+            ]
+        else:
+            candidates = [p for p in by_amount_date.get((amount, day), ()) if p[0] not in claimed]
+
+        line = {'line': line_number, 'reference': reference, 'amount': str(amount), 'date': day}
+        if len(candidates) == 1:
+            claimed.add(candidates[0][0])
+            result['matched'].append({**line, 'payment': candidates[0][0], 'bill': candidates[0][3],
+                                      'match': 'reference' if reference else 'amount_date'})
+        elif candidates:
+            result['ambiguous'].append({**line, 'payments': [p[0] for p in candidates]})
+        else:
+            result['unmatched'].append(line)
+
+    result['lines'] = len(lines)
+    result['seconds'] = round(time.perf_counter() - started, 3)
+    logger.info(
+        f"Reconciled {len(lines)} statement lines: {len(result['matched'])} matched, "
+        f"{len(result['unmatched'])} unmatched, {len(result['ambiguous'])} ambiguous in {result['seconds']}s"
+    )
+    return result
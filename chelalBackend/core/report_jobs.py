@@ -0,0 +1,274 @@
+"""
+Asynchronous report jobs.
+
+Heavy reports and exports are submitted as ReportJob rows and produced by a
+Celery worker instead of a gunicorn request thread. Each run happens in its
+own transaction with a PostgreSQL statement_timeout
+(REPORT_JOB_STATEMENT_TIMEOUT_SECONDS), so a runaway query is cancelled
+rather than holding a connection. The output is written to a temporary file,
+stored in default storage and announced to the requester with a Notification
+(also pushed over the notifications websocket). Clients poll the job or wait
+for the notification, then download the file.
+"""
+import csv
+import io
+import json
+import logging
+import os
+import tempfile
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.files import File
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from django.db.models import Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from rest_framework.permissions import IsAdminUser
+
+from .models import Bill, Payment, Notification, ReportJob
+from .permissions import IsDoctor
+
+logger = logging.getLogger(__name__)
+
+MAX_RANGE_DAYS = 3 * 366
+# A running job older than the task's hard time limit plus this margin has lost its worker
+STALE_MARGIN_SECONDS = 300
+
+
+class Report:
+    def __init__(self, build, extension, permission, date_range=False):
+        self.build = build
+        self.extension = extension
+        self.permission = permission
+        self.date_range = date_range
+
+
+REPORTS = {}
+
+
+def report(name, extension, permission=IsAdminUser, date_range=False):
+    """Register `build(params, out) -> row count` as a report writing text to `out`."""
+    def register(build):
+        REPORTS[name] = Report(build, extension, permission, date_range)
+        return build
+    return register
+
+
+def clean_params(name, params):
+    """
+    Validate and normalise a report's parameters.
+    :return: params dict; raises ValueError with a user-facing message
+    """
+    if name not in REPORTS:
+        raise ValueError(f'Unknown report: {name}')
+    if params is None:
+        params = {}
+    if not isinstance(params, dict):
+        raise ValueError('params must be an object')
+    params = dict(params)
+    if REPORTS[name].date_range:
+        today = timezone.localdate()
+        try:
+            start = parse_date(params['start']) if params.get('start') else today - timedelta(days=30)
+            end = parse_date(params['end']) if params.get('end') else today
+        except (TypeError, ValueError):
+            start = end = None
+        if start is None or end is None:
+            raise ValueError('start and end must be YYYY-MM-DD')
+        if start > end or (end - start).days > MAX_RANGE_DAYS:
+            raise ValueError(f'start must not be after end, and the range is limited to {MAX_RANGE_DAYS} days')
+        params.update(start=start.isoformat(), end=end.isoformat())
+    return params
+
+
+def _range(params, field):
+    start = timezone.make_aware(datetime.combine(parse_date(params['start']), datetime.min.time()))
+    end = timezone.make_aware(datetime.combine(parse_date(params['end']) + timedelta(days=1), datetime.min.time()))
+    return {f'{field}__gte': start, f'{field}__lt': end}
+
+
+@report('bills_export', 'csv', date_range=True)
+def bills_export(params, out):
+    writer = csv.writer(out)
+    writer.writerow(['bill_id', 'patient_id', 'first_name', 'last_name', 'date_issued', 'total_amount', 'paid_amount', 'is_paid'])
+    rows = 0
+    bills = (
+        Bill.objects.filter(**_range(params, 'date_issued')).order_by('date_issued', 'id')
+        .values_list('id', 'patient__unique_id', 'patient__first_name', 'patient__last_name',
+                     'date_issued', 'total_amount', 'paid_amount', 'is_paid')
+    )
+    for row in bills.iterator(chunk_size=2000):
+        writer.writerow(row)
+        rows += 1
+    return rows
+
+
+@report('payments_export', 'csv', date_range=True)
+def payments_export(params, out):
+    writer = csv.writer(out)
+    writer.writerow(['payment_id', 'bill_id', 'patient_id', 'payment_date', 'amount', 'method', 'reference'])
+    rows = 0
+    payments = (
+        Payment.objects.filter(**_range(params, 'payment_date')).order_by('payment_date', 'id')
+        .values_list('id', 'bill_id', 'bill__patient__unique_id', 'payment_date', 'amount', 'method', 'reference')
+    )
+    for row in payments.iterator(chunk_size=2000):
+        writer.writerow(row)
+        rows += 1
+    return rows
+
+
+@report('financial_summary', 'json', date_range=True)
+def financial_summary(params, out):
+    from .billing import receivables_aging
+
+    billed = dict(
+        Bill.objects.filter(**_range(params, 'date_issued')).annotate(day=TruncDate('date_issued'))
+        .values('day').annotate(total=Sum('total_amount')).values_list('day', 'total')
+    )
+    collected = dict(
+        Payment.objects.filter(**_range(params, 'payment_date')).annotate(day=TruncDate('payment_date'))
+        .values('day').annotate(total=Sum('amount')).values_list('day', 'total')
+    )
+    days = sorted(set(billed) | set(collected))
+    json.dump({
+        'start': params['start'],
+        'end': params['end'],
+        'billed': sum(billed.values(), 0),
+        'collected': sum(collected.values(), 0),
+        'by_day': [{'date': d, 'billed': billed.get(d, 0), 'collected': collected.get(d, 0)} for d in days],
+        'receivables_aging': receivables_aging(),
+    }, out, cls=DjangoJSONEncoder, indent=2)
+    return len(days)
+
+
+def _analytics_report(dashboard):
+    def write(params, out):
+        # pyarrow is only imported by workers that actually run an analytics report
+        from . import analytics
+        json.dump(getattr(analytics, dashboard)(), out, cls=DjangoJSONEncoder, indent=2)
+        return None
+    return write
+
+
+for _name in ('research', 'quality', 'staff'):
+    report(f'analytics_{_name}', 'json', permission=IsDoctor)(_analytics_report(f'{_name}_dashboard'))
+
+
+@contextmanager
+def statement_timeout(seconds):
+    """Run the block in a transaction whose statements are cancelled after `seconds` (PostgreSQL)."""
+    with transaction.atomic():
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute(f'SET LOCAL statement_timeout = {int(seconds * 1000)}')
+        yield
+
+
+def _failure_message(error):
+    if getattr(error.__cause__, 'pgcode', None) == '57014':
+        timeout = getattr(settings, 'REPORT_JOB_STATEMENT_TIMEOUT_SECONDS', 300)
+        return f'The report was cancelled after exceeding the {timeout}s statement timeout. Try a shorter date range.'
+    return str(error)[:1000] or error.__class__.__name__
+
+
+def run_job(job_id):
+    """Produce a pending job's file. Jobs that already started are left alone (safe on redelivery)."""
+    claimed = ReportJob.objects.filter(pk=job_id, status='pending').update(status='running', started_at=timezone.now())
+    job = ReportJob.objects.filter(pk=job_id).first()
+    if not claimed or job is None:
+        return job
+
+    spec = REPORTS.get(job.report)
+    try:
+        if spec is None:
+            raise ValueError(f'Unknown report: {job.report}')
+        with tempfile.TemporaryFile() as raw:
+            out = io.TextIOWrapper(raw, encoding='utf-8', newline='')
+            with statement_timeout(getattr(settings, 'REPORT_JOB_STATEMENT_TIMEOUT_SECONDS', 300)):
+                job.rows = spec.build(job.params, out)
+            out.flush()
+            raw.seek(0)
+            job.file.save(f'{job.report}-{job.pk}.{spec.extension}', File(raw), save=False)
+            out.detach()
+        job.status = 'succeeded'
+    except Exception as e:
+        logger.exception(f"Report job {job.pk} ({job.report}) failed")
+        job.status, job.error = 'failed', _failure_message(e)
+    job.finished_at = timezone.now()
+    recorded = ReportJob.objects.filter(pk=job.pk, status='running').update(
+        status=job.status, file=job.file.name or '', rows=job.rows, error=job.error, finished_at=job.finished_at,
+    )
+    if not recorded:
+        # fail_stale_jobs gave up on this run meanwhile; keep its verdict
+        if job.file:
+            job.file.delete(save=False)
+        job.refresh_from_db()
+        return job
+    notify(job)
+    return job
+
+
+def hard_time_limit():
+    return getattr(settings, 'REPORT_JOB_TIME_LIMIT_SECONDS', 900) + 60
+
+
+def fail_stale_jobs():
+    """
+    Fail jobs still marked running long after any worker could be on them
+    (it was killed by OOM, the hard time limit or a deploy). Returns the count.
+    """
+    cutoff = timezone.now() - timedelta(seconds=hard_time_limit() + STALE_MARGIN_SECONDS)
+    count = 0
+    for job in ReportJob.objects.filter(status='running', started_at__lt=cutoff).iterator(chunk_size=500):
+        error = 'The report worker stopped before finishing. Please submit the report again.'
+        if ReportJob.objects.filter(pk=job.pk, status='running').update(
+                status='failed', error=error, finished_at=timezone.now()):
+            job.status, job.error = 'failed', error
+            logger.warning(f"Report job {job.pk} ({job.report}) lost its worker; marked failed")
+            notify(job)
+            count += 1
+    return count
+
+
+def notify(job):
+    """Tell the requester their report is ready (or failed), in-app and over the websocket."""
+    if job.status == 'succeeded':
+        title, message = 'Report ready', f'Your {job.report} report is ready to download.'
+    else:
+        title, message = 'Report failed', f'Your {job.report} report failed: {job.error}'
+    notification = Notification.objects.create(user_id=job.user_id, title=title, message=message, type=f'report_{job.status}')
+    try:
+        from channels.layers import get_channel_layer
+        async_to_sync(get_channel_layer().group_send)(f'user_{job.user_id}_notifications', {
+            'type': 'send_notification',
+            'content': {'id': notification.pk, 'title': title, 'message': message, 'type': notification.type, 'report_job': job.pk},
+        })
+    except Exception as e:
+        logger.warning(f"Could not push report notification for job {job.pk}: {str(e)}")
+
+
+def purge_expired(days=None):
+    """
+    Delete jobs (and their files) finished more than REPORT_JOB_RETENTION_DAYS
+    ago, or created that long ago and never finished. Returns the count.
+    """
+    days = days if days is not None else getattr(settings, 'REPORT_JOB_RETENTION_DAYS', 7)
+    cutoff = timezone.now() - timedelta(days=days)
+    expired = ReportJob.objects.filter(Q(finished_at__lt=cutoff) | Q(finished_at__isnull=True, created_at__lt=cutoff))
+    count = 0
+    for job in expired.iterator(chunk_size=500):
+        if job.file:
+            job.file.delete(save=False)
+        job.delete()
+        count += 1
+    return count
+
+
+def filename(job):
+    return os.path.basename(job.file.name)
@@ -1,21 +1,168 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+
 import requests
+from django.conf import settings
+from django.core.cache import cache
+
+from . import http_client
+from .models import RxConcept
+
+logger = logging.getLogger(__name__)
 
 RXNORM_BASE_URL = "https://rxnav.nlm.nih.gov/REST"
 
-def get_rxcui_for_drug(drug_name):
-    """Get RxCUI (RxNorm Concept Unique Identifier) for a drug name."""
-    resp = requests.get(f"{RXNORM_BASE_URL}/rxcui.json", params={"name": drug_name})
+# Preferred term types when one name maps to several concepts (ingredients first)
+TTY_RANK = {'IN': 0, 'PIN': 1, 'MIN': 2, 'SCD': 3, 'SBD': 4, 'BN': 5, 'SCDC': 6, 'SBDC': 7, 'GPCK': 8, 'BPCK': 9}
+
+# Bumped by `load_rxnorm` so every process drops its cached lookups
+VERSION_CACHE_KEY = 'rxnorm:version'
+
+
+class _LRUCache:
+    """Small thread-safe LRU for name -> RxCUI lookups; entries may carry an expiry."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.version = None
+        self.checked_at = None
+
+    def get_many(self, keys):
+        found = {}
+        now = time.monotonic()
+        with self._lock:
+            for key in keys:
+                if key in self._data:
+                    value, expires_at = self._data[key]
+                    if expires_at is not None and expires_at <= now:
+                        del self._data[key]
+                        continue
+                    self._data.move_to_end(key)
+                    found[key] = value
+        return found
+
+    def set_many(self, items, ttl=None):
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        with self._lock:
+            for key, value in items.items():
+                self._data[key] = (value, expires_at)
+                self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+_rxcui_cache = _LRUCache(getattr(settings, 'RXNORM_CACHE_SIZE', 4096))
+
+
+def _sync_cache_version():
+    """Clear this process's lookups if `load_rxnorm` has run since (checked at most every RXNORM_VERSION_CHECK_SECONDS)."""
+    now = time.monotonic()
+    check_every = getattr(settings, 'RXNORM_VERSION_CHECK_SECONDS', 300)
+    if _rxcui_cache.checked_at is not None and now - _rxcui_cache.checked_at < check_every:
+        return
+    try:
+        version = cache.get(VERSION_CACHE_KEY)
+    except Exception as e:
+        logger.warning(f"Could not read RxNorm cache version: {str(e)}")
+        return
+    if version != _rxcui_cache.version:
+        _rxcui_cache.clear()
+        _rxcui_cache.version = version
+    _rxcui_cache.checked_at = now
+
+
+def publish_new_version():
+    """Tell every process to drop its cached RxCUI lookups on its next check."""
+    _rxcui_cache.clear()
+    try:
+        cache.set(VERSION_CACHE_KEY, time.time(), timeout=None)
+    except Exception as e:
+        logger.warning(f"Could not publish RxNorm cache version: {str(e)}")
+
+
+def normalize_drug_name(name):
+    """Lower-case and collapse whitespace so lookups match the loaded concept names."""
+    return " ".join((name or "").lower().split())
+
+
+def get_rxcuis(drug_names):
+    """
+    Resolve many drug names to RxCUIs with at most one database query.
+    Names are served from the in-process LRU first, then from the local RxConcept table.
+    Known names are cached until the next `load_rxnorm`, unknown ones for
+    RXNORM_MISS_CACHE_SECONDS, and names RxNav could not be asked about not at all.
+    :return: dict of drug name -> RxCUI (None if unknown)
+    """
+    _sync_cache_version()
+    normalized = {name: normalize_drug_name(name) for name in drug_names if name}
+    cached = _rxcui_cache.get_many(set(normalized.values()))
+    missing = {n for n in normalized.values() if n and n not in cached}
+
+    if missing:
+        best = {}
+        rows = RxConcept.objects.filter(normalized_name__in=missing).values_list('normalized_name', 'rxcui', 'rank')
+        for norm, rxcui, rank in rows:
+            if norm not in best or rank < best[norm][1]:
+                best[norm] = (rxcui, rank)
+        found = {norm: best[norm][0] for norm in best}
+        misses = {norm: None for norm in missing if norm not in best}
+
+        if getattr(settings, 'RXNORM_REMOTE_FALLBACK', False):
+            for norm in list(misses):
+                success, rxcui = _remote_rxcui(norm)
+                if not success:
+                    # RxNav could not answer; ask again next time rather than remember a miss
+                    del misses[norm]
+                elif rxcui:
+                    found[norm] = rxcui
+                    del misses[norm]
+
+        _rxcui_cache.set_many(found)
+        _rxcui_cache.set_many(misses, ttl=getattr(settings, 'RXNORM_MISS_CACHE_SECONDS', 3600))
+        cached.update(found)
+        cached.update(misses)
+
+    return {name: cached.get(norm) for name, norm in normalized.items()}
+
+
+def _remote_rxcui(drug_name):
+    """
+    Ask RxNav for a name's RxCUI.
+    :return: (success, RxCUI or None); success is False when RxNav could not be reached or errored
+    """
+    try:
+        resp = http_client.get('rxnav', f"{RXNORM_BASE_URL}/rxcui.json", params={"name": drug_name})
+    except requests.RequestException as e:
+        logger.warning(f"RxNav lookup for {drug_name!r} failed: {str(e)}")
+        return False, None
     if resp.status_code == 200:
         data = resp.json()
-        return data.get("idGroup", {}).get("rxnormId", [None])[0]
-    return None
+        return True, (data.get("idGroup", {}).get("rxnormId") or [None])[0]
+    logger.warning(f"RxNav lookup for {drug_name!r} returned HTTP {resp.status_code}")
+    return False, None
+
+
+def get_rxcui_for_drug(drug_name):
+    """Get RxCUI (RxNorm Concept Unique Identifier) for a drug name."""
+    return get_rxcuis([drug_name]).get(drug_name)
 
 def check_drug_interactions(rxcui_list):
     """Check for drug-drug interactions given a list of RxCUIs."""
     if not rxcui_list:
         return []
     rxcuis = ",".join(rxcui_list)
-    resp = requests.get(f"{RXNORM_BASE_URL}/interaction/list.json", params={"rxcuis": rxcuis})
+    try:
+        resp = http_client.get('rxnav', f"{RXNORM_BASE_URL}/interaction/list.json", params={"rxcuis": rxcuis})
+    except requests.RequestException:
+        return []
     if resp.status_code == 200:
         data = resp.json()
         interactions = data.get("fullInteractionTypeGroup", [])
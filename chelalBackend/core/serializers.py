@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import Role, User, Patient, Appointment, Encounter, Prescription, Medication, Bill, BillItem, Payment, Notification, AuditLog, LoginActivity, SystemSetting, RoleChangeRequest
+from .models import Role, User, Patient, Appointment, Encounter, Prescription, Medication, Bill, BillItem, Payment, Notification, AuditLog, LoginActivity, SystemSetting, RoleChangeRequest, StockBatch, StockMovement, ReorderSuggestion, ServiceCatalog, ReportJob
 from datetime import date, timedelta
 from django.contrib.auth import get_user_model
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
@@ -103,6 +103,58 @@ class MedicationSerializer(serializers.ModelSerializer):
     class Meta:
         model = Medication
         fields = '__all__'
+        # Stock only changes through receive/dispense/adjust, which write the ledger
+        read_only_fields = ['current_stock', 'low_stock_notified_at']
+
+class StockBatchSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = StockBatch
+        fields = '__all__'
+        read_only_fields = ['quantity', 'received_at']
+
+class ReorderSuggestionSerializer(serializers.ModelSerializer):
+    medication_name = serializers.CharField(source='medication.name', read_only=True)
+
+    class Meta:
+        model = ReorderSuggestion
+        fields = '__all__'
+
+class StockMovementSerializer(serializers.ModelSerializer):
+    batch_number = serializers.CharField(source='batch.batch_number', read_only=True, default=None)
+
+    class Meta:
+        model = StockMovement
+        fields = '__all__'
+
+class ReportJobSerializer(serializers.ModelSerializer):
+    download_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ReportJob
+        fields = ['id', 'report', 'params', 'status', 'rows', 'error', 'created_at', 'started_at', 'finished_at', 'download_url']
+        read_only_fields = ['status', 'rows', 'error', 'created_at', 'started_at', 'finished_at']
+
+    def get_download_url(self, obj):
+        if obj.status != 'succeeded':
+            return None
+        request = self.context.get('request')
+        path = f'/api/report-jobs/{obj.pk}/download/'
+        return request.build_absolute_uri(path) if request else path
+
+    def validate(self, attrs):
+        from .report_jobs import REPORTS, clean_params
+        if attrs['report'] not in REPORTS:
+            raise serializers.ValidationError({'report': f"Unknown report. Choose one of: {', '.join(sorted(REPORTS))}"})
+        try:
+            attrs['params'] = clean_params(attrs['report'], attrs.get('params'))
+        except ValueError as e:
+            raise serializers.ValidationError({'params': str(e)})
+        return attrs
+
+class ServiceCatalogSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ServiceCatalog
+        fields = '__all__'
 
 class BillItemSerializer(serializers.ModelSerializer):
     class Meta:
@@ -113,10 +165,23 @@ class BillSerializer(serializers.ModelSerializer):
     items = BillItemSerializer(many=True, read_only=True)
     payments = serializers.PrimaryKeyRelatedField(many=True, read_only=True)
     patient_name = serializers.CharField(source='patient.full_name', read_only=True)
+    balance = serializers.DecimalField(max_digits=12, decimal_places=2, read_only=True)
 
     class Meta:
         model = Bill
         fields = '__all__'
+        # Maintained from bill items and payments
+        read_only_fields = ['total_amount', 'paid_amount', 'is_paid']
+
+    def validate_encounter(self, encounter):
+        # Mirrors the unique_bill_per_encounter constraint so a second bill is a 400, not an IntegrityError
+        if encounter is not None:
+            existing = Bill.objects.filter(encounter=encounter)
+            if self.instance is not None:
+                existing = existing.exclude(pk=self.instance.pk)
+            if existing.exists():
+                raise serializers.ValidationError(f'Encounter {encounter.pk} already has a bill.')
+        return encounter
 
 class PaymentSerializer(serializers.ModelSerializer):
     patient_name = serializers.CharField(source='bill.patient.full_name', read_only=True)
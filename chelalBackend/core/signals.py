@@ -1,4 +1,6 @@
-from django.db.models.signals import post_save, post_delete
+import logging
+
+from django.db.models.signals import pre_save, post_save, post_delete
 from django.contrib.auth.signals import user_logged_in, user_logged_out
 from django.dispatch import receiver
 from django.forms.models import model_to_dict
@@ -7,7 +9,10 @@ from django.conf import settings
 from datetime import date, time
 from decimal import Decimal
 
-from .models import AuditLog, Patient, Prescription, User, Appointment, Bill, Payment
+from .models import AuditLog, Patient, Prescription, User, Appointment, Bill, BillItem, Payment
+from .billing import apply_bill_delta, line_total
+
+logger = logging.getLogger(__name__)
 
 @receiver(user_logged_in)
 def log_user_login(sender, request, user, **kwargs):
@@ -75,3 +80,63 @@ def log_model_delete(sender, instance, **kwargs):
         object_id=instance.pk,
         description=f'{sender.__name__} deleted: {instance}'
     )
+
+# Bill totals: remember what a row contributed before an edit, then apply the difference
+@receiver(pre_save, sender=BillItem)
+@receiver(pre_save, sender=Payment)
+def remember_billed_amount(sender, instance, **kwargs):
+    instance._previous_amount = None
+    if instance.pk:
+        previous = sender.objects.filter(pk=instance.pk).first()
+        if previous is not None:
+            amount = line_total(previous) if sender is BillItem else previous.amount
+            instance._previous_amount = (previous.bill_id, amount)
+            if sender is Payment:
+                instance._previous_payment_date = previous.payment_date
+
+@receiver(post_save, sender=BillItem)
+@receiver(post_save, sender=Payment)
+def update_bill_amounts(sender, instance, **kwargs):
+    field = 'total_delta' if sender is BillItem else 'paid_delta'
+    amount = line_total(instance) if sender is BillItem else Decimal(instance.amount)
+    previous = getattr(instance, '_previous_amount', None)
+    if previous and previous[0] != instance.bill_id:
+        apply_bill_delta(previous[0], **{field: -previous[1]})
+        previous = None
+    apply_bill_delta(instance.bill_id, **{field: amount - (previous[1] if previous else 0)})
+
+@receiver(post_delete, sender=BillItem)
+@receiver(post_delete, sender=Payment)
+def reverse_bill_amounts(sender, instance, **kwargs):
+    if sender is BillItem:
+        apply_bill_delta(instance.bill_id, total_delta=-line_total(instance))
+    else:
+        apply_bill_delta(instance.bill_id, paid_delta=-Decimal(instance.amount))
+
+# Closed dashboard time-series buckets are cached forever; drop the ones a changed or deleted row counted towards
+@receiver(post_save, sender=Payment)
+@receiver(post_delete, sender=Payment)
+@receiver(post_delete, sender=Patient)
+def invalidate_timeseries_buckets(sender, instance, **kwargs):
+    from .timeseries import invalidate
+    try:
+        if sender is Payment:
+            invalidate('revenue', instance.payment_date)
+            previous_date = getattr(instance, '_previous_payment_date', None)
+            if previous_date and previous_date != instance.payment_date:
+                invalidate('revenue', previous_date)
+        else:
+            invalidate('registrations', instance.created_at)
+    except Exception as e:
+        # A cache outage must not block the write itself
+        logger.warning(f"Could not invalidate time-series cache for {sender.__name__} {instance.pk}: {str(e)}")
+
+# Today's birthday/anniversary list is cached until midnight; recompute it after patient changes
+@receiver(post_save, sender=Patient)
+@receiver(post_delete, sender=Patient)
+def invalidate_todays_occasions(sender, instance, **kwargs):
+    from .occasions import invalidate
+    try:
+        invalidate()
+    except Exception as e:
+        logger.warning(f"Could not invalidate occasions cache for Patient {instance.pk}: {str(e)}")
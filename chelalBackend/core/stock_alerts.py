@@ -0,0 +1,128 @@
+"""
+Low-stock and near-expiry detection.
+
+A periodic job finds every medication at or below its reorder level in one
+query (served by a partial index), caches the result for the low-stock
+endpoint and sends one summary notification per pharmacist/admin when items
+newly drop below their reorder level. Whether an item was already announced
+is recorded on Medication.low_stock_notified_at rather than inferred from the
+cache, so cache fills by the endpoint or evictions never change who is told.
+
+Near-expiry stock is rolled up nightly into ExpirySummary (30/60/90-day
+windows per medication) with a single grouped query over the
+(expiry_date, quantity) index, so the near-expiry endpoint never touches
+StockBatch.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F, Min, Q, Sum
+from django.utils import timezone
+
+from .models import Medication, Notification, User, StockBatch, ExpirySummary
+
+logger = logging.getLogger(__name__)
+
+LOW_STOCK_CACHE_KEY = 'pharmacy:low-stock'
+
+
+def find_low_stock():
+    """All medications with current_stock <= reorder_level, emptiest first."""
+    return list(
+        Medication.objects.filter(current_stock__lte=F('reorder_level'))
+        .order_by('current_stock', 'name')
+        .values('id', 'name', 'unit', 'current_stock', 'reorder_level', 'low_stock_notified_at')
+    )
+
+
+def refresh_low_stock(notify=True):
+    """
+    Recompute the low-stock list and cache it. With notify, tell the pharmacy
+    staff about items not announced since they last dropped below reorder level.
+    :return: the cached payload
+    """
+    items = find_low_stock()
+    newly_low = [item for item in items if item['low_stock_notified_at'] is None]
+    for item in items:
+        del item['low_stock_notified_at']
+    payload = {'generated_at': timezone.now(), 'count': len(items), 'items': items}
+    cache.set(LOW_STOCK_CACHE_KEY, payload, timeout=getattr(settings, 'LOW_STOCK_CACHE_SECONDS', 3600))
+
+    if notify:
+        # Restocked items are announced again the next time they run low
+        Medication.objects.filter(
+            low_stock_notified_at__isnull=False, current_stock__gt=F('reorder_level')
+        ).update(low_stock_notified_at=None)
+        if newly_low:
+            notify_pharmacy_staff(items, newly_low)
+            Medication.objects.filter(id__in=[item['id'] for item in newly_low]).update(
+                low_stock_notified_at=payload['generated_at']
+            )
+    return payload
+
+
+def notify_pharmacy_staff(items, newly_low):
+    """One summary notification per pharmacy staff member, written in a single INSERT."""
+    roles = getattr(settings, 'LOW_STOCK_NOTIFY_ROLES', ['Pharmacist', 'Admin'])
+    recipients = list(
+        User.objects.filter(is_active=True, role__name__in=roles).values_list('id', flat=True)
+    )
+    if not recipients:
+        return 0
+
+    lines = [f"{item['name']}: {item['current_stock']} {item['unit']} (reorder at {item['reorder_level']})" for item in items[:20]]
+    if len(items) > 20:
+        lines.append(f"... and {len(items) - 20} more")
+    message = f"{len(newly_low)} medication(s) newly at or below reorder level.\n" + "\n".join(lines)
+
+    Notification.objects.bulk_create([
+        Notification(user_id=user_id, title=f'Low stock: {len(items)} medication(s)', message=message, type='low_stock')
+        for user_id in recipients
+    ])
+    logger.info(f"Sent low-stock summary for {len(items)} medications to {len(recipients)} users")
+    return len(recipients)
+
+
+def rebuild_expiry_summary(today=None):
+    """
+    Recompute ExpirySummary for every window in one pass over unexpired,
+    non-empty batches expiring within the largest window.
+    :return: number of summary rows written
+    """
+    today = today or timezone.localdate()
+    windows = [days for days, _ in ExpirySummary.WINDOW_CHOICES]
+    aggregates = {}
+    for days in windows:
+        in_window = Q(expiry_date__lte=today + timedelta(days=days))
+        aggregates[f'batches_{days}'] = Count('id', filter=in_window)
+        aggregates[f'quantity_{days}'] = Sum('quantity', filter=in_window)
+        aggregates[f'earliest_{days}'] = Min('expiry_date', filter=in_window)
+
+    rows = (
+        StockBatch.objects
+        .filter(expiry_date__gte=today, expiry_date__lte=today + timedelta(days=max(windows)), quantity__gt=0)
+        .values('medication_id')
+        .annotate(**aggregates)
+    )
+    now = timezone.now()
+    summaries = [
+        ExpirySummary(
+            medication_id=row['medication_id'],
+            window_days=days,
+            batch_count=row[f'batches_{days}'],
+            quantity=row[f'quantity_{days}'],
+            earliest_expiry=row[f'earliest_{days}'],
+            computed_at=now,
+        )
+        for row in rows
+        for days in windows
+        if row[f'batches_{days}']
+    ]
+    with transaction.atomic():
+        ExpirySummary.objects.all().delete()
+        ExpirySummary.objects.bulk_create(summaries, batch_size=1000)
+    logger.info(f"Rebuilt expiry summary: {len(summaries)} rows")
+    return len(summaries)
@@ -1,7 +1,15 @@
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 from celery import shared_task
+from django.conf import settings
+from django.db import transaction
 from .models import Appointment
 from django.utils import timezone
 
+logger = logging.getLogger(__name__)
+
 @shared_task
 def send_appointment_reminder_task(appointment_id, notification_type="reminder"):
     try:
@@ -36,3 +44,131 @@ def send_appointment_followup_task(appointment_id):
         return {'success': True, 'result': 'Follow-up sent'}
     except Appointment.DoesNotExist:
         return {'success': False, 'result': 'Appointment not found'}
+
+@shared_task
+def dispatch_outbox_message_task(message_id):
+    from .outbox import dispatch
+    success, result = dispatch(message_id)
+    return {'success': success, 'result': result}
+
+def _followup_message(appointment):
+    return (
+        f"Dear {appointment.patient.first_name}, we hope your recent appointment at Chelal Hospital "
+        f"went well. Please contact us if you have any concerns."
+    )
+
+@shared_task
+def send_appointment_followups_batch_task(appointment_ids):
+    """
+    Send follow-ups for a chunk of appointments.
+    Appointments are loaded with their patients and doctors in one query; emails
+    go out over a single SMTP connection while SMS are sent concurrently through
+    the shared Twilio client. Anything that fails is handed to the outbox, which
+    retries it with backoff like any other message.
+    """
+    from . import outbox
+    from .email_utils import send_bulk_email
+    from .twilio_utils import send_sms_via_twilio
+
+    start = time.perf_counter()
+    appointments = Appointment.objects.select_related('patient', 'doctor').filter(id__in=appointment_ids)
+
+    emails, sms = [], []
+    for appointment in appointments:
+        contact = (appointment.patient.contact_info or '').strip()
+        if not contact:
+            continue
+        message = _followup_message(appointment)
+        if '@' in contact:
+            emails.append({
+                'to': contact, 'subject': 'Appointment Follow-up - Chelal Hospital', 'message': message,
+                'appointment_id': appointment.id,
+            })
+        else:
+            sms.append((appointment.id, contact, message))
+
+    workers = getattr(settings, 'FOLLOWUP_SMS_WORKERS', 8)
+    with ThreadPoolExecutor(max_workers=workers + 1) as executor:
+        email_future = executor.submit(send_bulk_email, emails) if emails else None
+        sms_results = list(executor.map(lambda args: send_sms_via_twilio(*args[1:]), sms))
+        emails_sent, emails_failed = email_future.result() if email_future else (0, [])
+
+    sms_failed = [(args, result) for args, (ok, result) in zip(sms, sms_results) if not ok]
+    if emails_failed or sms_failed:
+        with transaction.atomic():
+            for m in emails_failed:
+                logger.warning(f"Follow-up email for appointment {m['appointment_id']} failed, queued for retry: {m['error']}")
+                outbox.enqueue('email', f"appointment:{m['appointment_id']}:followup:email", {
+                    'to': m['to'], 'subject': m['subject'], 'message': m['message'],
+                })
+            for (appointment_id, contact, message), error in sms_failed:
+                logger.warning(f"Follow-up SMS for appointment {appointment_id} failed, queued for retry: {error}")
+                outbox.enqueue('sms', f'appointment:{appointment_id}:followup:sms', {'to': contact, 'message': message})
+
+    elapsed = time.perf_counter() - start
+    processed = len(emails) + len(sms)
+    result = {
+        'success': not emails_failed and all(ok for ok, _ in sms_results),
+        'processed': processed,
+        'emails_sent': emails_sent,
+        'emails_failed': len(emails_failed),
+        'sms_sent': sum(1 for ok, _ in sms_results if ok),
+        'sms_failed': len(sms_failed),
+        'elapsed_seconds': round(elapsed, 3),
+        'processed_per_second': round(processed / elapsed, 1) if elapsed else processed,
+    }
+    logger.info(f"Follow-up batch: {result}")
+    return result
+
+@shared_task
+def sync_google_calendar_task(token_id):
+    from .google_calendar_service import GoogleCalendarService
+    from .models import GoogleCalendarToken
+    token_obj = GoogleCalendarToken.objects.filter(id=token_id, is_active=True).first()
+    if not token_obj:
+        return {'success': False, 'result': 'Calendar token not found'}
+    success, changed = GoogleCalendarService().sync_calendar_events(token_obj)
+    return {'success': success, 'result': f'{changed} events changed'}
+
+@shared_task
+def refresh_google_token_task(token_id):
+    from .google_calendar_service import GoogleCalendarService
+    from .models import GoogleCalendarToken
+    token_obj = GoogleCalendarToken.objects.filter(id=token_id, is_active=True).first()
+    if not token_obj:
+        return {'success': False, 'result': 'Calendar token not found'}
+    success = GoogleCalendarService().refresh_access_token(token_obj)
+    return {'success': success, 'result': 'Token refreshed' if success else 'Token refresh failed'}
+
+@shared_task
+def render_document_task(kind, pk):
+    from django.core.exceptions import ObjectDoesNotExist
+    from .documents import render
+    try:
+        path, created = render(kind, pk)
+    except (KeyError, ObjectDoesNotExist):
+        return {'success': False, 'result': f'{kind} {pk} not found'}
+    except Exception as e:
+        # Recorded by render() so the document endpoint reports it instead of waiting
+        return {'success': False, 'result': str(e)}
+    return {'success': True, 'result': path, 'rendered': created}
+
+@shared_task
+def render_statement_batch_task(patient_ids):
+    """Render statements for a chunk of patients; chunks run in parallel across workers."""
+    from .documents import render_statement_batch
+    result = render_statement_batch(patient_ids)
+    logger.info(f"Statement batch: {result}")
+    return {'success': True, **result}
+
+@shared_task(
+    soft_time_limit=getattr(settings, 'REPORT_JOB_TIME_LIMIT_SECONDS', 900),
+    time_limit=getattr(settings, 'REPORT_JOB_TIME_LIMIT_SECONDS', 900) + 60,
+)
+def run_report_job_task(job_id):
+    """Produce a requested report off the request threads; see core.report_jobs."""
+    from .report_jobs import run_job
+    job = run_job(job_id)
+    if job is None:
+        return {'success': False, 'result': 'Report job not found'}
+    return {'success': job.status == 'succeeded', 'result': job.status}
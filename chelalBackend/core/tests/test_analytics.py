@@ -0,0 +1,90 @@
+import os
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+
+import pytest
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from core import analytics
+from core.models import Role, User, Patient, Appointment, Encounter, Prescription, Bill, BillItem, Payment
+
+
+@pytest.fixture
+def clinic(db, settings, tmp_path):
+    settings.ANALYTICS_ROOT = str(tmp_path / 'analytics')
+    settings.CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+    doctor = User.objects.create_user(username='drjobe', password='password', first_name='Awa', last_name='Jobe',
+                                      role=Role.objects.get_or_create(name='Doctor')[0])
+    today = timezone.localdate()
+    patients = [
+        Patient.objects.create(unique_id=f'P70{i}', first_name='Test', last_name=str(i),
+                               date_of_birth=date(1950 + 20 * i, 1, 1), gender=gender)
+        for i, gender in enumerate(['Female', 'Male', 'Female'])
+    ]
+    for status_, patient in zip(['completed', 'completed', 'cancelled'], patients):
+        Appointment.objects.create(patient=patient, doctor=doctor, date=today - timedelta(days=3), time=time(9), status=status_)
+
+    def encounter(patient, days_ago, diagnosis):
+        e = Encounter.objects.create(patient=patient, doctor=doctor, notes='-', diagnosis=diagnosis)
+        Encounter.objects.filter(pk=e.pk).update(created_at=timezone.now() - timedelta(days=days_ago))
+        return e
+
+    first = encounter(patients[0], 20, 'Malaria')
+    encounter(patients[0], 5, ' malaria ')       # return visit within 30 days
+    encounter(patients[1], 10, 'Hypertension')
+    encounter(patients[2], 400, 'Asthma')        # an older month partition
+    Prescription.objects.create(encounter=first, medication_name='Artemether', dosage='80mg', frequency='BD')
+
+    bill = Bill.objects.create(patient=patients[0], encounter=first)
+    BillItem.objects.create(bill=bill, description='Consultation', amount=Decimal('200.00'))
+    Payment.objects.create(bill=bill, amount=Decimal('150.00'), method='Cash')
+    return doctor
+
+
+@pytest.mark.django_db
+def test_extract_writes_month_partitions_and_refreshes_recent_months(clinic, settings):
+    manifest = analytics.run_extract()
+    assert manifest['tables']['encounters']['rows'] == 4
+    assert manifest['tables']['staff']['rows'] == 1
+    months = sorted(os.listdir(os.path.join(settings.ANALYTICS_ROOT, 'encounters')))
+    assert len(months) >= 13 and all(m.startswith('month=') for m in months)
+
+    # Later runs only rewrite the refresh window
+    again = analytics.run_extract()
+    assert again['tables']['encounters']['months'] == settings.ANALYTICS_REFRESH_MONTHS
+    assert analytics.load('encounters').num_rows == 4
+
+
+@pytest.mark.django_db
+def test_dashboards_are_computed_from_the_extract_alone(clinic, django_assert_num_queries):
+    analytics.run_extract()
+    with django_assert_num_queries(0):
+        research = analytics.research_dashboard()
+        quality = analytics.quality_dashboard()
+        staff = analytics.staff_dashboard()
+
+    assert research['cohort']['total_patients'] == 3
+    assert research['top_diagnoses'][0] == {'diagnosis': 'malaria', 'encounters': 2, 'patients': 1}
+    assert research['patients_seen_last_90_days'] == 2
+    assert quality['return_visits']['within_30_days'] == 1
+    assert quality['appointment_outcomes'][-1]['completion_rate'] == pytest.approx(66.67)
+    assert quality['billing']['collection_by_month'][-1]['collection_rate'] == 75.0
+    provider = staff['providers'][0]
+    assert (provider['last_name'], provider['encounters'], provider['patients_seen'], provider['prescriptions']) == ('Jobe', 3, 2, 1)
+
+
+@pytest.mark.django_db
+def test_analytics_endpoints(clinic):
+    client = APIClient()
+    client.force_authenticate(user=clinic)
+    assert client.get('/api/analytics/research/').status_code == 503
+
+    analytics.run_extract()
+    response = client.get('/api/analytics/staff/', {'days': 7})
+    assert response.status_code == 200
+    assert response.data['data']['providers'][0]['appointments'] == 3
+    assert client.get('/api/analytics/quality/').status_code == 200
+
+    client.force_authenticate(user=User.objects.create_user(username='desk', password='password'))
+    assert client.get('/api/analytics/research/').status_code == 403
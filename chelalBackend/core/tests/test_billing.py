@@ -0,0 +1,149 @@
+from datetime import timedelta
+from decimal import Decimal
+
+import pytest
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from core.billing import receivables_aging, snapshot_receivables_aging, generate_bills_for_day
+from core.models import Role, User, Patient, Bill, BillItem, Payment, Encounter, Prescription, ServiceCatalog
+
+
+@pytest.fixture
+def bill(db):
+    patient = Patient.objects.create(
+        unique_id='P300', first_name='Fatou', last_name='Bah',
+        date_of_birth='1985-03-02', gender='Female', contact_info='fatou@example.com'
+    )
+    return Bill.objects.create(patient=patient)
+
+
+@pytest.mark.django_db
+def test_totals_follow_items_and_payments(bill):
+    consult = BillItem.objects.create(bill=bill, description='Consultation', amount=Decimal('250.00'))
+    BillItem.objects.create(bill=bill, description='Lab test', amount=Decimal('100.00'), quantity=2)
+    bill.refresh_from_db()
+    assert (bill.total_amount, bill.paid_amount, bill.is_paid) == (Decimal('450'), 0, False)
+
+    first = Payment.objects.create(bill=bill, amount=Decimal('200.00'), method='Cash')
+    Payment.objects.create(bill=bill, amount=Decimal('250.00'), method='Card')
+    bill.refresh_from_db()
+    assert (bill.paid_amount, bill.balance, bill.is_paid) == (Decimal('450'), 0, True)
+
+    consult.quantity = 2
+    consult.save()
+    bill.refresh_from_db()
+    assert (bill.total_amount, bill.balance, bill.is_paid) == (Decimal('700'), Decimal('250'), False)
+
+    first.delete()
+    consult.delete()
+    bill.refresh_from_db()
+    assert (bill.total_amount, bill.paid_amount, bill.is_paid) == (Decimal('200'), Decimal('250'), True)
+
+
+@pytest.mark.django_db
+def test_amounts_supplied_at_creation_are_ignored(bill):
+    seeded = Bill.objects.create(patient=bill.patient, total_amount=Decimal('100.00'), paid_amount=Decimal('5.00'), is_paid=True)
+    BillItem.objects.create(bill=seeded, description='Consultation', amount=Decimal('50.00'))
+    seeded.refresh_from_db()
+    assert (seeded.total_amount, seeded.paid_amount, seeded.is_paid) == (Decimal('50'), 0, False)
+
+
+@pytest.mark.django_db
+def test_payment_never_rereads_stale_bill(bill):
+    BillItem.objects.create(bill=bill, description='Ward', amount=Decimal('100.00'))
+    stale = Bill.objects.get(pk=bill.pk)
+
+    # A second cashier's payment lands after our copy of the bill was loaded
+    Payment.objects.create(bill=bill, amount=Decimal('60.00'), method='Cash')
+    Payment.objects.create(bill=stale, amount=Decimal('40.00'), method='Cash')
+
+    stale.notes = 'Paid in two instalments'
+    stale.save()
+
+    bill.refresh_from_db()
+    assert (bill.paid_amount, bill.is_paid, bill.notes) == (Decimal('100'), True, 'Paid in two instalments')
+
+
+@pytest.mark.django_db
+def test_bill_api_exposes_derived_amounts_read_only(bill):
+    BillItem.objects.create(bill=bill, description='X-ray', amount=Decimal('80.00'))
+    role, _ = Role.objects.get_or_create(name='Receptionist')
+    client = APIClient()
+    client.force_authenticate(user=User.objects.create_user(username='cashier', password='password', role=role))
+
+    response = client.patch(f'/api/bills/{bill.pk}/', {'total_amount': '1.00', 'is_paid': True}, format='json')
+
+    assert response.status_code == 200
+    assert (response.data['total_amount'], response.data['is_paid'], response.data['balance']) == ('80.00', False, '80.00')
+
+
+@pytest.mark.django_db
+def test_second_bill_for_an_encounter_is_rejected(bill):
+    role, _ = Role.objects.get_or_create(name='Receptionist')
+    doctor = User.objects.create_user(username='doc', password='password', role=Role.objects.get_or_create(name='Doctor')[0])
+    encounter = Encounter.objects.create(patient=bill.patient, doctor=doctor, notes='')
+    client = APIClient()
+    client.force_authenticate(user=User.objects.create_user(username='cashier', password='password', role=role))
+
+    first = client.post('/api/bills/', {'patient': bill.patient.pk, 'encounter': encounter.pk}, format='json')
+    assert first.status_code == 201
+    second = client.post('/api/bills/', {'patient': bill.patient.pk, 'encounter': encounter.pk}, format='json')
+    assert second.status_code == 400 and 'encounter' in second.data
+    assert client.patch(f"/api/bills/{first.data['id']}/", {'notes': 'Checked'}, format='json').status_code == 200
+
+
+@pytest.mark.django_db
+def test_receivables_aging_buckets_in_one_query(bill, django_assert_num_queries):
+    now = timezone.now()
+    for age, amount, paid in [(5, '100', '0'), (45, '200', '50'), (75, '300', '0'), (200, '400', '100'), (10, '80', '80')]:
+        aged = Bill.objects.create(patient=bill.patient)
+        BillItem.objects.create(bill=aged, description='Service', amount=Decimal(amount))
+        if paid != '0':
+            Payment.objects.create(bill=aged, amount=Decimal(paid), method='Cash')
+        Bill.objects.filter(pk=aged.pk).update(date_issued=now - timedelta(days=age))
+
+    with django_assert_num_queries(1):
+        buckets = receivables_aging(now)
+
+    assert [(b['bucket'], b['bill_count'], b['outstanding']) for b in buckets] == [
+        ('0-30', 1, Decimal('100')), ('31-60', 1, Decimal('150')),
+        ('61-90', 1, Decimal('300')), ('90+', 1, Decimal('300')),
+    ]
+
+    snapshot_receivables_aging(as_of=timezone.localdate() - timedelta(days=1))
+    role, _ = Role.objects.get_or_create(name='Admin')
+    client = APIClient()
+    client.force_authenticate(user=User.objects.create_user(username='finance', password='password', role=role))
+    response = client.get('/api/report/receivables-aging/', {'as_of': str(timezone.localdate() - timedelta(days=1))})
+    assert response.status_code == 200
+    assert response.data['total_outstanding'] == 850.0
+    assert client.get('/api/report/receivables-aging/', {'as_of': '2001-01-01'}).status_code == 404
+
+
+@pytest.mark.django_db
+def test_end_of_day_billing_prices_encounters_and_is_idempotent(bill, django_assert_max_num_queries):
+    doctor_role, _ = Role.objects.get_or_create(name='Doctor')
+    doctor = User.objects.create_user(username='doc', password='password', role=doctor_role)
+    ServiceCatalog.objects.create(code='CONSULT', name='General consultation', category='consultation', price=Decimal('300'))
+    ServiceCatalog.objects.create(code='MED-AMOX', name='Amoxicillin', category='medication', price=Decimal('45.50'))
+    encounters = [Encounter.objects.create(patient=bill.patient, doctor=doctor, notes='') for _ in range(5)]
+    Prescription.objects.create(encounter=encounters[0], medication_name='amoxicillin ', dosage='500mg', frequency='tds')
+    Prescription.objects.create(encounter=encounters[0], medication_name='Unlisted syrup', dosage='5ml', frequency='bd')
+    Bill.objects.create(patient=bill.patient, encounter=encounters[1])  # already billed by hand
+    yesterday = Encounter.objects.create(patient=bill.patient, doctor=doctor, notes='')
+    Encounter.objects.filter(pk=yesterday.pk).update(created_at=timezone.now() - timedelta(days=1))
+
+    # A constant number of queries per chunk, however many encounters and prescriptions it holds
+    with django_assert_max_num_queries(17):
+        summary = generate_bills_for_day(timezone.localdate(), chunk_size=2)
+
+    assert (summary['bills'], summary['items']) == (4, 5)
+    assert summary['unpriced'] == [{'encounter': encounters[0].pk, 'medication': 'Unlisted syrup'}]
+    first = Bill.objects.get(encounter=encounters[0])
+    assert first.total_amount == Decimal('345.50')
+    assert sorted(first.items.values_list('description', flat=True)) == ['Amoxicillin', 'General consultation']
+    assert not Bill.objects.filter(encounter=yesterday).exists()
+
+    assert generate_bills_for_day(timezone.localdate())['bills'] == 0
+    assert Bill.objects.filter(encounter__isnull=False).count() == 5
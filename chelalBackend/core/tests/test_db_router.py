@@ -0,0 +1,96 @@
+import pytest
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.db import connections
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from core import db_router
+from core.db_router import ReplicaRouter, RoutingState, is_replica_view
+from core.models import Role, User, Patient
+
+
+class FakeUser:
+    is_authenticated = True
+
+    def __init__(self, pk):
+        self.pk = pk
+
+
+class FakeRequest:
+    def __init__(self, user):
+        self.user = user
+
+
+@pytest.fixture
+def routed(settings, monkeypatch):
+    settings.CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+    monkeypatch.setattr(db_router, 'replica_configured', lambda: True)
+    monkeypatch.setattr(db_router, 'replica_lag', lambda: 0.5)
+
+    def route(user=FakeUser(7), eligible=True):
+        state = RoutingState(FakeRequest(user))
+        state.eligible = eligible
+        token = db_router._routing.set(state)
+        try:
+            return state, ReplicaRouter().db_for_read(Patient)
+        finally:
+            db_router._routing.reset(token)
+    return route
+
+
+def test_only_reporting_and_list_views_are_eligible():
+    assert all(is_replica_view(n) for n in ['dashboard', 'report_billing_stats', 'analytics_staff', 'patient-list'])
+    assert not any(is_replica_view(n) for n in ['patient-detail', 'medication-dispense', 'profile', None])
+
+
+def test_reads_go_to_replica_unless_lagging_pinned_or_after_a_write(routed, settings, monkeypatch):
+    assert routed()[1] == 'replica'
+    assert routed(eligible=False)[1] == 'default'
+    assert routed(user=AnonymousUser())[1] == 'default'
+
+    db_router.pin_to_primary(7)
+    assert routed()[1] == 'default'
+    assert routed(user=FakeUser(8))[1] == 'replica'
+
+    settings.REPLICA_MAX_LAG_SECONDS = 0
+    assert routed(user=FakeUser(8))[1] == 'default'
+    monkeypatch.setattr(db_router, 'replica_lag', lambda: None)  # replica unreachable
+    settings.REPLICA_MAX_LAG_SECONDS = 5
+    assert routed(user=FakeUser(8))[1] == 'default'
+
+
+def test_writes_always_go_to_primary_and_pin_the_rest_of_the_request(routed):
+    state = RoutingState(FakeRequest(FakeUser(9)))
+    state.eligible = True
+    token = db_router._routing.set(state)
+    try:
+        router = ReplicaRouter()
+        assert router.db_for_read(Patient) == 'replica'
+        assert router.db_for_write(Patient) == 'default'
+        assert router.db_for_read(Patient) == 'default'
+    finally:
+        db_router._routing.reset(token)
+    assert ReplicaRouter().allow_migrate('replica', 'core') is False
+
+
+@pytest.mark.skipif('replica' not in settings.DATABASES, reason='set REPLICA_DATABASE_URL to run against two aliases')
+@pytest.mark.django_db(databases=['default', 'replica'], transaction=True)
+def test_list_endpoint_reads_replica_until_the_user_writes(settings):
+    settings.CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+    role, _ = Role.objects.get_or_create(name='Admin')
+    client = APIClient()
+    client.force_authenticate(user=User.objects.create_user(username='admin', password='password', role=role))
+
+    with CaptureQueriesContext(connections['replica']) as replica_queries:
+        assert client.get('/api/patients/').status_code == 200
+    assert any('core_patient' in q['sql'] for q in replica_queries.captured_queries)
+
+    response = client.post('/api/patients/', {
+        'unique_id': 'P800', 'first_name': 'Modou', 'last_name': 'Touray',
+        'date_of_birth': '1993-02-11', 'gender': 'Male',
+    }, format='json')
+    assert response.status_code == 201
+    with CaptureQueriesContext(connections['replica']) as replica_queries:
+        assert client.get('/api/patients/').data['count'] == 1
+    assert replica_queries.captured_queries == []
@@ -0,0 +1,168 @@
+from datetime import timedelta
+
+import pytest
+from django.db.models import QuerySet
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from core.dispensing import (
+    dispense, receive_batch, adjust_batch, expire_batches, balance_as_of, take_stock_snapshots
+)
+from core.models import Role, User, Medication, StockBatch, DispensingLog, StockMovement, StockSnapshot
+
+
+@pytest.fixture
+def amoxicillin(db):
+    medication = Medication.objects.create(name='Amoxicillin 500mg')
+    today = timezone.localdate()
+    receive_batch(medication, 'LATE', today + timedelta(days=200), 50)
+    receive_batch(medication, 'EARLY', today + timedelta(days=20), 5)
+    receive_batch(medication, 'MID', today + timedelta(days=90), 10)
+    expired = receive_batch(medication, 'EXPIRED', today + timedelta(days=30), 100)
+    StockBatch.objects.filter(pk=expired.pk).update(expiry_date=today - timedelta(days=1))
+    medication.refresh_from_db()
+    return medication
+
+
+@pytest.mark.django_db
+def test_dispense_spans_batches_in_expiry_order(amoxicillin):
+    assert amoxicillin.current_stock == 165
+
+    success, allocations = dispense(amoxicillin.pk, 12)
+
+    assert success
+    assert [(a['batch_number'], a['quantity']) for a in allocations] == [('EARLY', 5), ('MID', 7)]
+    assert dict(StockBatch.objects.values_list('batch_number', 'quantity')) == {
+        'EARLY': 0, 'MID': 3, 'LATE': 50, 'EXPIRED': 100,
+    }
+    amoxicillin.refresh_from_db()
+    assert amoxicillin.current_stock == 153
+    assert str(amoxicillin) == 'Amoxicillin 500mg (153 tablet)'
+    assert sorted(str(log) for log in DispensingLog.objects.all()) == [
+        '5 x Amoxicillin 500mg from batch EARLY', '7 x Amoxicillin 500mg from batch MID',
+    ]
+
+
+@pytest.mark.django_db
+def test_dispense_never_uses_expired_stock(amoxicillin):
+    success, error = dispense(amoxicillin.pk, 66)
+
+    assert not success
+    assert 'short by 1' in error
+    assert DispensingLog.objects.count() == 0
+    amoxicillin.refresh_from_db()
+    assert amoxicillin.current_stock == 165
+
+
+@pytest.mark.django_db
+def test_dispense_endpoint(amoxicillin):
+    pharmacist_role, _ = Role.objects.get_or_create(name='Pharmacist')
+    client = APIClient()
+    client.force_authenticate(user=User.objects.create_user(username='pharm', password='password', role=pharmacist_role))
+
+    response = client.post(f'/api/medications/{amoxicillin.pk}/dispense/', {'quantity': 6}, format='json')
+    assert response.status_code == 200
+    assert response.data['remaining'] == 159
+    assert [a['batch_number'] for a in response.data['allocations']] == ['EARLY', 'MID']
+
+    response = client.post(f'/api/medications/{amoxicillin.pk}/dispense/', {'quantity': 1000}, format='json')
+    assert response.status_code == 409
+
+    response = client.get(f'/api/medications/{amoxicillin.pk}/balance/', {'as_of': str(timezone.localdate())})
+    assert response.data['balance'] == 159
+    response = client.get(f'/api/medications/{amoxicillin.pk}/movements/')
+    assert [m['kind'] for m in response.data['results']][:2] == ['dispense', 'dispense']
+
+    nurse = APIClient()
+    nurse.force_authenticate(user=User.objects.create_user(username='nurse', password='password',
+                                                           role=Role.objects.get_or_create(name='Nurse')[0]))
+    ledger = StockMovement.objects.count()
+    nurse_client = APIClient()
+    nurse_client.force_authenticate(user=User.objects.create_user(username='nurse2', password='password',
+                                                                  role=Role.objects.get_or_create(name='Nurse')[0]))
+    patched = nurse_client.patch(f'/api/medications/{amoxicillin.pk}/', {'current_stock': 9999}, format='json')
+    assert patched.status_code == 200 and patched.data['current_stock'] == 159
+    amoxicillin.refresh_from_db()
+    assert amoxicillin.current_stock == 159 and StockMovement.objects.count() == ledger
+
+    assert client.delete(f'/api/medications/{amoxicillin.pk}/').status_code == 409
+    unused = Medication.objects.create(name='Unused')
+    assert client.delete(f'/api/medications/{unused.pk}/').status_code == 204
+
+    for name, data in [('dispense', {'quantity': 1}), ('adjust', {'batch_id': 1, 'quantity': -1}),
+                       ('receive', {'batch_number': 'X', 'expiry_date': '2099-01-01', 'received_quantity': 5})]:
+        assert nurse.post(f'/api/medications/{amoxicillin.pk}/{name}/', data, format='json').status_code == 403
+
+
+@pytest.mark.django_db
+def test_every_stock_change_is_on_the_ledger(amoxicillin):
+    dispense(amoxicillin.pk, 12)
+    mid = StockBatch.objects.get(batch_number='MID')
+    assert adjust_batch(mid.pk, -1, reason='Damaged')[0]
+    assert not adjust_batch(mid.pk, -10)[0]
+    assert expire_batches() == 1
+
+    amoxicillin.refresh_from_db()
+    ledger_total = sum(StockMovement.objects.filter(medication=amoxicillin).values_list('quantity', flat=True))
+    # The EXPIRED batch was received before it was back-dated, so it is written off here
+    assert amoxicillin.current_stock == ledger_total == 52
+    assert list(StockMovement.objects.filter(kind='expiry').values_list('quantity', flat=True)) == [-100]
+
+    movement = StockMovement.objects.first()
+    movement.quantity = 0
+    with pytest.raises(ValueError):
+        movement.save()
+    with pytest.raises(ValueError):
+        StockMovement.objects.filter(kind='expiry').update(quantity=0)
+    with pytest.raises(ValueError):
+        StockMovement.objects.filter(kind='expiry').delete()
+
+    # Removing a user only detaches their ledger rows
+    pharmacist = User.objects.create_user(username='leaver', password='password')
+    receive_batch(amoxicillin, 'NEW', timezone.localdate() + timedelta(days=300), 10, user=pharmacist)
+    pharmacist.delete()
+    assert StockMovement.objects.filter(kind='receipt', batch__batch_number='NEW', user__isnull=True).exists()
+
+
+def _backdate(movements, when):
+    # Test setup only: the ledger's own queryset refuses updates
+    QuerySet.update(movements, occurred_at=when)
+
+
+@pytest.mark.django_db
+def test_balance_as_of_uses_snapshot_plus_ledger_tail(amoxicillin, django_assert_num_queries):
+    now = timezone.now()
+    _backdate(StockMovement.objects.all(), now - timedelta(days=3))
+    assert take_stock_snapshots(as_of=now - timedelta(days=2)) == 1
+
+    dispense(amoxicillin.pk, 15)
+    _backdate(StockMovement.objects.filter(kind='dispense'), now - timedelta(days=1))
+    assert take_stock_snapshots(as_of=now) == 1
+    assert list(StockSnapshot.objects.order_by('as_of').values_list('balance', flat=True)) == [165, 150]
+
+    with django_assert_num_queries(2):
+        assert balance_as_of(amoxicillin.pk, now - timedelta(days=1, hours=1)) == 165
+    assert balance_as_of(amoxicillin.pk, now - timedelta(hours=12)) == 150
+    assert balance_as_of(amoxicillin.pk, now - timedelta(days=5)) == 0
+
+
+@pytest.mark.django_db
+def test_stock_from_before_batches_is_dispensable_after_migrating():
+    import importlib
+    from django.db import connection
+    from django.db.migrations.executor import MigrationExecutor
+    migration = importlib.import_module('core.migrations.0020_opening_stock_batches')
+    apps = MigrationExecutor(connection).loader.project_state(('core', '0020_opening_stock_batches')).apps
+
+    legacy = Medication.objects.create(name='Legacy stock', current_stock=40)
+    # As left by 0009: an opening ledger row with no batch
+    opening = StockMovement.objects.create(medication=legacy, kind='adjustment', quantity=40, reason='Opening balance')
+
+    migration.create_opening_batches(apps, None)
+
+    batch = StockBatch.objects.get(medication=legacy)
+    assert (batch.batch_number, batch.quantity, batch.expiry_date) == ('OPENING', 40, migration.OPENING_BATCH_EXPIRY)
+    assert StockMovement.objects.get(pk=opening.pk).batch_id == batch.pk
+    assert dispense(legacy.pk, 15)[0]
+    legacy.refresh_from_db()
+    assert legacy.current_stock == StockBatch.objects.get(medication=legacy).quantity == 25
@@ -0,0 +1,113 @@
+from decimal import Decimal
+
+import pytest
+from django.core.files.storage import default_storage
+from rest_framework.test import APIClient
+
+from core import documents
+from core.models import Role, User, Patient, Bill, BillItem, Payment
+from core.tasks import render_document_task, render_statement_batch_task
+
+
+@pytest.fixture(autouse=True)
+def media(settings, tmp_path):
+    settings.MEDIA_ROOT = str(tmp_path)
+    settings.CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+@pytest.fixture
+def bill(db):
+    patient = Patient.objects.create(
+        unique_id='P500', first_name='Isatou', last_name='Njie',
+        date_of_birth='1990-07-14', gender='Female', contact_info='isatou@example.com'
+    )
+    bill = Bill.objects.create(patient=patient)
+    BillItem.objects.create(bill=bill, description='Consultation', amount=Decimal('250.00'))
+    BillItem.objects.create(bill=bill, description='Malaria RDT', amount=Decimal('75.00'), quantity=2)
+    return bill
+
+
+@pytest.mark.django_db
+def test_documents_are_content_addressed_by_bill_version(bill):
+    path, created = documents.render('invoice', bill.pk)
+    assert created and path.endswith('.pdf')
+    with default_storage.open(path, 'rb') as f:
+        assert f.read(5) == b'%PDF-'
+
+    assert documents.render('invoice', bill.pk) == (path, False)
+
+    Payment.objects.create(bill=bill, amount=Decimal('100.00'), method='Cash')
+    new_path, created = documents.render('invoice', bill.pk)
+    assert created and new_path != path
+
+    # Identical content renders to identical bytes
+    context, _, _ = documents.resolve('invoice', bill.pk)
+    assert documents.render_pdf(context) == documents.render_pdf(context)
+
+
+@pytest.mark.django_db
+def test_invoice_endpoint_queues_render_then_serves_cached_pdf(bill, monkeypatch):
+    queued = []
+    monkeypatch.setattr('core.tasks.render_document_task.delay', lambda *args: queued.append(args))
+    client = APIClient()
+    role, _ = Role.objects.get_or_create(name='Receptionist')
+    client.force_authenticate(user=User.objects.create_user(username='desk', password='password', role=role))
+
+    first = client.get(f'/api/bills/{bill.pk}/invoice/')
+    second = client.get(f'/api/bills/{bill.pk}/invoice/')
+    assert (first.status_code, second.status_code) == (202, 202)
+    assert queued == [('invoice', bill.pk)]  # one render per version, however often clients poll
+
+    assert render_document_task(*queued[0])['rendered'] is True
+    response = client.get(f'/api/bills/{bill.pk}/invoice/')
+    assert response.status_code == 200
+    assert response['Content-Type'] == 'application/pdf'
+    assert b''.join(response.streaming_content).startswith(b'%PDF-')
+
+    again = client.get(f'/api/bills/{bill.pk}/invoice/', HTTP_IF_NONE_MATCH=response['ETag'])
+    assert again.status_code == 304
+
+
+@pytest.mark.django_db
+def test_statement_run_is_split_across_tasks(bill, settings, monkeypatch):
+    settings.STATEMENT_BATCH_SIZE = 2
+    others = [
+        Patient.objects.create(unique_id=f'P50{i}', first_name='Test', last_name=str(i),
+                               date_of_birth='1980-01-01', gender='Male')
+        for i in range(1, 4)
+    ]
+    for patient in others:
+        BillItem.objects.create(bill=Bill.objects.create(patient=patient), description='Dressing', amount=Decimal('40.00'))
+    chunks = []
+    monkeypatch.setattr('core.tasks.render_statement_batch_task.delay', chunks.append)
+
+    assert documents.render_statements() == (4, 2)
+    assert sorted(pk for chunk in chunks for pk in chunk) == sorted([bill.patient_id] + [p.pk for p in others])
+
+    result = render_statement_batch_task(chunks[0])
+    assert (result['rendered'], result['cached']) == (2, 0)
+    assert render_statement_batch_task(chunks[0])['cached'] == 2
+
+
+@pytest.mark.django_db
+def test_free_text_is_escaped_and_render_failures_are_reported(bill, monkeypatch):
+    bill.notes = 'x <b>unclosed <font size=40>big</font> <link href="http://evil">pay here</link>'
+    bill.save()
+    bill.patient.address = 'Kairaba Ave & <Bakau>'
+    bill.patient.save()
+    path, created = documents.render('invoice', bill.pk)
+    assert created
+
+    queued = []
+    monkeypatch.setattr('core.tasks.render_document_task.delay', lambda *args: queued.append(args))
+    monkeypatch.setattr(documents, 'render_pdf', lambda context: 1 / 0)
+    client = APIClient()
+    role, _ = Role.objects.get_or_create(name='Receptionist')
+    client.force_authenticate(user=User.objects.create_user(username='desk2', password='password', role=role))
+    BillItem.objects.create(bill=bill, description='Dressing', amount=Decimal('20.00'))
+
+    assert client.get(f'/api/bills/{bill.pk}/invoice/').status_code == 202
+    assert render_document_task(*queued[0])['success'] is False
+    failed = client.get(f'/api/bills/{bill.pk}/invoice/')
+    assert failed.status_code == 500 and failed.data['status'] == 'failed'
+    assert len(queued) == 1  # not re-queued while the failure is remembered
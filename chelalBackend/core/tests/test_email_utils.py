@@ -0,0 +1,71 @@
+from django.core import mail
+from django.core.mail.backends.locmem import EmailBackend
+
+from core.email_utils import send_bulk_email
+
+
+class RejectingBackend(EmailBackend):
+    """In-memory backend that refuses one recipient and counts opened connections."""
+    opened = 0
+
+    def open(self):
+        RejectingBackend.opened += 1
+        return True
+
+    def send_messages(self, messages):
+        # Like SMTP: messages before the refused one are already delivered
+        for message in messages:
+            if 'bad@example.com' in message.to:
+                raise ValueError('Recipient refused')
+            super().send_messages([message])
+        return len(messages)
+
+
+def _messages(*recipients):
+    return [{'to': to, 'subject': 'Reminder', 'message': 'See you tomorrow.'} for to in recipients]
+
+
+def test_send_bulk_email_sends_all_chunks(settings):
+    settings.EMAIL_BACKEND = 'django.core.mail.backends.locmem.EmailBackend'
+    mail.outbox = []
+    sent, failed = send_bulk_email(_messages(*[f'p{i}@example.com' for i in range(7)]), chunk_size=3)
+    assert sent == 7
+    assert failed == []
+    assert len(mail.outbox) == 7
+
+
+def test_send_bulk_email_reports_only_failed_recipients():
+    mail.outbox = []
+    RejectingBackend.opened = 0
+    sent, failed = send_bulk_email(
+        _messages('a@example.com', 'bad@example.com', 'c@example.com'),
+        chunk_size=10,
+        connection=RejectingBackend(),
+    )
+    assert sent == 2
+    assert [m['to'] for m in failed] == ['bad@example.com']
+    assert 'Recipient refused' in failed[0]['error']
+    # Nobody gets a second copy, and the session is reopened once after the refusal
+    assert sorted(m.to[0] for m in mail.outbox) == ['a@example.com', 'c@example.com']
+    assert RejectingBackend.opened == 2
+
+
+class FlakyBackend(RejectingBackend):
+    """Refuses one recipient, then cannot reconnect."""
+
+    def open(self):
+        if RejectingBackend.opened:
+            raise ConnectionRefusedError('SMTP server unavailable')
+        return super().open()
+
+
+def test_send_bulk_email_survives_failed_reconnect():
+    mail.outbox = []
+    RejectingBackend.opened = 0
+    sent, failed = send_bulk_email(
+        _messages('a@example.com', 'bad@example.com', 'c@example.com', 'd@example.com'),
+        connection=FlakyBackend(),
+    )
+    assert sent == 1
+    assert [m['to'] for m in failed] == ['bad@example.com', 'c@example.com', 'd@example.com']
+    assert 'SMTP server unavailable' in failed[-1]['error']
@@ -0,0 +1,65 @@
+import pytest
+from datetime import date, time
+from django.core import mail
+
+from core.models import Role, User, Patient, Appointment, OutboxMessage
+from core.tasks import send_appointment_followups_batch_task
+
+
+@pytest.fixture
+def appointments(db):
+    role, _ = Role.objects.get_or_create(name='Doctor')
+    doctor = User.objects.create_user(username='doc', password='password', role=role)
+    contacts = ['a@example.com', 'b@example.com', '+2207000001', '']
+    result = []
+    for i, contact in enumerate(contacts):
+        patient = Patient.objects.create(
+            unique_id=f'F{i}', first_name=f'P{i}', last_name='Test',
+            date_of_birth='1980-01-01', gender='Male', contact_info=contact
+        )
+        result.append(Appointment.objects.create(
+            patient=patient, doctor=doctor, date=date.today(), time=time(9, 0), status='completed'
+        ))
+    return result
+
+
+@pytest.mark.django_db
+def test_followup_batch_loads_in_one_query_and_sends_both_channels(
+        appointments, monkeypatch, settings, django_assert_num_queries):
+    settings.EMAIL_BACKEND = 'django.core.mail.backends.locmem.EmailBackend'
+    mail.outbox = []
+    sent_sms = []
+    monkeypatch.setattr('core.twilio_utils.send_sms_via_twilio', lambda to, message: (sent_sms.append(to) or True, 'SM1'))
+
+    with django_assert_num_queries(1):
+        result = send_appointment_followups_batch_task([a.id for a in appointments])
+
+    assert result['processed'] == 3
+    assert result['emails_sent'] == 2
+    assert result['sms_sent'] == 1
+    assert sent_sms == ['+2207000001']
+    assert sorted(m.to[0] for m in mail.outbox) == ['a@example.com', 'b@example.com']
+    assert result['processed_per_second'] > 0
+
+
+@pytest.mark.django_db
+def test_followup_batch_failures_are_requeued_through_the_outbox(
+        appointments, monkeypatch, django_capture_on_commit_callbacks):
+    monkeypatch.setattr('core.email_utils.send_bulk_email', lambda messages: (
+        1, [dict(m, error='Recipient refused') for m in messages if m['to'] == 'b@example.com']
+    ))
+    monkeypatch.setattr('core.twilio_utils.send_sms_via_twilio', lambda to, message: (False, 'Twilio unavailable'))
+    queued = []
+    monkeypatch.setattr('core.tasks.dispatch_outbox_message_task.delay', queued.append)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        result = send_appointment_followups_batch_task([a.id for a in appointments])
+
+    assert (result['emails_failed'], result['sms_failed']) == (1, 1)
+    requeued = OutboxMessage.objects.order_by('kind')
+    assert [(m.kind, m.dedup_key, m.payload['to']) for m in requeued] == [
+        ('email', f'appointment:{appointments[1].id}:followup:email', 'b@example.com'),
+        ('sms', f'appointment:{appointments[2].id}:followup:sms', '+2207000001'),
+    ]
+    assert 'appointment_id' not in requeued[0].payload
+    assert sorted(queued) == sorted(m.id for m in requeued)
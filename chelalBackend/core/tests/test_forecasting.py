@@ -0,0 +1,56 @@
+import time
+from datetime import timedelta
+
+import numpy as np
+import pytest
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from core.forecasting import compute_suggestions, refresh_reorder_suggestions
+from core.models import User, Medication, StockMovement, ReorderSuggestion
+
+PARAMS = dict(ma_window=28, alpha=0.3, lead_time=7, cover_days=30, service_z=1.65)
+
+
+def test_steady_demand_is_forecast_exactly():
+    demand = np.full((2, 90), 10.0)
+    result = compute_suggestions(demand, np.array([50.0, 1000.0]), **PARAMS)
+
+    assert result['forecast_daily'].tolist() == [10.0, 10.0]
+    assert result['safety_stock'].tolist() == [0, 0]
+    assert result['reorder_point'].tolist() == [70, 70]
+    # Below the reorder point: order up to 37 days of demand; well stocked: nothing
+    assert result['suggested_quantity'].tolist() == [320, 0]
+
+
+def test_ten_thousand_items_in_well_under_a_second():
+    rng = np.random.default_rng(0)
+    demand = rng.poisson(5, size=(10_000, 90)).astype(float)
+    start = time.perf_counter()
+    result = compute_suggestions(demand, rng.integers(0, 200, size=10_000).astype(float), **PARAMS)
+    assert time.perf_counter() - start < 1
+    assert result['suggested_quantity'].shape == (10_000,)
+
+
+@pytest.mark.django_db
+def test_nightly_job_uses_dispense_ledger_and_endpoint_lists_orders():
+    busy = Medication.objects.create(name='Amoxicillin', current_stock=20)
+    idle = Medication.objects.create(name='Rare antidote', current_stock=5)
+    today = timezone.localdate()
+    now = timezone.now()
+    StockMovement.objects.bulk_create([
+        StockMovement(medication=busy, kind='dispense', quantity=-4, occurred_at=now - timedelta(days=d))
+        for d in range(1, 91)
+    ] + [StockMovement(medication=busy, kind='receipt', quantity=500, occurred_at=now - timedelta(days=3))])
+
+    assert refresh_reorder_suggestions(today) == 2
+
+    busy_suggestion = ReorderSuggestion.objects.get(medication=busy)
+    assert busy_suggestion.forecast_daily == pytest.approx(4, abs=0.5)
+    assert busy_suggestion.suggested_quantity > 100
+    assert ReorderSuggestion.objects.get(medication=idle).suggested_quantity == 0
+
+    client = APIClient()
+    client.force_authenticate(user=User.objects.create_user(username='pharm', password='password'))
+    response = client.get('/api/medications/reorder_suggestions/')
+    assert [row['medication_name'] for row in response.data['results']] == ['Amoxicillin']
@@ -0,0 +1,78 @@
+import io
+
+import pytest
+from django.core.files.uploadedfile import SimpleUploadedFile
+from rest_framework.test import APIClient
+
+from core.formulary import import_formulary
+from core.models import Role, User, Medication
+
+CSV = '''name,generic_name,unit,reorder_level,description
+Paracetamol 500mg,paracetamol,tablet,100,Analgesic
+Amoxicillin 250mg,amoxicillin,capsule,50,
+Metformin 500mg,metformin,tablet,40,
+,missing name,tablet,10,
+Ibuprofen 200mg,ibuprofen,tablet,not-a-number,
+'''
+
+
+@pytest.mark.django_db
+def test_import_upserts_on_name_and_reports_diff(django_assert_max_num_queries):
+    Medication.objects.create(name='Paracetamol 500mg', generic_name='paracetamol', unit='tablet',
+                              reorder_level=100, description='Analgesic', current_stock=70)
+    Medication.objects.create(name='Amoxicillin 250mg', generic_name='amoxycillin', unit='capsule', reorder_level=20)
+
+    # One diff SELECT and one upsert per chunk (plus savepoint bookkeeping)
+    with django_assert_max_num_queries(6):
+        summary = import_formulary(io.StringIO(CSV), 'csv', chunk_size=100)
+
+    assert (summary['inserted'], summary['updated'], summary['unchanged'], summary['failed']) == (1, 1, 1, 2)
+    assert [e['line'] for e in summary['errors']] == [5, 6]
+    assert summary['rows_per_second'] > 0
+    amoxicillin = Medication.objects.get(name='Amoxicillin 250mg')
+    assert (amoxicillin.generic_name, amoxicillin.reorder_level) == ('amoxicillin', 50)
+    assert Medication.objects.get(name='Paracetamol 500mg').current_stock == 70  # stock is not imported
+
+    again = import_formulary(io.StringIO(CSV), 'csv', chunk_size=2)
+    assert (again['inserted'], again['updated'], again['unchanged']) == (0, 0, 3)
+
+
+@pytest.mark.django_db
+def test_ndjson_upload_endpoint():
+    role, _ = Role.objects.get_or_create(name='Pharmacist')
+    client = APIClient()
+    client.force_authenticate(user=User.objects.create_user(username='pharm', password='password', role=role))
+    body = b'{"name": "Zinc 20mg", "unit": "tablet"}\n{"name": "ORS", "unit": "sachet"}\n{"name": "Zinc 20mg", "unit": "dispersible"}\n'
+
+    response = client.post('/api/medications/import_formulary/', {
+        'file': SimpleUploadedFile('formulary.ndjson', body),
+    }, format='multipart')
+
+    assert response.status_code == 200
+    assert (response.data['inserted'], response.data['updated']) == (2, 1)
+    assert Medication.objects.get(name='Zinc 20mg').unit == 'dispersible'
+
+
+@pytest.mark.django_db
+def test_malformed_ndjson_rows_are_reported_not_raised():
+    body = '[1, 2]\n"Zinc"\n{"name": 5}\n{"name": "ORS", "unit": ["sachet"]}\n{"name": "Zinc 20mg"}\n'
+
+    summary = import_formulary(io.StringIO(body), 'ndjson')
+
+    assert (summary['inserted'], summary['failed']) == (1, 4)
+    assert [e['line'] for e in summary['errors']] == [1, 2, 3, 4]
+    assert summary['errors'][2]['error'] == 'name must be a string'
+
+
+@pytest.mark.django_db
+def test_non_utf8_upload_is_rejected():
+    role, _ = Role.objects.get_or_create(name='Pharmacist')
+    client = APIClient()
+    client.force_authenticate(user=User.objects.create_user(username='pharm', password='password', role=role))
+
+    response = client.post('/api/medications/import_formulary/', {
+        'file': SimpleUploadedFile('formulary.csv', 'name\nParacétamol\n'.encode('latin-1')),
+    }, format='multipart')
+
+    assert response.status_code == 400
+    assert 'UTF-8' in response.data['error']
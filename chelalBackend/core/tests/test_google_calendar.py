@@ -0,0 +1,281 @@
+import json
+import threading
+from datetime import date, datetime, time, timedelta
+from email.parser import BytesParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+from django.core.cache import cache
+from django.utils import timezone
+from google.oauth2.credentials import Credentials
+from rest_framework.test import APIClient
+
+from core import google_calendar_service
+from core.google_calendar_service import GoogleCalendarService, appointment_event_id, refresh_expiring_tokens
+from core.models import Role, User, Patient, Appointment, GoogleCalendarToken, CalendarEvent
+
+
+class MockCalendarAPI(BaseHTTPRequestHandler):
+    """Minimal local stand-in for the Calendar REST API (batch and events.list)."""
+    events = {}
+    batch_calls = 0
+    list_queries = []
+    changes = {}  # syncToken -> (changed events, next syncToken)
+    fail_full_sync = False
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        query = parse_qs(urlparse(self.path).query)
+        MockCalendarAPI.list_queries.append(query)
+        sync_token = query.get('syncToken', [None])[0]
+        if sync_token is None and self.fail_full_sync:
+            self._send_json(503, {'error': {'code': 503, 'message': 'Backend Error'}})
+            return
+        if sync_token is None:
+            payload = {'items': list(self.events.values()), 'nextSyncToken': 'sync-1'}
+        elif sync_token in self.changes:
+            items, next_token = self.changes[sync_token]
+            payload = {'items': items, 'nextSyncToken': next_token}
+        else:
+            self._send_json(410, {'error': {'code': 410, 'message': 'Sync token is no longer valid.'}})
+            return
+        self._send_json(200, payload)
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        MockCalendarAPI.batch_calls += 1
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        message = BytesParser().parsebytes(
+            f"Content-Type: {self.headers['Content-Type']}\r\n\r\n".encode() + body
+        )
+        parts = []
+        for part in message.get_payload():
+            request_line, _, rest = part.get_payload().partition('\n')
+            method, path, _ = request_line.split(' ', 2)
+            event = json.loads(rest.split('\n\n', 1)[1] or '{}') if '\n\n' in rest else {}
+            status, payload = self._handle(method, path.split('?')[0], event)
+            content_id = part['Content-ID'].strip('<>')
+            parts.append(
+                f"--mock\r\nContent-Type: application/http\r\nContent-ID: <response-{content_id}>\r\n\r\n"
+                f"HTTP/1.1 {status} OK\r\nContent-Type: application/json\r\n\r\n{json.dumps(payload)}\r\n"
+            )
+        response = (''.join(parts) + '--mock--').encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'multipart/mixed; boundary=mock')
+        self.send_header('Content-Length', str(len(response)))
+        self.end_headers()
+        self.wfile.write(response)
+
+    def _handle(self, method, path, event):
+        if method == 'POST':
+            if event['id'] in self.events:
+                return 409, {'error': {'code': 409, 'message': 'The requested identifier already exists.'}}
+            self.events[event['id']] = event
+            return 200, event
+        event_id = path.rsplit('/', 1)[1]
+        self.events[event_id] = dict(event, id=event_id)
+        return 200, self.events[event_id]
+
+
+@pytest.fixture(autouse=True)
+def clear_client_caches():
+    google_calendar_service._services.__dict__.clear()
+    google_calendar_service._credentials_cache.clear()
+
+
+@pytest.fixture
+def calendar_api(settings):
+    MockCalendarAPI.events = {}
+    MockCalendarAPI.batch_calls = 0
+    MockCalendarAPI.list_queries = []
+    MockCalendarAPI.changes = {}
+    MockCalendarAPI.fail_full_sync = False
+    server = ThreadingHTTPServer(('127.0.0.1', 0), MockCalendarAPI)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    settings.GOOGLE_CALENDAR_API_ENDPOINT = f'http://127.0.0.1:{server.server_port}/'
+    yield MockCalendarAPI
+    server.shutdown()
+
+
+@pytest.fixture
+def doctor_token(db):
+    role, _ = Role.objects.get_or_create(name='Doctor')
+    doctor = User.objects.create_user(username='doc', password='password', role=role, email='doc@example.com')
+    return GoogleCalendarToken.objects.create(user=doctor, access_token='token', calendar_id='primary')
+
+
+def _appointments(doctor, count):
+    patient = Patient.objects.create(
+        unique_id='G1', first_name='Lamin', last_name='Ceesay', date_of_birth='1975-03-02', gender='Male'
+    )
+    return [
+        Appointment.objects.create(patient=patient, doctor=doctor, date=date(2026, 1, 5), time=time(8 + i, 0))
+        for i in range(count)
+    ]
+
+
+@pytest.mark.django_db
+def test_service_is_built_once_per_token(doctor_token, calendar_api):
+    service = GoogleCalendarService()
+    assert service.get_service(doctor_token) is service.get_service(doctor_token)
+
+
+@pytest.mark.django_db
+def test_bulk_sync_batches_inserts_and_updates_existing_events(doctor_token, calendar_api):
+    appointments = _appointments(doctor_token.user, 3)
+    existing_id = appointment_event_id(appointments[0])
+    calendar_api.events[existing_id] = {'id': existing_id, 'summary': 'stale'}
+
+    synced, errors = GoogleCalendarService().bulk_sync_appointments(appointments, doctor_token)
+
+    assert errors == {}
+    assert synced == {a.id: appointment_event_id(a) for a in appointments}
+    # One batch of inserts, one batch updating the event that already existed
+    assert calendar_api.batch_calls == 2
+    assert calendar_api.events[existing_id]['summary'].startswith('Appointment with Lamin')
+
+
+def _event(event_id, summary, day):
+    return {
+        'id': event_id, 'status': 'confirmed', 'summary': summary, 'updated': '2026-01-01T00:00:00Z',
+        'start': {'dateTime': f'2026-01-{day:02d}T09:00:00Z'}, 'end': {'dateTime': f'2026-01-{day:02d}T10:00:00Z'},
+    }
+
+
+@pytest.mark.django_db
+def test_incremental_sync_applies_only_deltas(doctor_token, calendar_api):
+    calendar_api.events = {'a': _event('a', 'Ward round', 5), 'b': _event('b', 'Clinic', 6)}
+    calendar_api.changes['sync-1'] = (
+        [{'id': 'a', 'status': 'cancelled'}, _event('c', 'Theatre', 7)],
+        'sync-2',
+    )
+    service = GoogleCalendarService()
+
+    assert service.sync_calendar_events(doctor_token) == (True, 2)
+    assert doctor_token.sync_token == 'sync-1'
+    assert service.sync_calendar_events(doctor_token) == (True, 2)
+
+    assert calendar_api.list_queries[1]['syncToken'] == ['sync-1']
+    assert 'timeMin' not in calendar_api.list_queries[1]
+    assert set(CalendarEvent.objects.values_list('google_event_id', flat=True)) == {'b', 'c'}
+    doctor_token.refresh_from_db()
+    assert doctor_token.sync_token == 'sync-2'
+
+
+@pytest.mark.django_db
+def test_expired_sync_token_falls_back_to_full_sync(doctor_token, calendar_api):
+    calendar_api.events = {'b': _event('b', 'Clinic', 6)}
+    doctor_token.sync_token = 'expired'
+    CalendarEvent.objects.create(token=doctor_token, google_event_id='gone', data={})
+
+    assert GoogleCalendarService().sync_calendar_events(doctor_token) == (True, 1)
+    assert list(CalendarEvent.objects.values_list('google_event_id', flat=True)) == ['b']
+
+
+@pytest.mark.django_db
+def test_failed_full_sync_keeps_the_existing_mirror(doctor_token, calendar_api):
+    calendar_api.fail_full_sync = True
+    doctor_token.sync_token = 'expired'
+    CalendarEvent.objects.create(token=doctor_token, google_event_id='kept', data={})
+
+    assert GoogleCalendarService().sync_calendar_events(doctor_token) == (False, 0)
+    assert list(CalendarEvent.objects.values_list('google_event_id', flat=True)) == ['kept']
+
+
+@pytest.mark.django_db
+def test_events_endpoint_reads_from_local_mirror(doctor_token, settings, monkeypatch):
+    settings.CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+    queued = []
+    monkeypatch.setattr('core.tasks.sync_google_calendar_task.delay', queued.append)
+    for event in (_event('b', 'Clinic', 6), _event('c', 'Theatre', 20)):
+        CalendarEvent.objects.create(
+            token=doctor_token, google_event_id=event['id'], summary=event['summary'], data=event,
+            start=event['start']['dateTime'], end=event['end']['dateTime'],
+        )
+    reminder = _event('r', 'Reminder', 7)
+    CalendarEvent.objects.create(token=doctor_token, google_event_id='r', data=reminder,
+                                 start=reminder['start']['dateTime'], end=None)
+    client = APIClient()
+    client.force_authenticate(user=doctor_token.user)
+
+    response = client.get('/api/google-calendar/events/', {'start_date': '2026-01-01', 'end_date': '2026-01-10'})
+
+    assert response.status_code == 200
+    assert [e['id'] for e in response.data['events']] == ['b', 'r']
+    assert queued == [doctor_token.id]  # never synced, so a background pull was queued
+
+
+@pytest.mark.django_db
+def test_expired_token_is_never_refreshed_on_request_path(doctor_token, monkeypatch, settings):
+    settings.CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+    cache.clear()
+    queued = []
+    monkeypatch.setattr('core.tasks.refresh_google_token_task.delay', queued.append)
+    monkeypatch.setattr(Credentials, 'refresh', lambda self, request: pytest.fail('token endpoint called'))
+    doctor_token.refresh_token = 'refresh'
+    doctor_token.token_expiry = timezone.now() - timedelta(minutes=1)
+
+    assert GoogleCalendarService().get_credentials(doctor_token) is None
+    assert GoogleCalendarService().get_credentials(doctor_token) is None
+    assert queued == [doctor_token.pk]  # concurrent requests share one queued refresh
+
+
+@pytest.mark.django_db
+def test_valid_credentials_are_cached(doctor_token):
+    doctor_token.token_expiry = timezone.now() + timedelta(hours=1)
+    service = GoogleCalendarService()
+    assert service.get_credentials(doctor_token) is service.get_credentials(doctor_token)
+
+
+@pytest.mark.django_db
+def test_credentials_cache_is_bounded_and_pruned(doctor_token, settings):
+    settings.GOOGLE_CREDENTIALS_CACHE_SIZE = 2
+    doctor_token.token_expiry = timezone.now() + timedelta(hours=1)
+    service = GoogleCalendarService()
+    service.get_credentials(doctor_token)
+    doctor_token.access_token = 'rotated'
+    service.get_credentials(doctor_token)
+    assert [key[1] for key in google_calendar_service._credentials_cache] == ['rotated']
+
+    for pk in (1001, 1002):
+        service.get_credentials(GoogleCalendarToken(pk=pk, user=doctor_token.user, access_token='t',
+                                                    token_expiry=doctor_token.token_expiry))
+    assert [key[0] for key in google_calendar_service._credentials_cache] == [1001, 1002]
+
+
+@pytest.mark.django_db
+def test_scheduler_refreshes_only_tokens_nearing_expiry(doctor_token, monkeypatch):
+    def fake_refresh(self, request):
+        self.token = f'new-{self.refresh_token}'
+        self.expiry = datetime.utcnow() + timedelta(hours=1)
+    monkeypatch.setattr(Credentials, 'refresh', fake_refresh)
+
+    doctor_token.refresh_token = 'soon'
+    doctor_token.token_expiry = timezone.now() + timedelta(minutes=5)
+    doctor_token.save()
+    other = User.objects.create_user(username='doc2', password='password')
+    later = GoogleCalendarToken.objects.create(
+        user=other, access_token='old', refresh_token='later', token_expiry=timezone.now() + timedelta(hours=2)
+    )
+    unknown = GoogleCalendarToken.objects.create(
+        user=User.objects.create_user(username='doc3', password='password'), access_token='old', refresh_token='unknown'
+    )
+
+    assert refresh_expiring_tokens() == (2, 0)
+    unknown.refresh_from_db()
+    assert unknown.access_token == 'new-unknown' and unknown.token_expiry is not None
+    doctor_token.refresh_from_db()
+    later.refresh_from_db()
+    assert doctor_token.access_token == 'new-soon'
+    assert doctor_token.token_expiry > timezone.now() + timedelta(minutes=50)
+    assert later.access_token == 'old'
@@ -0,0 +1,63 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from core import http_client
+
+
+class FlakyAPI(BaseHTTPRequestHandler):
+    """Answers /ok with 200 and /down with 503, counting every hit."""
+    hits = 0
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        FlakyAPI.hits += 1
+        status = 200 if self.path.startswith('/ok') else 503
+        self.send_response(status)
+        self.send_header('Content-Length', '2')
+        self.end_headers()
+        self.wfile.write(b'{}')
+
+
+@pytest.fixture
+def api_url(settings):
+    settings.HTTP_CLIENT_POLICIES = {'test': {'retries': 1, 'backoff_factor': 0, 'failure_threshold': 2, 'reset_timeout': 60}}
+    http_client.reset()
+    FlakyAPI.hits = 0
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FlakyAPI)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f'http://127.0.0.1:{server.server_address[1]}'
+    server.shutdown()
+    http_client.reset()
+
+
+def test_requests_reuse_one_pooled_session_and_record_metrics(api_url):
+    assert http_client.get('test', f'{api_url}/ok').status_code == 200
+    assert http_client.get('test', f'{api_url}/ok').status_code == 200
+    assert http_client.get_session('test') is http_client.get_session('test')
+
+    host = http_client.get_metrics()['hosts'][api_url.split('//')[1]]
+    assert host['requests'] == 2
+    assert host['errors'] == 0
+    assert host['p95_ms'] is not None
+
+
+def test_breaker_opens_after_repeated_server_errors(api_url):
+    # Each call is retried once by the session before counting as one failure
+    for _ in range(2):
+        assert http_client.get('test', f'{api_url}/down').status_code == 503
+    assert FlakyAPI.hits == 4
+    assert http_client.get_metrics()['breakers']['test']['state'] == 'open'
+
+    with pytest.raises(requests.RequestException):
+        http_client.get('test', f'{api_url}/ok')
+    assert FlakyAPI.hits == 4  # the dependency was not called
+
+    # After the reset timeout one trial request closes the breaker again
+    http_client.get_breaker('test').opened_at -= 60
+    assert http_client.get('test', f'{api_url}/ok').status_code == 200
+    assert http_client.get_breaker('test').state == 'closed'
@@ -0,0 +1,75 @@
+import pytest
+from django.core.management import call_command
+from rest_framework.test import APIClient
+
+from core import interaction_index
+from core.models import Role, User, Patient, Encounter, Prescription, RxConcept
+from core.rxnorm_utils import _rxcui_cache
+
+INTERACTIONS_CSV = '''rxcui_a,rxcui_b,severity,description
+11289,1191,major,Increased risk of bleeding
+1191,11289,major,Duplicate in reverse order
+161,161,minor,Self pair is ignored
+'''
+
+
+@pytest.fixture
+def interactions_loaded(db, tmp_path, settings, django_capture_on_commit_callbacks):
+    settings.CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+    for rxcui, name in [('11289', 'warfarin'), ('1191', 'aspirin'), ('161', 'acetaminophen')]:
+        RxConcept.objects.create(rxcui=rxcui, name=name, normalized_name=name, tty='IN', rank=0)
+    path = tmp_path / 'interactions.csv'
+    path.write_text(INTERACTIONS_CSV)
+    with django_capture_on_commit_callbacks(execute=True):
+        call_command('load_drug_interactions', str(path))
+    _rxcui_cache.clear()
+    interaction_index._index = None
+
+
+@pytest.fixture
+def doctor_client(db):
+    role, _ = Role.objects.get_or_create(name='Doctor')
+    doctor = User.objects.create_user(username='doc', password='password', role=role)
+    client = APIClient()
+    client.force_authenticate(user=doctor)
+    return client, doctor
+
+
+@pytest.mark.django_db
+def test_index_is_order_independent_and_reloads_on_new_version(interactions_loaded, django_assert_num_queries):
+    index = interaction_index.get_interaction_index()
+    assert len(index) == 1
+    with django_assert_num_queries(0):
+        assert index.find(['1191', '11289', '161'])[0]['severity'] == 'major'
+        assert interaction_index.get_interaction_index() is index
+
+    interaction_index.publish_new_version()
+    index.loaded_at -= 3600
+    assert interaction_index.get_interaction_index() is not index
+
+
+@pytest.mark.django_db
+def test_endpoint_checks_new_drug_against_active_prescriptions(interactions_loaded, doctor_client):
+    client, doctor = doctor_client
+    patient = Patient.objects.create(
+        unique_id='P200', first_name='Lamin', last_name='Ceesay',
+        date_of_birth='1960-05-01', gender='Male', contact_info='lamin@example.com'
+    )
+    encounter = Encounter.objects.create(patient=patient, doctor=doctor, notes='')
+    Prescription.objects.create(encounter=encounter, medication_name='Warfarin', dosage='5mg', frequency='daily')
+
+    response = client.post('/api/prescriptions/check_drug_interaction/', {
+        'patient_id': patient.id, 'medication_name': 'Aspirin',
+    }, format='json')
+
+    assert response.status_code == 200
+    [interaction] = response.data['interactions']
+    assert interaction['severity'] == 'major'
+    assert sorted(interaction['drugs']) == ['Aspirin', 'Warfarin']
+    assert response.data['unresolved'] == []
+
+    response = client.post('/api/prescriptions/check_drug_interaction/', {
+        'medications': ['acetaminophen', 'unobtainium'],
+    }, format='json')
+    assert response.data['interactions'] == []
+    assert response.data['unresolved'] == ['unobtainium']
@@ -0,0 +1,68 @@
+from datetime import date, datetime
+
+import pytest
+from django.core.cache import cache
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from core import occasions
+from core.models import User, Patient
+
+
+@pytest.fixture(autouse=True)
+def locmem_cache(settings):
+    settings.CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+    yield
+    # The dashboard also caches closed time-series buckets, which must not leak into other tests
+    cache.clear()
+
+
+def make_patient(unique_id, born, registered=None):
+    patient = Patient.objects.create(
+        unique_id=unique_id, first_name='Test', last_name=unique_id, date_of_birth=born, gender='Female'
+    )
+    if registered:
+        created_at = timezone.make_aware(datetime.combine(registered, datetime.min.time()))
+        Patient.objects.filter(pk=patient.pk).update(created_at=created_at, registered_month_day=registered.month * 100 + registered.day)
+    return patient
+
+
+@pytest.mark.django_db
+def test_birthdays_and_anniversaries_use_month_day_columns():
+    day = date(2026, 10, 19)
+    make_patient('P601', '1990-10-19')
+    make_patient('P602', date(2000, 10, 20), registered=date(2023, 10, 19))
+    make_patient('P603', '1975-01-01')
+    moved = make_patient('P604', '1988-05-05')
+    moved.date_of_birth = date(1988, 10, 19)
+    moved.save(update_fields=['date_of_birth'])
+
+    result = occasions.compute_occasions(day)
+    assert [(b['unique_id'], b['age']) for b in result['birthdays_today']] == [('P601', 36), ('P604', 38)]
+    assert [(a['unique_id'], a['years']) for a in result['anniversaries']] == [('P602', 3)]
+
+    plan = Patient.objects.filter(birth_month_day__in=occasions.month_days(day)).explain()
+    assert 'patient_birth_md_idx' in plan
+
+
+@pytest.mark.django_db
+def test_leap_day_birthdays_are_marked_on_28_february():
+    make_patient('P611', '2004-02-29')
+    assert [b['unique_id'] for b in occasions.compute_occasions(date(2027, 2, 28))['birthdays_today']] == ['P611']
+    assert occasions.compute_occasions(date(2028, 2, 28))['birthdays_today'] == []
+
+
+@pytest.mark.django_db
+def test_dashboard_serves_cached_list_until_patients_change(django_assert_num_queries):
+    today = timezone.localdate()
+    make_patient('P621', today.replace(year=1980) if (today.month, today.day) != (2, 29) else date(1980, 2, 29))
+    client = APIClient()
+    client.force_authenticate(user=User.objects.create_user(username='admin', password='password', is_staff=True))
+
+    assert [b['unique_id'] for b in client.get('/api/dashboard/').data['birthdays_today']] == ['P621']
+    with django_assert_num_queries(0):
+        occasions.todays_occasions()
+
+    make_patient('P622', today.replace(year=1999) if (today.month, today.day) != (2, 29) else date(2000, 2, 29))
+    with django_assert_num_queries(2):
+        assert len(occasions.todays_occasions()['birthdays_today']) == 2
@@ -0,0 +1,113 @@
+import pytest
+from datetime import date, time
+from django.core import mail
+from rest_framework.test import APIClient
+
+from core import outbox
+from core.models import Role, User, Patient, OutboxMessage
+
+
+@pytest.fixture
+def receptionist(db):
+    role, _ = Role.objects.get_or_create(name='Receptionist')
+    return User.objects.create_user(username='reception', password='password', role=role)
+
+
+@pytest.fixture
+def patient(db):
+    return Patient.objects.create(
+        unique_id='P100', first_name='Awa', last_name='Jallow',
+        date_of_birth='1990-01-01', gender='Female', contact_info='awa@example.com'
+    )
+
+
+@pytest.fixture
+def queued(monkeypatch):
+    ids = []
+    monkeypatch.setattr('core.tasks.dispatch_outbox_message_task.delay', ids.append)
+    return ids
+
+
+@pytest.mark.django_db
+def test_booking_writes_outbox_row_and_dispatches_after_commit(
+        receptionist, patient, queued, django_capture_on_commit_callbacks, settings):
+    settings.EMAIL_BACKEND = 'django.core.mail.backends.locmem.EmailBackend'
+    doctor_role, _ = Role.objects.get_or_create(name='Doctor')
+    doctor = User.objects.create_user(username='doc', password='password', role=doctor_role)
+    client = APIClient()
+    client.force_authenticate(user=receptionist)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        response = client.post('/api/appointments/', {
+            'patient': patient.id, 'doctor': doctor.id,
+            'date': str(date.today()), 'time': '10:00:00',
+        }, format='json')
+
+    assert response.status_code == 201
+    message = OutboxMessage.objects.get()
+    assert message.kind == 'email'
+    assert message.payload['to'] == 'awa@example.com'
+    assert queued == [message.id]
+    assert len(mail.outbox) == 0  # nothing sent on the request path
+
+    mail.outbox = []
+    assert outbox.dispatch(message.id)[0]
+    message.refresh_from_db()
+    assert message.status == 'sent'
+    assert len(mail.outbox) == 1
+    # A second delivery attempt is a no-op
+    assert not outbox.dispatch(message.id)[0]
+    assert len(mail.outbox) == 1
+
+
+@pytest.mark.django_db
+def test_enqueue_deduplicates_by_key(queued, django_capture_on_commit_callbacks):
+    with django_capture_on_commit_callbacks(execute=True):
+        first = outbox.enqueue('sms', 'appointment:1:reminder:sms', {'to': '+2207000000', 'message': 'Hi'})
+        second = outbox.enqueue('sms', 'appointment:1:reminder:sms', {'to': '+2207000000', 'message': 'Hi'})
+    assert first.id == second.id
+    assert OutboxMessage.objects.count() == 1
+    assert queued == [first.id]
+
+
+@pytest.mark.django_db
+def test_failed_handler_backs_off_and_stays_pending(monkeypatch):
+    monkeypatch.setitem(outbox.HANDLERS, 'sms', lambda payload: (False, 'Twilio down'))
+    message = OutboxMessage.objects.create(kind='sms', dedup_key='k', payload={})
+    success, result = outbox.dispatch(message.id)
+    message.refresh_from_db()
+    assert not success
+    assert message.status == 'pending'
+    assert message.attempts == 1
+    assert message.last_error == 'Twilio down'
+    assert outbox.pending_message_ids() == []  # not due until the backoff elapses
+
+
+@pytest.mark.django_db(transaction=True)
+def test_dispatch_claims_then_sends_outside_a_transaction(monkeypatch):
+    from django.db import connection
+    message = OutboxMessage.objects.create(kind='sms', dedup_key='claim', payload={})
+    seen = []
+
+    def handler(payload):
+        seen.append((connection.in_atomic_block, OutboxMessage.objects.get(id=message.id).status))
+        # Another worker arriving while the claim is live is turned away
+        seen.append(outbox.dispatch(message.id))
+        return True, 'SM1'
+
+    monkeypatch.setitem(outbox.HANDLERS, 'sms', handler)
+    assert outbox.dispatch(message.id) == (True, 'SM1')
+    assert seen == [(False, 'sending'), (False, 'Message not pending or already claimed')]
+    message.refresh_from_db()
+    assert (message.status, message.attempts) == ('sent', 1)
+
+
+@pytest.mark.django_db
+def test_expired_claims_are_swept_up_again():
+    from datetime import timedelta
+    from django.utils import timezone
+    stuck = OutboxMessage.objects.create(kind='sms', dedup_key='stuck', payload={}, status='sending',
+                                         available_at=timezone.now() - timedelta(seconds=1))
+    OutboxMessage.objects.create(kind='sms', dedup_key='live', payload={}, status='sending',
+                                 available_at=timezone.now() + timedelta(minutes=5))
+    assert outbox.pending_message_ids() == [stuck.id]
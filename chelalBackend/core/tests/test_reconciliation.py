@@ -0,0 +1,105 @@
+import io
+import time
+from datetime import date, datetime
+from decimal import Decimal
+
+import pytest
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from core.models import User, Patient, Bill, Payment
+from core.reconciliation import reconcile_statement
+
+
+@pytest.fixture
+def bill(db):
+    patient = Patient.objects.create(
+        unique_id='P400', first_name='Lamin', last_name='Ceesay',
+        date_of_birth='1979-11-20', gender='Male', contact_info='lamin@example.com'
+    )
+    return Bill.objects.create(patient=patient)
+
+
+def pay(bill, amount, reference, day):
+    payment = Payment.objects.create(bill=bill, amount=Decimal(amount), method='Bank Transfer', reference=reference)
+    # payment_date is auto_now_add, so backdate it explicitly
+    Payment.objects.filter(pk=payment.pk).update(
+        payment_date=timezone.make_aware(datetime.fromisoformat(f'{day} 10:00'))
+    )
+    return payment
+
+
+@pytest.mark.django_db
+def test_lines_are_matched_unmatched_or_ambiguous(bill, django_assert_num_queries):
+    exact = pay(bill, '150.00', 'TRX-001', '2026-03-02')
+    late = pay(bill, '80.00', 'trx 002', '2026-03-01')
+    twin_a = pay(bill, '40.00', 'TRX-003', '2026-03-03')
+    twin_b = pay(bill, '40.00', 'TRX-003', '2026-03-04')
+    no_ref = pay(bill, '99.50', '', '2026-03-05')
+    statement = (
+        'Reference,Amount,Value Date\n'
+        'TRX-001,150.00,2026-03-02\n'
+        'TRX-002,80.00,03/03/2026\n'      # reference normalized, date within tolerance
+        'TRX-003,40.00,2026-03-04\n'      # two candidates
+        'TRX-001,150.00,2026-03-02\n'     # payment already claimed by line 2
+        'TRX-009,10.00,2026-03-02\n'
+        ',99.50,2026-03-05\n'             # falls back to amount and date
+        'TRX-010,abc,2026-03-02\n'
+    )
+
+    # Payments are loaded into the index with a single query
+    with django_assert_num_queries(1):
+        result = reconcile_statement(io.StringIO(statement.replace('Value Date', 'value_date')))
+
+    assert [(m['line'], m['payment'], m['match']) for m in result['matched']] == [
+        (2, exact.pk, 'reference'), (3, late.pk, 'reference'), (7, no_ref.pk, 'amount_date'),
+    ]
+    assert result['ambiguous'] == [{
+        'line': 4, 'reference': 'TRX003', 'amount': '40.00', 'date': date(2026, 3, 4),
+        'payments': [twin_a.pk, twin_b.pk],
+    }]
+    assert [u['line'] for u in result['unmatched']] == [5, 6]
+    assert [e['line'] for e in result['invalid']] == [8]
+
+    strict = reconcile_statement(io.StringIO('reference,amount,date\nTRX-002,80.00,2026-03-03\n'), date_tolerance_days=0)
+    assert strict['unmatched'] and not strict['matched']
+
+
+@pytest.mark.django_db
+def test_large_statement_reconciles_quickly(bill):
+    Payment.objects.bulk_create([
+        Payment(bill=bill, amount=Decimal(100 + i % 500), method='Bank Transfer', reference=f'TRX{i:06d}')
+        for i in range(5000)
+    ])
+    today = timezone.localdate().isoformat()
+    rows = ''.join(f'TRX{i:06d},{100 + i % 500}.00,{today}\n' for i in range(100000))
+
+    started = time.perf_counter()
+    result = reconcile_statement(io.StringIO('reference,amount,date\n' + rows))
+    assert time.perf_counter() - started < 10
+    assert (len(result['matched']), len(result['unmatched'])) == (5000, 95000)
+
+
+@pytest.mark.django_db
+def test_reconcile_endpoint_requires_admin(bill):
+    pay(bill, '150.00', 'TRX-001', '2026-03-02')
+    client = APIClient()
+    client.force_authenticate(user=User.objects.create_user(username='clerk', password='password'))
+    upload = lambda: SimpleUploadedFile('statement.csv', b'reference,amount,date\nTRX-001,150.00,2026-03-02\n')
+
+    assert client.post('/api/payments/reconcile/', {'file': upload()}, format='multipart').status_code == 403
+
+    client.force_authenticate(user=User.objects.create_user(username='admin', password='password', is_staff=True))
+    response = client.post('/api/payments/reconcile/', {'file': upload()}, format='multipart')
+    assert response.status_code == 200
+    assert len(response.data['matched']) == 1
+
+    bad = client.post('/api/payments/reconcile/', {
+        'file': SimpleUploadedFile('statement.csv', b'reference,total\nTRX-001,150.00\n'),
+    }, format='multipart')
+    assert bad.status_code == 400
+
+    too_wide = client.post('/api/payments/reconcile/', {'file': upload(), 'date_tolerance_days': '999999999'}, format='multipart')
+    assert too_wide.status_code == 400
+    assert 'date_tolerance_days' in too_wide.data['error']
@@ -0,0 +1,129 @@
+import csv
+import io
+import json
+from datetime import timedelta
+from decimal import Decimal
+
+import pytest
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from core import report_jobs
+from core.models import Role, User, Patient, Bill, BillItem, Payment, Notification, ReportJob
+from core.tasks import run_report_job_task
+
+
+@pytest.fixture(autouse=True)
+def media(settings, tmp_path):
+    settings.MEDIA_ROOT = str(tmp_path / 'media')
+    settings.ANALYTICS_ROOT = str(tmp_path / 'analytics')
+    settings.CHANNEL_LAYERS = {'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}}
+
+
+@pytest.fixture
+def admin_client(db):
+    client = APIClient()
+    client.force_authenticate(user=User.objects.create_user(username='finance', password='password', is_staff=True))
+    return client
+
+
+@pytest.fixture
+def billing(db):
+    patient = Patient.objects.create(
+        unique_id='P900', first_name='Binta', last_name='Sanneh',
+        date_of_birth='1982-09-09', gender='Female', contact_info='binta@example.com'
+    )
+    bill = Bill.objects.create(patient=patient)
+    BillItem.objects.create(bill=bill, description='Consultation', amount=Decimal('300.00'))
+    Payment.objects.create(bill=bill, amount=Decimal('120.00'), method='Card', reference='C-1')
+    return bill
+
+
+@pytest.mark.django_db
+def test_job_is_queued_after_commit_and_downloadable_when_done(admin_client, billing, monkeypatch, django_capture_on_commit_callbacks):
+    queued = []
+    monkeypatch.setattr('core.tasks.run_report_job_task.delay', queued.append)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        response = admin_client.post('/api/report-jobs/', {'report': 'payments_export', 'params': {}}, format='json')
+    assert response.status_code == 202
+    job_id = response.data['id']
+    assert queued == [job_id]
+    assert response.data['status'] == 'pending' and response.data['download_url'] is None
+    assert admin_client.get(f'/api/report-jobs/{job_id}/download/').status_code == 409
+
+    assert run_report_job_task(job_id) == {'success': True, 'result': 'succeeded'}
+    assert run_report_job_task(job_id)['result'] == 'succeeded'  # redelivery does not re-run it
+
+    polled = admin_client.get(f'/api/report-jobs/{job_id}/').data
+    assert (polled['status'], polled['rows']) == ('succeeded', 1)
+    download = admin_client.get(f'/api/report-jobs/{job_id}/download/')
+    assert download.status_code == 200
+    rows = list(csv.reader(io.StringIO(b''.join(download.streaming_content).decode())))
+    assert rows[0][0] == 'payment_id' and rows[1][4] == '120.00'
+
+    notification = Notification.objects.get(type='report_succeeded')
+    assert notification.user.username == 'finance'
+
+
+@pytest.mark.django_db
+def test_financial_summary_and_failures_are_recorded(billing):
+    user = User.objects.create_user(username='finance2', password='password', is_staff=True)
+    today = timezone.localdate()
+    job = ReportJob.objects.create(user=user, report='financial_summary',
+                                   params=report_jobs.clean_params('financial_summary', {'start': str(today - timedelta(days=7))}))
+    job = report_jobs.run_job(job.pk)
+    with job.file.open('rb') as f:
+        summary = json.load(f)
+    assert (Decimal(summary['billed']), Decimal(summary['collected'])) == (Decimal('300'), Decimal('120'))
+
+    broken = ReportJob.objects.create(user=user, report='analytics_staff', params={})
+    broken = report_jobs.run_job(broken.pk)  # no analytics extract yet
+    assert broken.status == 'failed' and 'analytics extract' in broken.error.lower()
+    assert Notification.objects.filter(user=user, type='report_failed').exists()
+
+
+@pytest.mark.django_db
+def test_submission_is_validated_and_scoped_to_the_requester(admin_client):
+    assert admin_client.post('/api/report-jobs/', {'report': 'nope'}, format='json').status_code == 400
+    bad_range = admin_client.post('/api/report-jobs/', {'report': 'bills_export', 'params': {'start': '2026-05-01', 'end': '2026-04-01'}}, format='json')
+    assert bad_range.status_code == 400 and 'params' in bad_range.data
+    not_an_object = admin_client.post('/api/report-jobs/', {'report': 'bills_export', 'params': [1, 2]}, format='json')
+    assert not_an_object.status_code == 400 and 'params' in not_an_object.data
+
+    clerk = APIClient()
+    clerk.force_authenticate(user=User.objects.create_user(username='clerk', password='password',
+                                                           role=Role.objects.get_or_create(name='Receptionist')[0]))
+    assert clerk.post('/api/report-jobs/', {'report': 'bills_export'}, format='json').status_code == 403
+    assert clerk.get('/api/report-jobs/').data['count'] == 0
+
+
+@pytest.mark.django_db
+def test_expired_jobs_are_purged_with_their_files(billing):
+    user = User.objects.create_user(username='finance3', password='password', is_staff=True)
+    job = ReportJob.objects.create(user=user, report='bills_export', params=report_jobs.clean_params('bills_export', {}))
+    job = report_jobs.run_job(job.pk)
+    storage, name = job.file.storage, job.file.name
+    ReportJob.objects.filter(pk=job.pk).update(finished_at=timezone.now() - timedelta(days=30))
+    assert report_jobs.purge_expired() == 1
+    assert not storage.exists(name)
+
+
+@pytest.mark.django_db
+def test_jobs_abandoned_by_their_worker_are_failed_and_purged(billing):
+    user = User.objects.create_user(username='finance4', password='password', is_staff=True)
+    params = report_jobs.clean_params('bills_export', {})
+    long_ago = timezone.now() - timedelta(seconds=report_jobs.hard_time_limit() + report_jobs.STALE_MARGIN_SECONDS + 1)
+    lost = ReportJob.objects.create(user=user, report='bills_export', params=params, status='running', started_at=long_ago)
+    busy = ReportJob.objects.create(user=user, report='bills_export', params=params, status='running', started_at=timezone.now())
+
+    assert report_jobs.fail_stale_jobs() == 1
+    lost.refresh_from_db()
+    assert lost.status == 'failed' and lost.finished_at is not None
+    assert Notification.objects.filter(user=user, type='report_failed').count() == 1
+    assert report_jobs.run_job(lost.pk).status == 'failed'  # a late redelivery does not revive it
+
+    never_ran = ReportJob.objects.create(user=user, report='bills_export', params=params)
+    ReportJob.objects.filter(pk__in=[busy.pk, never_ran.pk]).update(created_at=timezone.now() - timedelta(days=30))
+    assert report_jobs.purge_expired() == 2
+    assert list(ReportJob.objects.values_list('pk', flat=True)) == [lost.pk]
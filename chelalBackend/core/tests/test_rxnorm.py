@@ -0,0 +1,70 @@
+import pytest
+from django.core.management import call_command
+
+from core.models import RxConcept
+from core.rxnorm_utils import get_rxcuis, get_rxcui_for_drug, _rxcui_cache
+
+RRF_ROWS = [
+    '161|ENG||||||8405|8405|161||RXNORM|IN|161|Acetaminophen||N|4096|',
+    '202433|ENG||||||2270|2270|202433||RXNORM|BN|202433|Tylenol||N|4096|',
+    '1191|ENG||||||1234|1234|1191||RXNORM|IN|1191|Aspirin||N|4096|',
+    '1191|ENG||||||1235|1235|1191||MTHSPL|SU|1191|ASPIRIN||N|4096|',
+    '9999|ENG||||||9|9|9999||RXNORM|IN|9999|Withdrawn drug||O|4096|',
+]
+
+
+@pytest.fixture
+def rxnorm_loaded(db, tmp_path):
+    rrf = tmp_path / 'RXNCONSO.RRF'
+    rrf.write_text('\n'.join(RRF_ROWS) + '\n')
+    call_command('load_rxnorm', str(tmp_path), batch_size=2)
+    _rxcui_cache.clear()
+
+
+@pytest.mark.django_db
+def test_loader_keeps_only_current_english_rxnorm_names(rxnorm_loaded):
+    assert sorted(RxConcept.objects.values_list('name', flat=True)) == ['Acetaminophen', 'Aspirin', 'Tylenol']
+
+
+@pytest.mark.django_db
+def test_bulk_lookup_resolves_prescription_in_one_query(rxnorm_loaded, django_assert_num_queries):
+    with django_assert_num_queries(1):
+        result = get_rxcuis(['Acetaminophen', ' aspirin ', 'TYLENOL', 'Unobtainium'])
+    assert result == {'Acetaminophen': '161', ' aspirin ': '1191', 'TYLENOL': '202433', 'Unobtainium': None}
+
+    # Repeat lookups, including misses, are served from the in-process LRU
+    with django_assert_num_queries(0):
+        assert get_rxcui_for_drug('aspirin') == '1191'
+        assert get_rxcui_for_drug('unobtainium') is None
+
+
+@pytest.mark.django_db
+def test_remote_failures_are_not_cached_and_misses_expire(rxnorm_loaded, settings, monkeypatch):
+    from core import rxnorm_utils
+    settings.RXNORM_REMOTE_FALLBACK = True
+    answers = [(False, None), (True, '42'), (True, None)]
+    monkeypatch.setattr(rxnorm_utils, '_remote_rxcui', lambda name: answers.pop(0))
+
+    assert get_rxcui_for_drug('newdrug') is None  # RxNav down
+    assert get_rxcui_for_drug('newdrug') == '42'  # asked again, and the answer is kept
+    assert get_rxcui_for_drug('newdrug') == '42'
+
+    settings.RXNORM_MISS_CACHE_SECONDS = 0
+    assert get_rxcui_for_drug('nosuchdrug') is None
+    answers.append((True, '77'))
+    assert get_rxcui_for_drug('nosuchdrug') == '77'  # the miss had already expired
+
+
+@pytest.mark.django_db
+def test_reload_in_another_process_clears_cached_lookups(rxnorm_loaded, settings):
+    from core import rxnorm_utils
+    settings.CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+    settings.RXNORM_VERSION_CHECK_SECONDS = 0
+    assert get_rxcui_for_drug('aspirin') == '1191'
+    RxConcept.objects.filter(normalized_name='aspirin').update(rxcui='2000')
+    assert get_rxcui_for_drug('aspirin') == '1191'
+
+    # Another process ran load_rxnorm: only the shared version moves
+    from django.core.cache import cache
+    cache.set(rxnorm_utils.VERSION_CACHE_KEY, 'reloaded')
+    assert get_rxcui_for_drug('aspirin') == '2000'
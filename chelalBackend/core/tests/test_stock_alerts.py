@@ -0,0 +1,105 @@
+from datetime import timedelta
+
+import pytest
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from core.models import Role, User, Medication, Notification, StockBatch, ExpirySummary
+from core.stock_alerts import refresh_low_stock, rebuild_expiry_summary
+
+
+@pytest.fixture
+def pharmacy(db, settings):
+    settings.CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+    pharmacist, _ = Role.objects.get_or_create(name='Pharmacist')
+    doctor, _ = Role.objects.get_or_create(name='Doctor')
+    User.objects.create_user(username='pharm1', password='password', role=pharmacist)
+    User.objects.create_user(username='pharm2', password='password', role=pharmacist)
+    User.objects.create_user(username='doc', password='password', role=doctor)
+    Medication.objects.create(name='Paracetamol', current_stock=500, reorder_level=100)
+    Medication.objects.create(name='Metformin', current_stock=100, reorder_level=100)
+    Medication.objects.create(name='Insulin', current_stock=2, reorder_level=20)
+
+
+@pytest.mark.django_db
+def test_low_stock_job_notifies_each_pharmacist_once_per_change(pharmacy, django_assert_max_num_queries):
+    with django_assert_max_num_queries(5):
+        payload = refresh_low_stock()
+
+    assert [item['name'] for item in payload['items']] == ['Insulin', 'Metformin']
+    assert Notification.objects.filter(type='low_stock').count() == 2
+    assert set(Notification.objects.values_list('user__username', flat=True)) == {'pharm1', 'pharm2'}
+
+    refresh_low_stock()
+    assert Notification.objects.count() == 2  # nothing new to report
+
+    Medication.objects.filter(name='Paracetamol').update(current_stock=50)
+    refresh_low_stock()
+    assert Notification.objects.count() == 4
+
+
+@pytest.mark.django_db
+def test_endpoint_fills_and_cache_evictions_do_not_change_who_is_told(pharmacy):
+    from django.core.cache import cache
+    cache.clear()
+    client = APIClient()
+    client.force_authenticate(user=User.objects.get(username='pharm1'))
+
+    # The endpoint fills the cache first; the job must still announce the low items
+    assert client.get('/api/medications/low_stock/').data['count'] == 2
+    refresh_low_stock()
+    assert Notification.objects.count() == 2
+
+    cache.clear()
+    refresh_low_stock()
+    assert Notification.objects.count() == 2  # already announced
+
+    # Restocked, then low again: announced again
+    Medication.objects.filter(name='Insulin').update(current_stock=200)
+    refresh_low_stock()
+    Medication.objects.filter(name='Insulin').update(current_stock=1)
+    refresh_low_stock()
+    assert Notification.objects.count() == 4
+
+
+@pytest.mark.django_db
+def test_low_stock_endpoint_serves_cached_result(pharmacy):
+    client = APIClient()
+    client.force_authenticate(user=User.objects.get(username='pharm1'))
+    refresh_low_stock(notify=False)
+    Medication.objects.filter(name='Paracetamol').update(current_stock=0)
+
+    response = client.get('/api/medications/low_stock/')
+
+    assert response.status_code == 200
+    assert response.data['count'] == 2  # answered from the job's cached result
+
+
+@pytest.mark.django_db
+def test_expiry_summary_buckets_and_endpoint(pharmacy):
+    today = timezone.localdate()
+    insulin = Medication.objects.get(name='Insulin')
+    metformin = Medication.objects.get(name='Metformin')
+    for medication, days, quantity in [
+        (insulin, 10, 5), (insulin, 45, 7), (insulin, 400, 100),
+        (metformin, 80, 30), (metformin, 20, 0), (metformin, -3, 9),
+    ]:
+        StockBatch.objects.create(
+            medication=medication, batch_number=f'B{days}', expiry_date=today + timedelta(days=days),
+            received_quantity=max(quantity, 1), quantity=quantity,
+        )
+
+    assert rebuild_expiry_summary(today) == 4
+    summary = {(s.medication.name, s.window_days): (s.batch_count, s.quantity)
+               for s in ExpirySummary.objects.select_related('medication')}
+    assert summary == {
+        ('Insulin', 30): (1, 5), ('Insulin', 60): (2, 12), ('Insulin', 90): (2, 12),
+        ('Metformin', 90): (1, 30),
+    }
+
+    client = APIClient()
+    client.force_authenticate(user=User.objects.get(username='pharm1'))
+    response = client.get('/api/medications/near_expiry/', {'days': 90})
+    assert response.status_code == 200
+    assert [(i['name'], i['quantity']) for i in response.data['items']] == [('Insulin', 12), ('Metformin', 30)]
+    assert client.get('/api/medications/near_expiry/', {'days': 45}).status_code == 400
@@ -0,0 +1,77 @@
+from datetime import timedelta
+from decimal import Decimal
+
+import pytest
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from core.models import User, Patient, Bill, Payment
+from core.timeseries import get_series, months_ago
+
+
+@pytest.fixture
+def history(db, settings):
+    settings.CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+    patient = Patient.objects.create(
+        unique_id='P400', first_name='Omar', last_name='Sowe',
+        date_of_birth='1970-07-07', gender='Male', contact_info='omar@example.com'
+    )
+    bill = Bill.objects.create(patient=patient)
+    now = timezone.now()
+    payments = []
+    for days_ago, amount in [(0, '10'), (40, '20'), (41, '5'), (100, '30'), (400, '99')]:
+        payment = Payment.objects.create(bill=bill, amount=Decimal(amount), method='Cash')
+        Payment.objects.filter(pk=payment.pk).update(payment_date=now - timedelta(days=days_ago))
+        payments.append(payment)
+    return payments
+
+
+@pytest.mark.django_db
+def test_closed_buckets_are_cached_and_only_open_bucket_is_requeried(history, django_assert_num_queries):
+    start = months_ago(23)
+    with django_assert_num_queries(1):
+        first = get_series('revenue', 'month', start)
+    assert len(first) == 24
+    assert sum(p['value'] for p in first) == Decimal('164')
+    assert first[-1]['value'] == Decimal('10')
+
+    # Later requests only query the open bucket
+    with django_assert_num_queries(1) as ctx:
+        again = get_series('revenue', 'month', start)
+    assert again == first
+    assert 'payment_date" >= ' in ctx.captured_queries[0]['sql']
+
+
+@pytest.mark.django_db
+def test_deleting_a_payment_drops_its_cached_bucket(history):
+    start = months_ago(23)
+    get_series('revenue', 'month', start)
+    payment = Payment.objects.get(pk=history[3].pk)
+    payment.delete()
+    assert sum(p['value'] for p in get_series('revenue', 'month', start)) == Decimal('134')
+
+
+@pytest.mark.django_db
+def test_editing_an_old_payment_drops_its_cached_bucket(history):
+    start = months_ago(23)
+    get_series('revenue', 'month', start)
+    payment = Payment.objects.get(pk=history[3].pk)
+    payment.amount = Decimal('45')
+    payment.save()
+    assert sum(p['value'] for p in get_series('revenue', 'month', start)) == Decimal('179')
+
+
+@pytest.mark.django_db
+def test_dashboard_trends_and_timeseries_endpoint(history):
+    client = APIClient()
+    client.force_authenticate(user=User.objects.create_user(username='admin2', password='password'))
+
+    dashboard = client.get('/api/dashboard/').data
+    assert len(dashboard['revenue_trend']) == 12
+    assert dashboard['patient_registrations_trend'][-1]['value'] == 1
+    assert dashboard['revenue_breakdown'] == [{'method': 'Cash', 'total': 65.0}]
+
+    response = client.get('/api/report/timeseries/revenue/', {'granularity': 'week', 'start': str(timezone.localdate() - timedelta(days=60))})
+    assert response.status_code == 200
+    assert sum(p['value'] for p in response.data['points']) == 35.0
+    assert client.get('/api/report/timeseries/nope/').status_code == 400
@@ -0,0 +1,120 @@
+"""
+Dashboard time series (revenue, patient registrations) grouped by day, week
+or month with Trunc* functions.
+
+Buckets that have closed can no longer change, so each one is cached without
+expiry the first time it is computed; only missing buckets and the current,
+still-open bucket are queried. A two-year monthly chart therefore costs one
+cache round trip plus one small query. Deleting a payment or patient drops
+the cached buckets it fell into.
+"""
+from datetime import date, datetime, timedelta
+
+from django.core.cache import cache
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDay, TruncMonth, TruncWeek
+from django.utils import timezone
+
+from .models import Patient, Payment
+
+CACHE_VERSION = 1
+TRUNC = {'day': TruncDay, 'week': TruncWeek, 'month': TruncMonth}
+
+# name -> (model, datetime field, aggregate)
+SERIES = {
+    'revenue': (Payment, 'payment_date', lambda: Sum('amount')),
+    'registrations': (Patient, 'created_at', lambda: Count('id')),
+}
+
+
+def bucket_start(day, granularity):
+    if granularity == 'week':
+        return day - timedelta(days=day.weekday())
+    if granularity == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def next_bucket(start, granularity):
+    if granularity == 'week':
+        return start + timedelta(days=7)
+    if granularity == 'month':
+        return (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return start + timedelta(days=1)
+
+
+def _bucket_key(name, granularity, start):
+    return f'ts:v{CACHE_VERSION}:{name}:{granularity}:{start.isoformat()}'
+
+
+def _aware(day):
+    return timezone.make_aware(datetime.combine(day, datetime.min.time()))
+
+
+def _query(name, granularity, start, end):
+    """{bucket start date: value} for buckets in [start, end), in one grouped query."""
+    model, field, aggregate = SERIES[name]
+    rows = (
+        model.objects.filter(**{f'{field}__gte': _aware(start), f'{field}__lt': _aware(end)})
+        .annotate(bucket=TRUNC[granularity](field))
+        .values('bucket')
+        .annotate(value=aggregate())
+        .values_list('bucket', 'value')
+    )
+    result = {}
+    for bucket, value in rows:
+        bucket = timezone.localtime(bucket).date() if isinstance(bucket, datetime) else bucket
+        result[bucket] = value
+    return result
+
+
+def get_series(name, granularity, start, end=None):
+    """
+    Values per bucket from the bucket containing `start` through the one containing `end` (default today).
+    :return: list of {'period': date, 'value': number}, one per bucket including empty ones
+    """
+    if name not in SERIES:
+        raise ValueError(f'Unknown series: {name}')
+    if granularity not in TRUNC:
+        raise ValueError(f'Unknown granularity: {granularity}')
+
+    today = timezone.localdate()
+    end = min(end or today, today)
+    current = bucket_start(today, granularity)
+    buckets = []
+    period = bucket_start(start, granularity)
+    while period <= end:
+        buckets.append(period)
+        period = next_bucket(period, granularity)
+
+    closed = [b for b in buckets if b < current]
+    keys = {b: _bucket_key(name, granularity, b) for b in closed}
+    cached = cache.get_many(keys.values())
+    values = {b: cached[k] for b, k in keys.items() if k in cached}
+
+    missing = [b for b in closed if b not in values]
+    query_start = missing[0] if missing else current
+    query_end = next_bucket(buckets[-1], granularity) if buckets else query_start
+    if query_start < query_end:
+        # One query covers every missing closed bucket plus the open one
+        fresh = _query(name, granularity, query_start, query_end)
+        for b in missing:
+            values[b] = fresh.get(b, 0)
+        cache.set_many({keys[b]: values[b] for b in missing}, timeout=None)
+        if current in buckets:
+            values[current] = fresh.get(current, 0)
+
+    return [{'period': b, 'value': values.get(b, 0)} for b in buckets]
+
+
+def invalidate(name, when):
+    """Forget cached buckets containing `when` (used when historical rows are deleted)."""
+    day = timezone.localtime(when).date() if isinstance(when, datetime) else when
+    cache.delete_many([_bucket_key(name, g, bucket_start(day, g)) for g in TRUNC])
+
+
+def months_ago(n, today=None):
+    """First day of the month `n` months before this one."""
+    today = today or timezone.localdate()
+    year, month = divmod(today.year * 12 + today.month - 1 - n, 12)
+    return date(year, month + 1, 1)
@@ -1,7 +1,61 @@
 import os
+import threading
+import time
 from django.conf import settings
+from twilio.http.http_client import TwilioHttpClient
 from twilio.rest import Client
 
+from . import http_client
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def _twilio_config():
+    account_sid = getattr(settings, 'TWILIO_ACCOUNT_SID', os.environ.get('TWILIO_ACCOUNT_SID'))
+    auth_token = getattr(settings, 'TWILIO_AUTH_TOKEN', os.environ.get('TWILIO_AUTH_TOKEN'))
+    from_number = getattr(settings, 'TWILIO_PHONE_NUMBER', os.environ.get('TWILIO_PHONE_NUMBER'))
+    return account_sid, auth_token, from_number
+
+
+class SharedTwilioHttpClient(TwilioHttpClient):
+    """
+    Twilio transport that sends through the shared 'twilio' session, so SMS
+    calls get the same pooling, timeouts, circuit breaker and metrics as the
+    other outbound dependencies.
+    """
+
+    def __init__(self):
+        super().__init__(pool_connections=False)
+        self.session = http_client.get_session('twilio')
+        self.timeout = http_client.get_policy('twilio')['timeout']
+
+    def request(self, method, url, *args, **kwargs):
+        if not http_client.get_breaker('twilio').allow():
+            raise http_client.CircuitOpenError("twilio is unavailable (circuit open)")
+        start = time.perf_counter()
+        try:
+            response = super().request(method, url, *args, **kwargs)
+        except Exception:
+            http_client.record('twilio', url, (time.perf_counter() - start) * 1000, error=True)
+            raise
+        http_client.record('twilio', url, (time.perf_counter() - start) * 1000, error=response.status_code >= 500)
+        return response
+
+
+def get_twilio_client():
+    """
+    Return a process-wide Twilio client so its HTTP session (and connections)
+    are reused across messages and threads.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                account_sid, auth_token, _ = _twilio_config()
+                _client = Client(account_sid, auth_token, http_client=SharedTwilioHttpClient())
+    return _client
+
 
 def send_sms_via_twilio(to_number, message):
     """
@@ -10,14 +64,11 @@ def send_sms_via_twilio(to_number, message):
     :param message: Message string
     :return: (success, sid or error message)
     """
-    account_sid = getattr(settings, 'TWILIO_ACCOUNT_SID', os.environ.get('TWILIO_ACCOUNT_SID'))
-    auth_token = getattr(settings, 'TWILIO_AUTH_TOKEN', os.environ.get('TWILIO_AUTH_TOKEN'))
-    from_number = getattr(settings, 'TWILIO_PHONE_NUMBER', os.environ.get('TWILIO_PHONE_NUMBER'))
+    account_sid, auth_token, from_number = _twilio_config()
     if not (account_sid and auth_token and from_number):
         return False, 'Twilio configuration missing.'
     try:
-        client = Client(account_sid, auth_token)
-        message_obj = client.messages.create(
+        message_obj = get_twilio_client().messages.create(
             body=message,
             from_=from_number,
             to=to_number
@@ -2,11 +2,15 @@ from django.urls import path, include
 from rest_framework import routers
 from .views import (
     RoleViewSet, UserViewSet, PatientViewSet, AppointmentViewSet,
-    EncounterViewSet, PrescriptionViewSet, MedicationViewSet, BillViewSet, BillItemViewSet, PaymentViewSet,
-    NotificationViewSet, AuditLogViewSet, LoginActivityViewSet, SystemSettingViewSet, RoleChangeRequestViewSet,
+    EncounterViewSet, PrescriptionViewSet, MedicationViewSet, BillViewSet, ServiceCatalogViewSet, BillItemViewSet, PaymentViewSet,
+    NotificationViewSet, ReportJobViewSet, AuditLogViewSet, LoginActivityViewSet, SystemSettingViewSet, RoleChangeRequestViewSet,
     MyTokenObtainPairView, MyTokenRefreshView, RegisterView, dashboard, dashboard_stats,
     report_patient_count, report_appointments_today, report_appointments_by_doctor, report_top_prescribed_medications,
-    report_billing_stats, profile_view, user_preferences_view, health_check, sync_offline_data, populate_database
+    report_billing_stats, report_receivables_aging, report_timeseries, analytics_research, analytics_quality, analytics_staff, profile_view, user_preferences_view, health_check, http_client_metrics, replica_status, sync_offline_data, populate_database
+)
+from .google_calendar_views import (
+    google_calendar_auth, google_calendar_callback, sync_appointment_to_calendar, bulk_sync_appointments_to_calendar,
+    update_calendar_event, delete_calendar_event, get_calendar_events, check_calendar_connection
 )
 
 router = routers.DefaultRouter()
@@ -19,8 +23,10 @@ router.register(r'prescriptions', PrescriptionViewSet)
 router.register(r'medications', MedicationViewSet)
 router.register(r'bills', BillViewSet)
 router.register(r'bill-items', BillItemViewSet)
+router.register(r'service-catalog', ServiceCatalogViewSet)
 router.register(r'payments', PaymentViewSet)
 router.register(r'notifications', NotificationViewSet, basename='notification')
+router.register(r'report-jobs', ReportJobViewSet, basename='reportjob')
 router.register(r'audit-logs', AuditLogViewSet, basename='auditlog')
 router.register(r'login-activity', LoginActivityViewSet, basename='loginactivity')
 router.register(r'role-change-requests', RoleChangeRequestViewSet)
@@ -41,12 +47,29 @@ urlpatterns = [
     path('report/top_prescribed_medications/', report_top_prescribed_medications, name='report_top_prescribed_medications'),
 
     path('report/billing-stats/', report_billing_stats, name='report_billing_stats'),
+    path('report/receivables-aging/', report_receivables_aging, name='report_receivables_aging'),
+    path('report/timeseries/<str:name>/', report_timeseries, name='report_timeseries'),
+    path('analytics/research/', analytics_research, name='analytics_research'),
+    path('analytics/quality/', analytics_quality, name='analytics_quality'),
+    path('analytics/staff/', analytics_staff, name='analytics_staff'),
     # Profile and preferences
     path('profile/', profile_view, name='profile'),
     path('preferences/', user_preferences_view, name='user-preferences'),
 
+    # Google Calendar integration
+    path('google-calendar/auth/', google_calendar_auth, name='google_calendar_auth'),
+    path('google-calendar/callback/', google_calendar_callback, name='google_calendar_callback'),
+    path('google-calendar/sync/', sync_appointment_to_calendar, name='google_calendar_sync'),
+    path('google-calendar/bulk-sync/', bulk_sync_appointments_to_calendar, name='google_calendar_bulk_sync'),
+    path('google-calendar/update/', update_calendar_event, name='google_calendar_update'),
+    path('google-calendar/delete/', delete_calendar_event, name='google_calendar_delete'),
+    path('google-calendar/events/', get_calendar_events, name='google_calendar_events'),
+    path('google-calendar/connection/', check_calendar_connection, name='google_calendar_connection'),
+
     # Health check and sync
     path('health/', health_check, name='health-check'),
+    path('health/http-clients/', http_client_metrics, name='http-client-metrics'),
+    path('health/replica/', replica_status, name='replica-status'),
     path('sync_offline_data/', sync_offline_data, name='sync_offline_data'),
     path('populate-database/', populate_database, name='populate_database'),
 ]
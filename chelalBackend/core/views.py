@@ -6,26 +6,35 @@ from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework import viewsets, permissions, serializers
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
-from .models import Role, User, Patient, Appointment, Encounter, Prescription, Medication, Bill, BillItem, Payment, Notification, AuditLog, LoginActivity, SystemSetting, RoleChangeRequest
+from .models import Role, User, Patient, Appointment, Encounter, Prescription, Medication, Bill, BillItem, Payment, Notification, AuditLog, LoginActivity, SystemSetting, RoleChangeRequest, GoogleCalendarToken, ExpirySummary, ReorderSuggestion, ServiceCatalog, ReportJob
 from .serializers import (
     RoleSerializer, UserSerializer, PatientSerializer, AppointmentSerializer,
     EncounterSerializer, PrescriptionSerializer, MedicationSerializer,
     BillSerializer, BillItemSerializer, PaymentSerializer, NotificationSerializer,
     AuditLogSerializer, LoginActivitySerializer, SystemSettingSerializer, RoleChangeRequestSerializer, UserPreferencesSerializer,
-    EmailTokenObtainPairSerializer
+    EmailTokenObtainPairSerializer, StockBatchSerializer, StockMovementSerializer, ReorderSuggestionSerializer, ServiceCatalogSerializer, ReportJobSerializer
 )
 from rest_framework.decorators import api_view, permission_classes, action
 from rest_framework.response import Response
 from rest_framework import status
-from .permissions import IsAdminOrReadOnly, IsDoctorOrReadOnly, IsReceptionistOrReadOnly
+from .permissions import IsAdminOrReadOnly, IsDoctorOrReadOnly, IsReceptionistOrReadOnly, IsPharmacist, IsDoctor
 from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from django.utils import timezone
-from django.http import HttpResponse
+from django.http import FileResponse, HttpResponse
 import csv
-from datetime import date, timedelta
-from django.db import models
+import time
+from datetime import date, datetime, timedelta
+from django.utils.dateparse import parse_date, parse_datetime
+from django.conf import settings
+from django.core.cache import cache
+from django.db import models, transaction
+from django.db.models import ProtectedError
 from django.contrib.auth import get_user_model
-from .email_utils import send_appointment_email
+from .email_utils import build_appointment_email
+from . import outbox, http_client, dispensing, stock_alerts, formulary, reconciliation, documents, occasions
+from .interaction_index import get_interaction_index
+from .rxnorm_utils import get_rxcuis
+from .timeseries import SERIES, TRUNC, get_series, months_ago
 from .email_token_serializer import EmailTokenObtainPairSerializer
 from rest_framework.views import APIView
 from .serializers import RegistrationSerializer
@@ -55,6 +64,30 @@ class RegisterView(APIView):
             }, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+def _document_response(request, kind, pk):
+    """Serve the stored PDF for the document's current version, or queue its render and answer 202 (500 if it failed)."""
+    from django.core.files.storage import default_storage
+
+    _, key, path = documents.resolve(kind, pk)
+    etag = f'"{key}"'
+    if default_storage.exists(path):
+        if request.headers.get('If-None-Match') == etag:
+            response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = FileResponse(default_storage.open(path, 'rb'), content_type='application/pdf',
+                                    filename=f'{kind}-{pk}.pdf')
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+    error = documents.render_failure(key)
+    if error:
+        return Response({'status': 'failed', 'version': key, 'error': error},
+                        status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    documents.request_render(kind, pk, key)
+    response = Response({'status': 'rendering', 'version': key}, status=status.HTTP_202_ACCEPTED)
+    response['Retry-After'] = '2'
+    return response
+
 # Core Model ViewSets
 class RoleViewSet(viewsets.ModelViewSet):
     queryset = Role.objects.all()
@@ -76,6 +109,11 @@ class PatientViewSet(viewsets.ModelViewSet):
     serializer_class = PatientSerializer
     permission_classes = [IsAdminOrReadOnly]
 
+    @action(detail=True, methods=['get'])
+    def statement(self, request, pk=None):
+        """PDF statement of the patient's unpaid bills (202 while it is being rendered)."""
+        return _document_response(request, 'statement', self.get_object().pk)
+
     # Temporarily remove filtering to debug
     # def get_queryset(self):
     #     user = self.request.user
@@ -111,9 +149,15 @@ class AppointmentViewSet(viewsets.ModelViewSet):
         return Appointment.objects.none()
 
     def perform_create(self, serializer):
-        appointment = serializer.save()
-        # Send notification to patient (placeholder for email/SMS)
-        send_appointment_email(appointment)
+        with transaction.atomic():
+            appointment = serializer.save()
+            # Confirmation is queued in the outbox and sent by Celery after commit
+            outbox.enqueue('email', f'appointment:{appointment.id}:confirmation:email', build_appointment_email(appointment))
+            if GoogleCalendarToken.objects.filter(user=appointment.doctor, is_active=True).exists():
+                outbox.enqueue('calendar', f'appointment:{appointment.id}:calendar', {
+                    'appointment_id': appointment.id,
+                    'user_id': appointment.doctor_id,
+                })
 
 class EncounterViewSet(viewsets.ModelViewSet):
     queryset = Encounter.objects.all()
@@ -125,11 +169,211 @@ class PrescriptionViewSet(viewsets.ModelViewSet):
     serializer_class = PrescriptionSerializer
     permission_classes = [IsDoctorOrReadOnly]
 
+    @action(detail=False, methods=['post'])
+    def check_drug_interaction(self, request):
+        """
+        Check a new drug against a patient's active prescriptions (and/or an explicit
+        list of medications) using the in-process interaction index.
+        Body: {"patient_id": 1, "medication_name": "warfarin", "medications": [...]}
+        """
+        medications = list(request.data.get('medications') or [])
+        if request.data.get('medication_name'):
+            medications.append(request.data['medication_name'])
+
+        patient_id = request.data.get('patient_id')
+        if patient_id:
+            since = timezone.now() - timedelta(days=settings.ACTIVE_PRESCRIPTION_DAYS)
+            medications += Prescription.objects.filter(
+                encounter__patient_id=patient_id, created_at__gte=since
+            ).values_list('medication_name', flat=True)
+
+        if not medications:
+            return Response({'error': 'Provide medications, medication_name or patient_id'}, status=status.HTTP_400_BAD_REQUEST)
+
+        start = time.perf_counter()
+        rxcuis = get_rxcuis(medications)
+        names_by_rxcui = {}
+        for name, rxcui in rxcuis.items():
+            if rxcui:
+                names_by_rxcui.setdefault(rxcui, []).append(name)
+
+        interactions = get_interaction_index().find(names_by_rxcui)
+        for interaction in interactions:
+            interaction['drugs'] = names_by_rxcui[interaction['rxcui_a']] + names_by_rxcui[interaction['rxcui_b']]
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        return Response({
+            'medications': sorted(set(medications)),
+            'interactions': interactions,
+            'unresolved': sorted(name for name, rxcui in rxcuis.items() if not rxcui),
+            'check_ms': round(elapsed_ms, 3),
+        })
+
 class MedicationViewSet(viewsets.ModelViewSet):
     queryset = Medication.objects.all()
     serializer_class = MedicationSerializer
     permission_classes = [IsAuthenticated]
 
+    def destroy(self, request, *args, **kwargs):
+        try:
+            return super().destroy(request, *args, **kwargs)
+        except ProtectedError:
+            return Response(
+                {'error': 'This medication has stock history and cannot be deleted.'},
+                status=status.HTTP_409_CONFLICT,
+            )
+
+    @action(detail=False, methods=['post'], permission_classes=[IsPharmacist])
+    def import_formulary(self, request):
+        """Upsert an uploaded CSV/NDJSON formulary ('file'; optional 'format') keyed on medication name."""
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({'error': 'Upload the formulary as "file"'}, status=status.HTTP_400_BAD_REQUEST)
+        fmt = request.data.get('format') or ('ndjson' if upload.name.endswith(('.ndjson', '.jsonl')) else 'csv')
+        if fmt not in ('csv', 'ndjson'):
+            return Response({'error': 'format must be csv or ndjson'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            return Response(formulary.import_formulary(upload.file, fmt))
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    @action(detail=False, methods=['get'])
+    def low_stock(self, request):
+        """Medications at or below reorder level, as computed by the periodic low-stock job."""
+        payload = cache.get(stock_alerts.LOW_STOCK_CACHE_KEY)
+        if payload is None:
+            payload = stock_alerts.refresh_low_stock(notify=False)
+        return Response(payload)
+
+    @action(detail=False, methods=['get'])
+    def near_expiry(self, request):
+        """Stock expiring within ?days=30|60|90, from the nightly expiry summary."""
+        try:
+            days = int(request.query_params.get('days', 30))
+        except ValueError:
+            days = None
+        if days not in dict(ExpirySummary.WINDOW_CHOICES):
+            return Response({'error': 'days must be 30, 60 or 90'}, status=status.HTTP_400_BAD_REQUEST)
+
+        rows = list(
+            ExpirySummary.objects.filter(window_days=days).order_by('earliest_expiry')
+            .values('medication_id', 'medication__name', 'batch_count', 'quantity', 'earliest_expiry', 'computed_at')
+        )
+        return Response({
+            'days': days,
+            'computed_at': rows[0]['computed_at'] if rows else None,
+            'items': [
+                {
+                    'medication': row['medication_id'],
+                    'name': row['medication__name'],
+                    'batch_count': row['batch_count'],
+                    'quantity': row['quantity'],
+                    'earliest_expiry': row['earliest_expiry'],
+                }
+                for row in rows
+            ],
+        })
+
+    @action(detail=False, methods=['get'])
+    def reorder_suggestions(self, request):
+        """Nightly forecast-based order suggestions; ?all=true includes items needing no order."""
+        suggestions = ReorderSuggestion.objects.select_related('medication').order_by('-suggested_quantity', 'medication__name')
+        if request.query_params.get('all', '').lower() != 'true':
+            suggestions = suggestions.filter(suggested_quantity__gt=0)
+        page = self.paginate_queryset(suggestions)
+        serializer = ReorderSuggestionSerializer(page if page is not None else suggestions, many=True)
+        return self.get_paginated_response(serializer.data) if page is not None else Response(serializer.data)
+
+    @action(detail=True, methods=['post'], permission_classes=[IsPharmacist])
+    def receive(self, request, pk=None):
+        """Receive a new stock batch for this medication."""
+        medication = self.get_object()
+        data = request.data.copy()
+        data['medication'] = medication.pk
+        serializer = StockBatchSerializer(data=data)
+        serializer.is_valid(raise_exception=True)
+        batch = dispensing.receive_batch(
+            medication,
+            serializer.validated_data['batch_number'],
+            serializer.validated_data['expiry_date'],
+            serializer.validated_data['received_quantity'],
+        )
+        return Response(StockBatchSerializer(batch).data, status=status.HTTP_201_CREATED)
+
+    @action(detail=True, methods=['post'], permission_classes=[IsPharmacist])
+    def dispense(self, request, pk=None):
+        """Dispense from this medication's batches, earliest expiry first."""
+        medication = self.get_object()
+        try:
+            quantity = int(request.data.get('quantity', 0))
+        except (TypeError, ValueError):
+            return Response({'error': 'quantity must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+
+        prescription = None
+        if request.data.get('prescription_id'):
+            try:
+                prescription = Prescription.objects.get(id=request.data['prescription_id'])
+            except Prescription.DoesNotExist:
+                return Response({'error': 'Prescription not found.'}, status=status.HTTP_404_NOT_FOUND)
+
+        success, result = dispensing.dispense(medication.pk, quantity, prescription=prescription, user=request.user)
+        if not success:
+            return Response({'error': result}, status=status.HTTP_409_CONFLICT)
+        medication.refresh_from_db(fields=['current_stock'])
+        return Response({'status': 'dispensed', 'allocations': result, 'remaining': medication.current_stock})
+
+    @action(detail=True, methods=['post'], permission_classes=[IsPharmacist])
+    def adjust(self, request, pk=None):
+        """Correct one batch after a stock count: {"batch_id": 1, "quantity": -2, "reason": "..."}"""
+        medication = self.get_object()
+        try:
+            delta = int(request.data.get('quantity', 0))
+        except (TypeError, ValueError):
+            return Response({'error': 'quantity must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+        if not medication.batches.filter(pk=request.data.get('batch_id')).exists():
+            return Response({'error': 'Batch not found.'}, status=status.HTTP_404_NOT_FOUND)
+
+        success, result = dispensing.adjust_batch(
+            request.data['batch_id'], delta, reason=request.data.get('reason', ''), user=request.user
+        )
+        if not success:
+            return Response({'error': result}, status=status.HTTP_409_CONFLICT)
+        medication.refresh_from_db(fields=['current_stock'])
+        return Response({'status': 'adjusted', 'batch_quantity': result, 'current_stock': medication.current_stock})
+
+    @action(detail=True, methods=['get'])
+    def balance(self, request, pk=None):
+        """Current stock, or the ledger balance at ?as_of=<ISO date or datetime>."""
+        medication = self.get_object()
+        as_of = request.query_params.get('as_of')
+        if not as_of:
+            return Response({'medication': medication.pk, 'balance': medication.current_stock})
+
+        try:
+            day = parse_date(as_of) if len(as_of) == 10 else None
+            # A bare date means the balance at the end of that day
+            when = datetime.combine(day, datetime.max.time()) if day else parse_datetime(as_of)
+        except ValueError:
+            when = None
+        if when is None:
+            return Response({'error': 'as_of must be an ISO date or datetime'}, status=status.HTTP_400_BAD_REQUEST)
+        if timezone.is_naive(when):
+            when = timezone.make_aware(when)
+        return Response({'medication': medication.pk, 'as_of': when, 'balance': dispensing.balance_as_of(medication.pk, when)})
+
+    @action(detail=True, methods=['get'])
+    def movements(self, request, pk=None):
+        """Ledger rows for this medication, newest first, optionally within ?start=&end= (ISO dates)."""
+        medication = self.get_object()
+        movements = medication.stock_movements.select_related('batch').order_by('-occurred_at', '-id')
+        if request.query_params.get('start'):
+            movements = movements.filter(occurred_at__date__gte=request.query_params['start'])
+        if request.query_params.get('end'):
+            movements = movements.filter(occurred_at__date__lte=request.query_params['end'])
+        page = self.paginate_queryset(movements)
+        serializer = StockMovementSerializer(page if page is not None else movements, many=True)
+        return self.get_paginated_response(serializer.data) if page is not None else Response(serializer.data)
+
 class BillViewSet(viewsets.ModelViewSet):
     queryset = Bill.objects.all()
     serializer_class = BillSerializer
@@ -154,6 +398,42 @@ class BillViewSet(viewsets.ModelViewSet):
             return Bill.objects.all()
         return Bill.objects.none()
 
+    @action(detail=False, methods=['post'], permission_classes=[IsAdminUser])
+    def generate_from_encounters(self, request):
+        """Bill all unbilled encounters of {"date": "YYYY-MM-DD"} (default today). Safe to re-run."""
+        from .billing import generate_bills_for_day
+
+        day = None
+        if request.data.get('date'):
+            try:
+                day = parse_date(request.data['date'])
+            except ValueError:
+                pass
+            if day is None:
+                return Response({'error': 'date must be YYYY-MM-DD'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(generate_bills_for_day(day))
+
+    @action(detail=True, methods=['get'])
+    def invoice(self, request, pk=None):
+        """PDF invoice for the bill's current items and payments (202 while it is being rendered)."""
+        return _document_response(request, 'invoice', self.get_object().pk)
+
+    @action(detail=False, methods=['post'], permission_classes=[IsAdminUser])
+    def render_statements(self, request):
+        """Queue PDF statements for {"patient_ids": [...]} (default: every patient with an unpaid bill)."""
+        patient_ids = request.data.get('patient_ids')
+        if patient_ids is not None and not (
+            isinstance(patient_ids, list) and all(isinstance(i, int) for i in patient_ids)
+        ):
+            return Response({'error': 'patient_ids must be a list of integers'}, status=status.HTTP_400_BAD_REQUEST)
+        patients, tasks = documents.render_statements(patient_ids)
+        return Response({'patients': patients, 'tasks': tasks}, status=status.HTTP_202_ACCEPTED)
+
+class ServiceCatalogViewSet(viewsets.ModelViewSet):
+    queryset = ServiceCatalog.objects.all()
+    serializer_class = ServiceCatalogSerializer
+    permission_classes = [IsAdminOrReadOnly | IsReceptionistOrReadOnly | IsDoctorOrReadOnly]
+
 class BillItemViewSet(viewsets.ModelViewSet):
     queryset = BillItem.objects.all()
     serializer_class = BillItemSerializer
@@ -164,6 +444,23 @@ class PaymentViewSet(viewsets.ModelViewSet):
     serializer_class = PaymentSerializer
     permission_classes = [IsAuthenticated]
 
+    @action(detail=False, methods=['post'], permission_classes=[IsAdminUser])
+    def reconcile(self, request):
+        """Match an uploaded CSV bank statement ('file'; optional 'date_tolerance_days') against recorded payments."""
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({'error': 'Upload the statement as "file"'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            tolerance = int(request.data.get('date_tolerance_days', 3))
+            return Response(reconciliation.reconcile_statement(upload.file, date_tolerance_days=max(tolerance, 0)))
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    @action(detail=True, methods=['get'])
+    def receipt(self, request, pk=None):
+        """PDF receipt for the payment (202 while it is being rendered)."""
+        return _document_response(request, 'receipt', self.get_object().pk)
+
 class NotificationViewSet(viewsets.ModelViewSet):
     serializer_class = NotificationSerializer
     permission_classes = [IsAuthenticated]
@@ -178,6 +475,41 @@ class NotificationViewSet(viewsets.ModelViewSet):
         notification.save()
         return Response({'status': 'marked as read'})
 
+class ReportJobViewSet(viewsets.ModelViewSet):
+    """Submit heavy reports to run on a Celery worker, poll them, and download the result."""
+    serializer_class = ReportJobSerializer
+    permission_classes = [IsAuthenticated]
+    http_method_names = ['get', 'post', 'delete', 'head', 'options']
+
+    def get_queryset(self):
+        return ReportJob.objects.filter(user=self.request.user)
+
+    def create(self, request, *args, **kwargs):
+        from .report_jobs import REPORTS
+        from .tasks import run_report_job_task
+
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        if not REPORTS[serializer.validated_data['report']].permission().has_permission(request, self):
+            return Response({'error': 'You do not have access to this report'}, status=status.HTTP_403_FORBIDDEN)
+        job = serializer.save(user=request.user)
+        transaction.on_commit(lambda: run_report_job_task.delay(job.pk))
+        return Response(self.get_serializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+    def perform_destroy(self, instance):
+        if instance.file:
+            instance.file.delete(save=False)
+        instance.delete()
+
+    @action(detail=True, methods=['get'])
+    def download(self, request, pk=None):
+        from .report_jobs import filename
+
+        job = self.get_object()
+        if job.status != 'succeeded':
+            return Response({'status': job.status, 'error': job.error}, status=status.HTTP_409_CONFLICT)
+        return FileResponse(job.file.open('rb'), as_attachment=True, filename=filename(job))
+
 class AuditLogViewSet(viewsets.ModelViewSet):
     queryset = AuditLog.objects.all()
     serializer_class = AuditLogSerializer
@@ -279,6 +611,9 @@ def dashboard(request):
         date__gte=today
     ).order_by('date', 'time')[:5]
 
+    # Birthdays and registration anniversaries, cached until midnight
+    todays = occasions.todays_occasions()
+
     # System health (simplified)
     system_health = {
         'database': 'healthy',
@@ -294,11 +629,43 @@ def dashboard(request):
         'system_health': system_health,
         'notifications': [],
         'whats_new': [],
-        'birthdays_today': [],
-        'anniversaries': [],
-        'patient_registrations_trend': [],
-        'revenue_trend': [],
-        'revenue_breakdown': []
+        'birthdays_today': todays['birthdays_today'],
+        'anniversaries': todays['anniversaries'],
+        'patient_registrations_trend': _trend('registrations', months_ago(11)),
+        'revenue_trend': _trend('revenue', months_ago(11)),
+        'revenue_breakdown': [
+            {'method': row['method'], 'total': float(row['total'] or 0)}
+            for row in Payment.objects.filter(payment_date__gte=timezone.make_aware(
+                datetime.combine(months_ago(11), datetime.min.time())
+            )).values('method').annotate(total=models.Sum('amount')).order_by('-total')
+        ]
+    })
+
+def _trend(name, start, granularity='month', end=None):
+    return [
+        {'period': point['period'].isoformat(), 'value': float(point['value'])}
+        for point in get_series(name, granularity, start, end)
+    ]
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def report_timeseries(request, name):
+    """Revenue or registration time series: ?granularity=day|week|month&start=YYYY-MM-DD&end=YYYY-MM-DD"""
+    granularity = request.query_params.get('granularity', 'month')
+    try:
+        start = parse_date(request.query_params.get('start', '')) or months_ago(11)
+        end = parse_date(request.query_params.get('end', ''))
+    except ValueError:
+        return Response({'error': 'start and end must be YYYY-MM-DD'}, status=status.HTTP_400_BAD_REQUEST)
+    if name not in SERIES or granularity not in TRUNC:
+        return Response({'error': 'Unknown series or granularity'}, status=status.HTTP_400_BAD_REQUEST)
+    if granularity == 'day' and ((end or timezone.localdate()) - start).days > 2 * 366:
+        return Response({'error': 'Daily series are limited to two years'}, status=status.HTTP_400_BAD_REQUEST)
+
+    return Response({
+        'series': name,
+        'granularity': granularity,
+        'points': _trend(name, start, granularity, end),
     })
 
 @api_view(['GET'])
@@ -394,6 +761,77 @@ def report_billing_stats(request):
     })
 
 
+def _analytics_response(build):
+    """Run an analytics dashboard over the nightly Parquet extract; 503 until the first extract exists."""
+    from . import analytics
+    try:
+        extract = analytics.manifest()
+        data = build()
+    except analytics.ExtractMissing as e:
+        return Response({'status': 'error', 'message': str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+    return Response({
+        'status': 'success',
+        'data': data,
+        'extracted_at': extract['extracted_at'],
+        'timestamp': timezone.now().isoformat(),
+    })
+
+@api_view(['GET'])
+@permission_classes([IsDoctor])
+def analytics_research(request):
+    """Research dashboard: cohort, encounter volumes, top diagnoses and medications"""
+    from .analytics import research_dashboard
+    return _analytics_response(research_dashboard)
+
+@api_view(['GET'])
+@permission_classes([IsDoctor])
+def analytics_quality(request):
+    """Quality dashboard: appointment outcomes, return visits, prescribing and collections"""
+    from .analytics import quality_dashboard
+    return _analytics_response(quality_dashboard)
+
+@api_view(['GET'])
+@permission_classes([IsDoctor])
+def analytics_staff(request):
+    """Staff dashboard over ?days= (default 30, at most 365)"""
+    from .analytics import staff_dashboard
+    try:
+        days = min(max(int(request.query_params.get('days', 30)), 1), 365)
+    except ValueError:
+        return Response({'error': 'days must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+    return _analytics_response(lambda: staff_dashboard(days=days))
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def report_receivables_aging(request):
+    """Receivables aging buckets; live, or from the nightly snapshot with ?as_of=YYYY-MM-DD"""
+    from .billing import AGING_BUCKETS, receivables_aging
+    from .models import ReceivablesAgingSnapshot
+
+    as_of = request.query_params.get('as_of')
+    if as_of:
+        try:
+            day = parse_date(as_of)
+        except ValueError:
+            day = None
+        if day is None:
+            return Response({'error': 'as_of must be YYYY-MM-DD'}, status=status.HTTP_400_BAD_REQUEST)
+        buckets = list(ReceivablesAgingSnapshot.objects.filter(as_of=day).values('bucket', 'bill_count', 'outstanding'))
+        if not buckets:
+            return Response({'error': f'No aging snapshot for {day}'}, status=status.HTTP_404_NOT_FOUND)
+        order = [label for label, _ in reversed(AGING_BUCKETS)]
+        buckets.sort(key=lambda b: order.index(b['bucket']))
+    else:
+        day = timezone.localdate()
+        buckets = receivables_aging()
+
+    return Response({
+        'as_of': day,
+        'buckets': [{**b, 'outstanding': float(b['outstanding'])} for b in buckets],
+        'total_outstanding': float(sum(b['outstanding'] for b in buckets)),
+    })
+
+
 # Profile and Preferences
 @api_view(['GET', 'PUT', 'PATCH'])
 @permission_classes([IsAuthenticated])
@@ -439,6 +877,20 @@ def health_check(request):
         'version': '1.0.0'
     })
 
+# Outbound HTTP metrics
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def http_client_metrics(request):
+    """Per-host latency/error counters and circuit breaker states for outbound calls"""
+    return Response(http_client.get_metrics())
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def replica_status(request):
+    """Whether report traffic is being served by the read replica, and its current lag"""
+    from .db_router import replica_status as status_
+    return Response(status_())
+
 # Sync offline data (placeholder)
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])